@@ -0,0 +1,127 @@
+import io
+from typing import BinaryIO, Optional, Union
+
+# A file path or a seekable binary file object (such as a Spool)
+AudioSource = Union[str, BinaryIO]
+
+# Bytes searched for the first frame after the ID3 tag; encoders may leave
+# padding or a stray partial frame there
+SYNC_WINDOW = 64 * 1024
+# Consecutive frames that must chain up before the file counts as MP3
+FRAMES_REQUIRED = 3
+
+# Bitrates in kbit/s by [MPEG-1][layer index], index 0 is "free", 15 invalid
+_BITRATES = {
+    (True, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates in Hz by version bits (3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def frame_length(header: bytes) -> Optional[int]:
+    """
+    Length of the MPEG audio frame starting with ``header``
+
+    Args:
+        header (bytes): At least the four header bytes
+
+    Returns:
+        Optional[int]: Frame length in bytes, or None if this is not a valid frame header
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1, layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    if layer == 3:
+        # Layer I: 4-byte slots
+        return (12 * bitrate // sample_rate + padding) * 4
+    if layer == 1 and not mpeg1:
+        # Layer III of MPEG-2 and 2.5 carries half as many samples per frame
+        return 72 * bitrate // sample_rate + padding
+    return 144 * bitrate // sample_rate + padding
+
+
+def id3_size(header: bytes) -> int:
+    """
+    Size of the ID3v2 tag at the start of a file
+
+    Args:
+        header (bytes): The first ten bytes of the file
+
+    Returns:
+        int: Tag size including its header and footer, 0 if there is no tag
+    """
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    # Flag bit 4: a ten-byte footer follows the tag
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+def _read_at(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+
+def first_frame(f: BinaryIO) -> Optional[int]:
+    """
+    Find the first MPEG audio frame of a file
+
+    A frame only counts when ``FRAMES_REQUIRED`` frames follow each other
+    at the offsets their headers announce, which rules out sync patterns
+    that occur by chance in cover art or in an HTML error page.
+
+    Args:
+        f (BinaryIO): Seekable file opened in binary mode
+
+    Returns:
+        Optional[int]: Offset of the first frame, or None if there is none
+    """
+    start = id3_size(_read_at(f, 0, 10))
+    window = _read_at(f, start, SYNC_WINDOW)
+    offset = window.find(b"\xff")
+    while offset != -1:
+        position = start + offset
+        for _ in range(FRAMES_REQUIRED):
+            length = frame_length(_read_at(f, position, 4))
+            if length is None:
+                break
+            position += length
+        else:
+            return start + offset
+        offset = window.find(b"\xff", offset + 1)
+    return None
+
+
+def is_mp3(source: AudioSource) -> bool:
+    """
+    Check that a file holds MPEG audio rather than, say, an error page
+
+    Args:
+        source (AudioSource): Path or seekable binary file; a file object's
+            position is restored afterwards
+
+    Returns:
+        bool: True if a chain of valid MPEG audio frames was found
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return first_frame(f) is not None
+    position = source.tell()
+    try:
+        return first_frame(source) is not None
+    finally:
+        source.seek(position, io.SEEK_SET)
@@ -0,0 +1,199 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument, UpdateOne, errors
+
+from database import AsyncDatabase
+from workqueue import default_worker_id
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+
+
+class BackfillShards:
+    """
+    Checkpointed page ranges of a back-catalog crawl, shared through MongoDB
+
+    The index is split into shards of consecutive pages, one document each.
+    A worker leases a shard like an album in the work queue, queues the
+    albums of its pages one page at a time and records the next page after
+    each one, which also renews the lease. A stopped or crashed backfill
+    resumes every shard at its checkpoint, and several processes can work
+    through the shards together.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection_name: str = "backfill",
+                 worker_id: Optional[str] = None, lease_seconds: float = 300):
+        """
+        Args:
+            database (AsyncDatabase): Database wrapper
+            collection_name (str): Collection holding the shards
+            worker_id (Optional[str]): Owner written into leases (defaults to ``host:pid``)
+            lease_seconds (float): Lifetime of a lease without a checkpoint
+        """
+        self.database = database
+        self.collection = database[collection_name]
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def ensure_indexes(self) -> None:
+        """
+        Index shards by status and position
+        """
+        try:
+            await self.database.run(
+                "backfill.create_index", self.collection.create_index,
+                [("status", 1), ("start", 1)], name="claim_order"
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not create backfill index: {e}")
+
+    @staticmethod
+    def shard_id(start: int, end: int) -> str:
+        """
+        Returns:
+            str: Key of the shard covering pages ``start`` to ``end``
+        """
+        return f"{start:06d}-{end:06d}"
+
+    async def plan(self, total_pages: int, shard_size: int) -> int:
+        """
+        Create the shards covering pages 1 to ``total_pages``; shards that
+        already exist keep their progress
+
+        Args:
+            total_pages (int): Pages of the index
+            shard_size (int): Pages per shard
+
+        Returns:
+            int: Number of shards that were not planned before
+        """
+        now = datetime.now(timezone.utc)
+        requests = []
+        for start in range(1, total_pages + 1, shard_size):
+            end = min(start + shard_size - 1, total_pages)
+            requests.append(UpdateOne({"_id": self.shard_id(start, end)}, {"$setOnInsert": {
+                "start": start,
+                "end": end,
+                "next_page": start,
+                "status": PENDING,
+                "queued": 0,
+                "created_at": now
+            }}, upsert=True))
+        if not requests:
+            return 0
+        result = await self.database.run(
+            "backfill.plan", self.collection.bulk_write, requests, ordered=False
+        )
+        return result.upserted_count
+
+    async def claim(self) -> Optional[Dict]:
+        """
+        Lease the first unfinished shard nobody else is working on
+
+        Returns:
+            Optional[Dict]: The shard document, or None if there is none
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            return await self.database.run(
+                "backfill.claim", self.collection.find_one_and_update,
+                {"$or": [
+                    {"status": PENDING},
+                    {"status": RUNNING, "lease_expires": {"$lt": now}}
+                ]},
+                {"$set": {
+                    "status": RUNNING,
+                    "owner": self.worker_id,
+                    "lease_expires": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now
+                }},
+                sort=[("start", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not claim backfill shard: {e}")
+            return None
+
+    async def checkpoint(self, shard_id: str, next_page: int, queued: int) -> bool:
+        """
+        Record progress and renew the lease
+
+        Args:
+            shard_id (str): Shard key
+            next_page (int): First page not processed yet
+            queued (int): Albums this shard queued in total
+
+        Returns:
+            bool: False if the lease was taken over by another worker
+        """
+        now = datetime.now(timezone.utc)
+        result = await self.database.run(
+            "backfill.checkpoint", self.collection.update_one,
+            {"_id": shard_id, "owner": self.worker_id, "status": RUNNING},
+            {"$set": {
+                "next_page": next_page,
+                "queued": queued,
+                "lease_expires": now + timedelta(seconds=self.lease_seconds),
+                "updated_at": now
+            }}
+        )
+        return result.matched_count == 1
+
+    async def _finish(self, shard_id: str, status: str) -> None:
+        try:
+            await self.database.run(
+                "backfill.finish", self.collection.update_one,
+                {"_id": shard_id, "owner": self.worker_id, "status": RUNNING},
+                {
+                    "$set": {"status": status, "updated_at": datetime.now(timezone.utc)},
+                    "$unset": {"owner": "", "lease_expires": ""}
+                }
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not update backfill shard {shard_id}: {e}")
+
+    async def complete(self, shard_id: str) -> None:
+        """
+        Mark a leased shard as done
+
+        Args:
+            shard_id (str): Shard key
+        """
+        await self._finish(shard_id, DONE)
+
+    async def release(self, shard_id: str) -> None:
+        """
+        Give a leased shard back; it resumes at its checkpoint
+
+        Args:
+            shard_id (str): Shard key
+        """
+        await self._finish(shard_id, PENDING)
+
+    async def reset(self) -> None:
+        """
+        Forget every shard and its progress
+        """
+        await self.database.run("backfill.reset", self.collection.delete_many, {})
+
+    async def progress(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Planned and processed pages, queued albums and shards per status
+        """
+        shards = await self.database.run("backfill.progress", lambda: list(self.collection.find(
+            {}, {"start": 1, "end": 1, "next_page": 1, "status": 1, "queued": 1}
+        )))
+        progress = {"pages": 0, "pages_done": 0, "queued": 0, PENDING: 0, RUNNING: 0, DONE: 0}
+        for shard in shards:
+            pages = shard["end"] - shard["start"] + 1
+            progress["pages"] += pages
+            progress["pages_done"] += pages if shard["status"] == DONE else \
+                min(pages, shard["next_page"] - shard["start"])
+            progress["queued"] += shard.get("queued", 0)
+            progress[shard["status"]] = progress.get(shard["status"], 0) + 1
+        return progress
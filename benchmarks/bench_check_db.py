@@ -0,0 +1,109 @@
+"""
+Per-check latency of the album duplicate check at different catalog sizes.
+
+Compares three strategies:
+
+- legacy:  load every document and scan a Python list (the old ``check_db``)
+- indexed: ``check_db`` with a projection-only lookup on the unique ``url`` index
+- seen:    ``check_db`` answered from a warmed ``SeenUrls`` set
+
+Run against a local mongod for realistic numbers::
+
+    python benchmarks/bench_check_db.py --uri mongodb://localhost:27017/
+
+Without ``--uri`` the benchmark uses mongomock, which has no real indexes, so
+the "indexed" column there is a linear scan and only the relative cost of
+moving whole documents is meaningful.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ensure_indexes, check_db, find_documents, load_seen_urls  # noqa: E402
+
+COLLECTION = "bench_albums"
+
+
+def make_db(uri):
+    if uri:
+        from pymongo import MongoClient
+        return MongoClient(uri)["massify_bench"]
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is required when no --uri is given (pip install mongomock)")
+    return mongomock.MongoClient()["massify_bench"]
+
+
+def populate(db, size):
+    collection = db[COLLECTION]
+    collection.drop()
+    ensure_indexes(db, COLLECTION)
+    batch = []
+    for i in range(size):
+        batch.append({
+            "url": f"https://masstamilan.dev/album-{i}-songs",
+            "songs": [{"name": f"Song {j}", "download_links": [
+                {"quality": "128kbps", "url": f"https://masstamilan.dev/d/{i}/{j}/128"},
+                {"quality": "320kbps", "url": f"https://masstamilan.dev/d/{i}/{j}/320"},
+            ]} for j in range(6)],
+            "movie_info": {"Movie": f"Album {i}", "Year": "2024"},
+        })
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def legacy_check(db, url):
+    documents = find_documents(db, COLLECTION)
+    return url in [doc.get("url") for doc in documents]
+
+
+def timed(fn, urls):
+    start = time.perf_counter()
+    for url in urls:
+        fn(url)
+    return (time.perf_counter() - start) / len(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uri", help="MongoDB URI (default: mongomock)")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="skip the legacy scan above this many documents")
+    args = parser.parse_args()
+
+    db = make_db(args.uri)
+    print(f"{'docs':>10} {'legacy':>12} {'indexed':>12} {'seen':>12}  warm")
+    for size in (int(s) for s in args.sizes.split(",")):
+        populate(db, size)
+        # Half hits, half misses
+        urls = [f"https://masstamilan.dev/album-{(i * 7919) % size}-songs"
+                for i in range(args.checks // 2)]
+        urls += [f"https://masstamilan.dev/new-{i}-songs" for i in range(args.checks // 2)]
+
+        if size <= args.legacy_max:
+            legacy_urls = urls[:max(2, args.checks // 20)]
+            legacy = f"{timed(lambda u: legacy_check(db, u), legacy_urls) * 1e3:10.3f}ms"
+        else:
+            legacy = f"{'skipped':>12}"
+        indexed = timed(lambda u: check_db(db, COLLECTION, u), urls)
+
+        start = time.perf_counter()
+        seen = load_seen_urls(db, COLLECTION)
+        warm = time.perf_counter() - start
+        cached = timed(lambda u: check_db(db, COLLECTION, u, seen), urls)
+
+        print(f"{size:>10} {legacy} {indexed * 1e3:10.3f}ms {cached * 1e3:10.3f}ms  {warm:.2f}s")
+    db[COLLECTION].drop()
+
+
+if __name__ == "__main__":
+    main()
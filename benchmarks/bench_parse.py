@@ -0,0 +1,108 @@
+"""
+Parse-time micro-benchmark for album pages.
+
+Compares the previous two-pass extraction (``fetch_links`` and
+``extract_movie_info`` each parsing the whole page with ``html.parser`` and
+lambda-based ``find`` calls) with the single strained ``parse_album`` pass.
+Any ``*.html`` album page saved under ``benchmarks/fixtures`` is used::
+
+    python benchmarks/bench_parse.py --rounds 200
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from scraper import HTML_PARSER, parse_album  # noqa: E402
+
+BASE_URL = "https://masstamilan.dev"
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_parse(html):
+    """The pre-strainer extraction: two full parses of the same page"""
+    soup = BeautifulSoup(html, "html.parser")
+    songs = []
+    for tr in soup.find_all("tr", attrs={"itemprop": "itemListElement"}):
+        name_link = tr.find("a", href=True, title=lambda x: x and "Download" in x)
+        download_links = tr.find_all("a", class_="dlink anim")
+        if name_link and download_links:
+            songs.append({
+                "name": name_link.text.strip(),
+                "song_link": urljoin(BASE_URL, name_link["href"]),
+                "download_links": [{"quality": link.text.strip(),
+                                    "url": urljoin(BASE_URL, link["href"])}
+                                   for link in download_links],
+            })
+
+    soup = BeautifulSoup(html, "html.parser")
+    caption = soup.find("figcaption", class_="cen")
+    fieldset = soup.find("fieldset", id="movie-handle")
+
+    def safe_extract(finder, default="N/A"):
+        try:
+            return finder().text.strip()
+        except (AttributeError, TypeError):
+            return default
+
+    movie_info = {
+        "Movie": caption.text.strip().replace(" Poster", "") if caption else "N/A",
+        "Starring": safe_extract(lambda: fieldset.find("a", href=lambda x: x and "/artist/" in x)),
+        "Music": safe_extract(lambda: fieldset.find("a", href=lambda x: x and "/music/" in x)),
+        "Director": safe_extract(lambda: fieldset.find("b", string="Director:").next_sibling),
+        "Lyricists": safe_extract(lambda: fieldset.find("b", string="Lyricists:").next_sibling),
+        "Year": safe_extract(lambda: fieldset.find("a", href=lambda x: x and "/browse-by-year/" in x)),
+        "Language": safe_extract(lambda: fieldset.find("a", href=lambda x: x and "/tamil-songs" in x)),
+        "First Released": safe_extract(lambda: fieldset.find("b", string="Fist Released on MassTamilan:").next_sibling),
+        "Last Updated": safe_extract(lambda: fieldset.find("b", string="Last Updated on MassTamilan:").next_sibling),
+    }
+    return songs, movie_info
+
+
+def bench(fn, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            fn(html)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--fixtures", default=os.path.join(FIXTURES, "album*.html"))
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    paths = sorted(glob.glob(args.fixtures))
+    if not paths:
+        sys.exit(f"No fixture pages match {args.fixtures}")
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+
+    # Both paths must agree before their timings mean anything
+    for path, html in zip(paths, pages):
+        album = parse_album(html, path, BASE_URL)
+        if (album["songs"], album["movie_info"]) != legacy_parse(html):
+            sys.exit(f"parse_album disagrees with the legacy parser on {path}")
+
+    legacy = bench(legacy_parse, pages, args.rounds)
+    single = bench(lambda html: parse_album(html, "", BASE_URL), pages, args.rounds)
+    size = sum(len(p) for p in pages) / len(pages)
+    print(f"pages: {len(pages)} (avg {size / 1024:.1f} KiB), parser: {HTML_PARSER}")
+    print(f"legacy two-pass html.parser: {legacy * 1e3:8.3f} ms/page, 2 fetches/album")
+    print(f"parse_album strained:        {single * 1e3:8.3f} ms/page, 1 fetch/album")
+    print(f"speedup: {legacy / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+End-to-end throughput of ``MusicDownloader.main`` with no network access.
+
+The crawler, scraper, downloader, thumbnailer and uploader all run
+unmodified against the stand-ins in ``harness``: a local catalog server for
+masstamilan pages and MP3s, ``FakeClient`` bots for Telegram and mongomock
+(or ``--uri`` for a real mongod) for MongoDB. The run ends once ``--albums``
+albums are committed::
+
+    python benchmarks/bench_pipeline.py --albums 30
+    python benchmarks/bench_pipeline.py --albums 100 --bots 2 --flood-every 50 --json run.json
+
+Reports albums per minute, peak RSS, open file descriptors (peak, and
+left over after shutdown to catch leaks) and time spent per pipeline stage
+and per external call, from the process metrics. Settings not covered by
+options are read from the environment as in production, so for example
+``MAX_INFLIGHT_FILES=4`` or ``STREAM_UPLOADS=0`` can be compared directly.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import CatalogServer, FakeClient, bench_database  # noqa: E402
+
+
+def configure(args, workdir):
+    """Production settings that the benchmark has to override, set before config is imported"""
+    tokens = [f"{index + 1}:bench" for index in range(args.bots)]
+    settings = {
+        "API_ID": "1",
+        "API_HASH": "bench",
+        "DUMP_ID": "-100",
+        "BOT_TOKEN": tokens[0],
+        "BOT_TOKENS": ",".join(tokens[1:]),
+        "DATABASE": args.uri or "mongodb://localhost:27017/",
+        "COLLECTION_NAME": "albums",
+        "METRICS_PORT": "0",
+        "LOG_FILE": os.path.join(workdir, "bench.log"),
+        "JOURNAL_DIR": os.path.join(workdir, "journal"),
+        "HTTP_CACHE_DIR": os.path.join(workdir, "http_cache"),
+        "WARM_STATE_DIR": os.path.join(workdir, "state"),
+        "PIPELINE_REPORT_INTERVAL": "3600",
+        "QUEUE_POLL_INTERVAL": "0.05",
+        "SCRAPE_RATE": "1000",
+        "SCRAPE_BURST": "1000",
+        "UPLOAD_GLOBAL_RATE": str(args.global_rate),
+        "UPLOAD_CHAT_RATE": str(args.chat_rate),
+        "UPLOAD_CHAT_BURST": str(args.chat_rate),
+    }
+    for name, value in settings.items():
+        os.environ.setdefault(name, value)
+
+
+class ResourceSampler:
+    """
+    Samples resident memory and open file descriptors while the run lasts
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_fds = 0
+
+    @staticmethod
+    def rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            # ru_maxrss is the peak so far, in KiB on Linux and bytes on macOS
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return usage if sys.platform == "darwin" else usage * 1024
+
+    @staticmethod
+    def fds():
+        for directory in ("/proc/self/fd", "/dev/fd"):
+            if os.path.isdir(directory):
+                return len(os.listdir(directory))
+        return 0
+
+    async def run(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.rss())
+            self.peak_fds = max(self.peak_fds, self.fds())
+            await asyncio.sleep(self.interval)
+
+
+async def drive(args, server_url, workdir):
+    import beta
+    import metrics
+
+    clients = []
+
+    def client(name, **kwargs):
+        fake = FakeClient(name, latency=args.upload_ms / 1000, bandwidth=args.upload_bandwidth,
+                          flood_every=args.flood_every, flood_seconds=args.flood_seconds)
+        clients.append(fake)
+        return fake
+
+    database = bench_database(args.uri)
+    beta.Client = client
+    beta.open_database = lambda uri, name, max_workers=16: database
+
+    downloader = beta.MusicDownloader()
+    downloader.scraper.base_url = server_url
+    downloader.downloader.output_dir = os.path.join(workdir, "downloads")
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+
+    albums = metrics.REGISTRY.get("massify_albums_total")
+    sampler = ResourceSampler()
+    baseline_fds = sampler.fds()
+    sampling = asyncio.ensure_future(sampler.run())
+    start = time.perf_counter()
+    task = asyncio.ensure_future(downloader.main())
+    try:
+        while albums.total() < args.albums:
+            if task.done():
+                task.result()
+                raise RuntimeError("MusicDownloader.main returned early")
+            if time.perf_counter() - start > args.timeout:
+                raise TimeoutError(f"Only {albums.total():.0f} of {args.albums} albums after {args.timeout}s")
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        downloader.database.close()
+        sampling.cancel()
+    await asyncio.sleep(0.1)
+
+    snapshot = metrics.REGISTRY.snapshot()
+    return {
+        "albums": args.albums,
+        "albums_done": albums.total(result="done"),
+        "albums_failed": albums.total(result="failed"),
+        "seconds": round(elapsed, 2),
+        "albums_per_minute": round(albums.total(result="done") / elapsed * 60, 2),
+        "peak_rss_mb": round(max(sampler.peak_rss, sampler.rss()) / 2 ** 20, 1),
+        "peak_open_fds": sampler.peak_fds,
+        "leaked_fds": sampler.fds() - baseline_fds,
+        "bots": [fake.stats() for fake in clients],
+        "downloaded_mb": round(snapshot.get("massify_download_bytes_total", {}).get("", 0) / 2 ** 20, 1),
+        "metrics": snapshot
+    }
+
+
+def print_report(report):
+    print(f"albums         {report['albums_done']:.0f} done, {report['albums_failed']:.0f} failed "
+          f"in {report['seconds']}s")
+    print(f"albums/minute  {report['albums_per_minute']}")
+    print(f"peak RSS       {report['peak_rss_mb']} MiB")
+    print(f"open fds       {report['peak_open_fds']} peak, {report['leaked_fds']} left after shutdown")
+    print(f"downloaded     {report['downloaded_mb']} MiB")
+    for index, bot in enumerate(report["bots"]):
+        print(f"bot {index}          {bot['messages']} messages, {bot['bytes_sent'] / 2 ** 20:.1f} MiB, "
+              f"{bot['flood_waits']} FloodWaits")
+
+    print(f"\n{'timer':<42} {'count':>7} {'avg ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>9}")
+    for name in ("massify_stage_seconds", "massify_scrape_page_seconds", "massify_download_seconds",
+                 "massify_thumbnail_seconds", "massify_upload_wait_seconds", "massify_upload_seconds",
+                 "massify_db_seconds"):
+        series = report["metrics"].get(name, {})
+        # The slowest database operations only; there are many
+        rows = sorted(series.items(), key=lambda item: -item[1]["avg_ms"] * item[1]["count"])
+        for labels, values in rows[:6] if name == "massify_db_seconds" else rows:
+            label = name.replace("massify_", "").replace("_seconds", "") + labels
+            total = values["avg_ms"] * values["count"] / 1000
+            print(f"{label:<42} {values['count']:>7} {values['avg_ms']:>9.1f} "
+                  f"{values['p95_ms']:>9.1f} {values['max_ms']:>9.1f} {total:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--albums", type=int, default=30, help="albums to process")
+    parser.add_argument("--track-kb", type=int, default=256, help="size of each synthetic MP3")
+    parser.add_argument("--server-ms", type=float, default=5, help="mean latency of the catalog server")
+    parser.add_argument("--upload-ms", type=float, default=50, help="mean latency of each Telegram call")
+    parser.add_argument("--upload-bandwidth", type=float, default=None,
+                        help="simulated upload bytes per second per bot (unlimited by default)")
+    parser.add_argument("--bots", type=int, default=1)
+    parser.add_argument("--flood-every", type=int, default=0, help="FloodWait on every Nth call per bot")
+    parser.add_argument("--flood-seconds", type=int, default=1)
+    parser.add_argument("--global-rate", type=float, default=1000,
+                        help="messages per second per bot (production: 25)")
+    parser.add_argument("--chat-rate", type=float, default=60000,
+                        help="messages per minute per bot and chat (production: 20)")
+    parser.add_argument("--uri", help="MongoDB URI instead of mongomock; the database is dropped first")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="also write the report, with every metric, to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="massify_bench_") as workdir:
+        configure(args, workdir)
+        with CatalogServer(args.albums, args.track_kb * 1024, args.server_ms / 1000) as server:
+            report = asyncio.run(drive(args, server.url, workdir))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
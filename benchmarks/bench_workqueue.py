@@ -0,0 +1,144 @@
+"""
+Album throughput of the shared work queue with 1..N worker processes.
+
+Every worker process claims albums from one ``WorkQueue`` collection,
+"processes" each for ``--work-ms`` (standing in for download and upload
+time), completes it and claims the next, holding up to ``--prefetch``
+albums at once like ``MusicDownloader``. Worker processes need a shared
+database, so this benchmark requires a real mongod::
+
+    python benchmarks/bench_workqueue.py --uri mongodb://localhost:27017/
+
+Throughput should scale close to linearly with the number of workers until
+the claim round trips, or in production the upload rate limit, become the
+bottleneck. A final check verifies that every album was completed exactly
+once, and ``--crash`` kills one worker midway to show its leases being
+reclaimed by the others after ``--lease`` seconds.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import AsyncDatabase  # noqa: E402
+from workqueue import DONE, WorkQueue  # noqa: E402
+
+COLLECTION = "bench_album_queue"
+LOG = "bench_album_log"
+
+
+def make_db(uri):
+    from pymongo import MongoClient
+    return MongoClient(uri)["massify_bench"]
+
+
+async def work(uri, worker_id, prefetch, work_ms, lease, deadline):
+    db = make_db(uri)
+    queue = WorkQueue(AsyncDatabase(db), COLLECTION, worker_id=worker_id,
+                      lease_seconds=lease, heartbeat_interval=lease / 3)
+    claims = asyncio.Semaphore(prefetch)
+
+    async def process(job):
+        try:
+            await asyncio.sleep(work_ms / 1000)
+            await asyncio.to_thread(db[LOG].insert_one, {"url": job["_id"], "worker": worker_id})
+            await queue.complete(job["_id"])
+        finally:
+            claims.release()
+
+    async with queue:
+        tasks = set()
+        while time.time() < deadline:
+            await claims.acquire()
+            job = await queue.claim()
+            if job is None:
+                claims.release()
+                if not tasks:
+                    # Leases of a killed worker still have to expire
+                    counts = await queue.counts()
+                    if not counts.get("queued") and not counts.get("leased"):
+                        break
+                await asyncio.sleep(0.05)
+                continue
+            task = asyncio.ensure_future(process(job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+
+def run_worker(uri, worker_id, prefetch, work_ms, lease, deadline):
+    asyncio.run(work(uri, worker_id, prefetch, work_ms, lease, deadline))
+
+
+def fill(db, albums):
+    db[COLLECTION].drop()
+    db[LOG].drop()
+    queue = WorkQueue(AsyncDatabase(db), COLLECTION)
+    urls = [f"https://masstamilan.dev/album-{i}-songs" for i in range(albums)]
+
+    async def setup():
+        await queue.ensure_indexes()
+        await queue.enqueue(urls, page=1)
+
+    asyncio.run(setup())
+
+
+def run(args, workers):
+    db = make_db(args.uri)
+    fill(db, args.albums)
+    deadline = time.time() + args.timeout
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(args.uri, f"bench-{i}", args.prefetch, args.work_ms, args.lease, deadline)
+        )
+        for i in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    if args.crash and workers > 1:
+        time.sleep(args.work_ms / 1000 * 2)
+        processes[0].kill()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    done = db[COLLECTION].count_documents({"status": DONE})
+    logged = db[LOG].count_documents({})
+    distinct = len(db[LOG].distinct("url"))
+    return done, logged, distinct, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uri", required=True, help="MongoDB URI shared by all workers")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--albums", type=int, default=400)
+    parser.add_argument("--prefetch", type=int, default=8)
+    parser.add_argument("--work-ms", type=float, default=200)
+    parser.add_argument("--lease", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--crash", action="store_true",
+                        help="kill the first worker shortly after start")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'albums/s':>10} {'speedup':>8} {'done':>6} {'dupes':>6}")
+    base = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        done, logged, distinct, elapsed = run(args, workers)
+        rate = done / elapsed
+        base = base or rate
+        # A killed worker may have finished albums it could not mark done
+        print(f"{workers:>8} {rate:>10.1f} {rate / base:>7.2f}x {done:>6} {logged - distinct:>6}")
+    db = make_db(args.uri)
+    db[COLLECTION].drop()
+    db[LOG].drop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""
+Offline stand-ins for running the whole pipeline without network access.
+
+- ``CatalogServer`` serves masstamilan-style index and album pages, built
+  from the recorded pages in ``fixtures``, and synthetic MP3s from a local
+  aiohttp server in a child process, so its CPU and memory do not count
+  against the pipeline being measured.
+- ``synthetic_mp3`` builds a unique, valid-looking MP3 per download link
+  with an ID3v2.3 tag holding a JPEG front cover, so thumbnails come from
+  the embedded-art path like real masstamilan files.
+- ``FakeClient`` stands in for a Pyrogram ``Client``: it reads every file it
+  is given, waits a configurable upload latency and raises ``FloodWait``
+  every Nth call.
+- ``bench_database`` opens a real MongoDB when given a URI and mongomock
+  otherwise.
+"""
+import asyncio
+import hashlib
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import re
+import sys
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ALBUMS_PER_PAGE = 10
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_SIZE = 417
+
+
+def _id3_frame(frame_id: bytes, payload: bytes) -> bytes:
+    # ID3v2.3 frame sizes are plain big-endian, not syncsafe
+    return frame_id + len(payload).to_bytes(4, "big") + b"\x00\x00" + payload
+
+
+def _syncsafe(size: int) -> bytes:
+    return bytes((size >> shift) & 0x7f for shift in (21, 14, 7, 0))
+
+
+def cover_jpeg(seed: str, side: int = 600) -> bytes:
+    """
+    Args:
+        seed (str): Album identifier; the same seed gives the same picture
+        side (int): Width and height in pixels
+
+    Returns:
+        bytes: A JPEG front cover
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (side, side), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        box = sorted(rng.randrange(side) for _ in range(2)) + sorted(rng.randrange(side) for _ in range(2))
+        draw.rectangle((box[0], box[2], box[1], box[3]), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def synthetic_mp3(seed: str, size: int, art: Optional[bytes] = None) -> bytes:
+    """
+    Build an MP3 of about ``size`` bytes that is unique per ``seed``
+
+    Args:
+        seed (str): Track identifier, written as the title and used to fill the frames
+        size (int): Approximate size of the audio frames in bytes
+        art (Optional[bytes]): JPEG stored as the front cover (APIC) picture
+
+    Returns:
+        bytes: ID3v2.3 tag followed by MPEG audio frames
+    """
+    frames = _id3_frame(b"TIT2", b"\x00" + seed.encode("latin-1", "replace"))
+    if art is not None:
+        frames += _id3_frame(b"APIC", b"\x00image/jpeg\x00\x03\x00" + art)
+    tag = b"ID3\x03\x00\x00" + _syncsafe(len(frames)) + frames
+
+    rng = random.Random(seed)
+    count = max(1, size // MP3_FRAME_SIZE)
+    body = bytes(rng.getrandbits(8) for _ in range(MP3_FRAME_SIZE - 4))
+    audio = io.BytesIO()
+    for index in range(count):
+        # Vary every frame a little so no two tracks share content
+        audio.write(MP3_FRAME_HEADER)
+        audio.write(index.to_bytes(4, "big") + body[4:])
+    return tag + audio.getvalue()
+
+
+class Catalog:
+    """
+    Synthetic album catalog rendered from the recorded fixture pages
+    """
+
+    def __init__(self, albums: int, track_size: int):
+        """
+        Args:
+            albums (int): Albums in the catalog, newest first
+            track_size (int): Approximate bytes per MP3
+        """
+        self.albums = albums
+        self.track_size = track_size
+        with open(os.path.join(FIXTURES, "index.html"), encoding="utf-8") as f:
+            index = f.read()
+        with open(os.path.join(FIXTURES, "album.html"), encoding="utf-8") as f:
+            self.album_template = f.read()
+        cards = re.search(r'(<div class="gw">\s*)(.*?)(\s*</div>\s*<nav)', index, re.S)
+        self.card_template = re.search(r'<div class="a-i">.*?</div>', cards.group(2), re.S).group(0)
+        self.index_head = index[:cards.start(2)]
+        self.index_tail = index[cards.end(2):]
+        # Everything up to the album cards; pages past the catalog add only the pagination
+        self.index_empty = index[:cards.start(1)]
+        self.recorded_slug = re.search(r'href="/downloader/([^/]+)/', self.album_template).group(1)
+        self._art: Dict[str, bytes] = {}
+
+    @property
+    def pages(self) -> int:
+        """
+        Index pages holding at least one album
+        """
+        return -(-self.albums // ALBUMS_PER_PAGE)
+
+    @staticmethod
+    def slug(number: int) -> str:
+        """
+        Returns:
+            str: URL slug of album ``number``
+        """
+        return f"bench-{number:05d}"
+
+    def index_page(self, page: int) -> str:
+        """
+        Args:
+            page (int): 1-based index page
+
+        Returns:
+            str: The page HTML; pages past the catalog carry no album links
+        """
+        first = (page - 1) * ALBUMS_PER_PAGE
+        numbers = range(first, min(first + ALBUMS_PER_PAGE, self.albums))
+        if page < 1 or not numbers:
+            return self.index_empty + self.pagination(page) + "</main></body></html>"
+        cards = "\n      ".join(
+            re.sub(r'/[a-z0-9-]+-songs"', f'/{self.slug(number)}-songs"', self.card_template)
+            for number in numbers
+        )
+        tail = re.sub(r'<nav class="pagination">.*?</nav>', self.pagination(page), self.index_tail, flags=re.S)
+        return self.index_head + cards + tail
+
+    def pagination(self, page: int) -> str:
+        """
+        Returns:
+            str: Pagination like the site's: the first pages, the last page and "Next"
+        """
+        current = ' class="current"'
+        links = [
+            f'<a href="/tamil-songs?page={number}"{current if number == page else ""}>{number}</a>'
+            for number in sorted({1, 2, 3, page, self.pages}) if number <= self.pages
+        ]
+        if page < self.pages:
+            links.append(f'<a href="/tamil-songs?page={page + 1}" rel="next" class="next">Next &raquo;</a>')
+        return '<nav class="pagination">\n      ' + "\n      ".join(links) + "\n    </nav>"
+
+    def album_page(self, slug: str) -> str:
+        """
+        Args:
+            slug (str): Album slug
+
+        Returns:
+            str: The recorded album page with its download links pointing at ``slug``
+        """
+        return self.album_template.replace(f"/downloader/{self.recorded_slug}/", f"/downloader/{slug}/")
+
+    def track(self, slug: str, track: str, quality: str) -> bytes:
+        """
+        Returns:
+            bytes: The MP3 served for one download link
+        """
+        art = self._art.get(slug)
+        if art is None:
+            art = self._art[slug] = cover_jpeg(slug)
+        return synthetic_mp3(f"{slug}/{track}/{quality}", self.track_size, art)
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        return max(0, size - int(end)), size - 1
+    return int(start), min(int(end) if end else size - 1, size - 1)
+
+
+def _serve(albums: int, track_size: int, latency: float, ready) -> None:
+    from aiohttp import web
+
+    catalog = Catalog(albums, track_size)
+
+    async def delay():
+        if latency:
+            await asyncio.sleep(latency * random.uniform(0.5, 1.5))
+
+    async def index(request):
+        await delay()
+        page = int(request.query.get("page", "1"))
+        return web.Response(text=catalog.index_page(page), content_type="text/html")
+
+    async def album(request):
+        await delay()
+        text = catalog.album_page(request.match_info["slug"])
+        etag = '"' + hashlib.sha256(text.encode("utf-8")).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=text, content_type="text/html", headers={"ETag": etag})
+
+    async def download(request):
+        await delay()
+        info = request.match_info
+        body = catalog.track(info["slug"], info["track"], info["quality"])
+        headers = {
+            "Content-Disposition": f'attachment; filename="{info["slug"]}-{info["track"]}-{info["quality"]}.mp3"',
+            "Accept-Ranges": "bytes"
+        }
+        byte_range = _byte_range(request.headers.get("Range", ""), len(body))
+        if byte_range is None:
+            return web.Response(body=body, headers=headers, content_type="audio/mpeg")
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+        return web.Response(status=206, body=body[start:end + 1], headers=headers, content_type="audio/mpeg")
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/tamil-songs", index)
+        app.router.add_get("/downloader/{slug}/{track}/{quality}", download)
+        app.router.add_get("/{slug}-songs", album)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        ready.send(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+class CatalogServer:
+    """
+    The synthetic catalog served over HTTP from a child process
+    """
+
+    def __init__(self, albums: int, track_size: int = 256 * 1024, latency: float = 0.0):
+        """
+        Args:
+            albums (int): Albums in the catalog
+            track_size (int): Approximate bytes per MP3
+            latency (float): Mean delay added to every response in seconds
+        """
+        self.albums = albums
+        self.track_size = track_size
+        self.latency = latency
+        self.url: Optional[str] = None
+        self._process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> str:
+        """
+        Returns:
+            str: Base URL of the running server
+        """
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self.albums, self.track_size, self.latency, sender), daemon=True
+        )
+        self._process.start()
+        if not receiver.poll(30):
+            self.stop()
+            raise RuntimeError("Catalog server did not start")
+        self.url = f"http://127.0.0.1:{receiver.recv()}"
+        return self.url
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self) -> "CatalogServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class FakeClient:
+    """
+    Pyrogram ``Client`` stand-in that simulates upload time and FloodWait
+
+    Files given as paths or file objects are read completely, as a real
+    upload would; anything else is treated as a cached file_id and costs
+    only the call latency.
+    """
+    _file_ids = itertools.count(1)
+
+    def __init__(self, name: str = "bench", latency: float = 0.05,
+                 bandwidth: Optional[float] = None, flood_every: int = 0,
+                 flood_seconds: int = 1, **kwargs):
+        """
+        Args:
+            name (str): Client name, as passed to ``Client``
+            latency (float): Mean seconds per API call
+            bandwidth (Optional[float]): Upload bytes per second (unlimited if None)
+            flood_every (int): Raise FloodWait on every Nth call (0 never)
+            flood_seconds (int): Wait demanded by each FloodWait
+            **kwargs: Ignored ``Client`` options (api_id, bot_token, ...)
+        """
+        self.name = name
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.calls = 0
+        self.messages = 0
+        self.bytes_sent = 0
+        self.flood_waits = 0
+
+    async def start(self) -> "FakeClient":
+        return self
+
+    async def stop(self) -> "FakeClient":
+        return self
+
+    async def __aenter__(self) -> "FakeClient":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @staticmethod
+    def _read(media: Any) -> int:
+        if hasattr(media, "read"):
+            media.seek(0)
+            size = 0
+            for chunk in iter(lambda: media.read(512 * 1024), b""):
+                size += len(chunk)
+            return size
+        if isinstance(media, str) and os.path.exists(media):
+            with open(media, "rb") as f:
+                return FakeClient._read(f)
+        return 0
+
+    async def _call(self, *media: Any) -> None:
+        from pyrogram.errors import FloodWait
+
+        self.calls += 1
+        if self.flood_every and self.calls % self.flood_every == 0:
+            self.flood_waits += 1
+            raise FloodWait(value=self.flood_seconds)
+        size = sum(self._read(item) for item in media if item is not None)
+        self.bytes_sent += size
+        seconds = self.latency * random.uniform(0.5, 1.5)
+        if self.bandwidth:
+            seconds += size / self.bandwidth
+        await asyncio.sleep(seconds)
+
+    def _message(self, kind: str) -> Any:
+        self.messages += 1
+        media = types.SimpleNamespace(file_id=f"{self.name}-{next(self._file_ids)}")
+        return types.SimpleNamespace(id=self.messages, **{kind: media})
+
+    async def send_document(self, chat_id: Any, document: Any, thumb: Any = None, **kwargs) -> Any:
+        await self._call(document, thumb)
+        return self._message("document")
+
+    async def send_audio(self, chat_id: Any, audio: Any, thumb: Any = None, **kwargs) -> Any:
+        await self._call(audio, thumb)
+        return self._message("audio")
+
+    async def send_photo(self, chat_id: Any, photo: Any, **kwargs) -> Any:
+        await self._call(photo)
+        return self._message("photo")
+
+    async def send_media_group(self, chat_id: Any, media: List[Any], **kwargs) -> List[Any]:
+        await self._call(*itertools.chain.from_iterable(
+            (item.media, getattr(item, "thumb", None)) for item in media
+        ))
+        return [self._message("document") for _ in media]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: API calls, messages, uploaded bytes and FloodWaits raised
+        """
+        return {
+            "calls": self.calls,
+            "messages": self.messages,
+            "bytes_sent": self.bytes_sent,
+            "flood_waits": self.flood_waits
+        }
+
+
+def bench_database(uri: Optional[str] = None, name: str = "massify_bench"):
+    """
+    Open an empty database for one run
+
+    Args:
+        uri (Optional[str]): MongoDB URI; mongomock is used when None
+        name (str): Database name, dropped first
+
+    Returns:
+        AsyncDatabase: The database wrapper
+    """
+    from database import AsyncDatabase, get_client
+
+    if uri:
+        client = get_client(uri)
+        client.drop_database(name)
+        return AsyncDatabase(client[name])
+
+    import mongomock
+    import mongomock.collection
+
+    # mongomock's bulk API predates the ``sort`` argument pymongo now passes
+    builder = mongomock.collection.BulkOperationBuilder
+    if not getattr(builder, "_bench_shim", False):
+        add_update = builder.add_update
+        builder.add_update = lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+        builder._bench_shim = True
+    # mongomock is not thread-safe; serialize every call on one thread
+    return AsyncDatabase(mongomock.MongoClient()[name], max_workers=1)
+
@@ -1,22 +1,66 @@
 import os
 import json
 import asyncio
+import argparse
 import logging
-import tempfile
-import subprocess
-from typing import Dict, List, Optional
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Set
 
 import pyrogram
 from pymongo import MongoClient
 from pyrogram import Client
+from pyrogram.types import InputMediaDocument
 
 # Improved configuration management
 from config import (
-    API_ID, API_HASH, BOT_TOKEN, 
-    DATABASE, COLLECTION_NAME, DUMP_ID
+    API_ID, API_HASH, BOT_TOKENS, 
+    DATABASE, COLLECTION_NAME, DUMP_ID,
+    SCRAPE_CONCURRENCY, SCRAPE_RATE, SCRAPE_BURST, CRAWL_INTERVAL,
+    DOWNLOAD_CONCURRENCY, SCRAPE_WORKERS, DOWNLOAD_WORKERS, THUMBNAIL_WORKERS,
+    UPLOAD_WORKERS, PIPELINE_QUEUE_SIZE, MAX_INFLIGHT_FILES,
+    PIPELINE_REPORT_INTERVAL, TRACK_DEDUPE, UPLOAD_GLOBAL_RATE,
+    UPLOAD_CHAT_RATE, UPLOAD_CHAT_BURST, UPLOAD_MEDIA_GROUP, WORKER_ID,
+    QUEUE_LEASE, QUEUE_HEARTBEAT, QUEUE_MAX_ATTEMPTS, QUEUE_PREFETCH,
+    QUEUE_POLL_INTERVAL, QUEUE_RETRY_DELAY, CRAWL_LEASE, STREAM_UPLOADS,
+    SPOOL_MAX_MEMORY, SPOOL_BUDGET, DB_WORKERS, METRICS_HOST, METRICS_PORT,
+    LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS, JOURNAL_DIR, BACKFILL_SHARD_SIZE,
+    BACKFILL_CONCURRENCY, BACKFILL_RATE, BACKFILL_LEASE, HTTP_CACHE_DIR,
+    HOST_INITIAL_CONCURRENCY, HOST_MAX_CONCURRENCY, HOST_LATENCY_TARGET,
+    HOST_FAILURE_THRESHOLD, HOST_OPEN_MAX, QUALITY_POLICY, QUALITY_MAX_MB, QUALITY_PROBE,
+    WARM_STATE_DIR, WARM_SEEN_MAX_AGE, require
 )
-from scraper import fetch_main
-from database import connect_to_mongodb, check_db, insert_document
+from backfill import BackfillShards
+from coverart import CoverArtCache
+from crawl_state import CrawlState
+from downloader import DOWNLOAD_BYTES, DownloadManager
+from fileid_cache import FileIdCache
+from hosthealth import HostMonitor
+from httpcache import HttpCache
+import jobstate
+from journal import ScrapeJournal, latest
+from jobs import AlbumJob, CrawlCycle, PageJob, TrackJob
+from logsetup import setup_logging
+import metrics
+from metrics import MetricsServer
+from pipeline import Pipeline
+from quality import QualityPolicy
+from ratelimit import TokenBucket
+from scraper import AsyncScraper, IndexPageError, track_delta
+from track_index import TrackIndex
+from uploader import UploadScheduler
+from warmstate import WarmState
+from workqueue import PRIORITY_BACKFILL, WorkQueue
+from database import (
+    AlbumStore, open_database
+)
+
+# Telegram accepts 2 to 10 items per media group
+MEDIA_GROUP_SIZE = 10
+# Failed backfill shards in a row before a backfill task gives up
+BACKFILL_RETRIES = 5
+
+ALBUMS = metrics.counter("massify_albums_total", "Albums finished, by result")
+REFRESHED = metrics.counter("massify_refresh_albums_total", "Known albums checked for changes, by result")
 
 class MusicDownloader:
     def __init__(self, 
@@ -31,172 +75,920 @@ class MusicDownloader:
             max_retry_attempts (int): Maximum number of download retry attempts
             download_timeout (int): Timeout for downloads in seconds
         """
-        self.db = connect_to_mongodb(DATABASE, database_name)
-        self.collection_name = COLLECTION_NAME
-        self.app = Client(
-            "Massify", 
-            api_id=API_ID, 
-            api_hash=API_HASH, 
-            bot_token=BOT_TOKEN, 
-            workers=10
+        setup_logging(LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS)
+        require("API_ID", "API_HASH", "BOT_TOKEN", "DUMP_ID", "DATABASE", "COLLECTION_NAME")
+        # Sessions and the known-album snapshot of the previous run
+        self.warm = WarmState(WARM_STATE_DIR, WARM_SEEN_MAX_AGE)
+        # One pooled client; every store runs its calls off the event loop
+        self.database = open_database(DATABASE, database_name, max_workers=DB_WORKERS)
+        self.albums = AlbumStore(self.database, COLLECTION_NAME)
+        self.crawl_state = CrawlState(self.database)
+        # One client per bot token; uploads are sharded across all of them
+        self.clients = [
+            Client(
+                "Massify" if index == 0 else f"Massify_{index}", 
+                api_id=API_ID, 
+                api_hash=API_HASH, 
+                bot_token=token, 
+                workers=10,
+                workdir=self.warm.workdir()
+            )
+            for index, token in enumerate(BOT_TOKENS)
+        ]
+        self.app = self.clients[0]
+        self.uploads = UploadScheduler(
+            self.clients,
+            names=[token.split(":")[0] for token in BOT_TOKENS],
+            global_rate=UPLOAD_GLOBAL_RATE,
+            global_burst=UPLOAD_GLOBAL_RATE,
+            chat_rate=UPLOAD_CHAT_RATE / 60,
+            chat_burst=UPLOAD_CHAT_BURST
+        )
+        self.journal = ScrapeJournal(JOURNAL_DIR) if JOURNAL_DIR else None
+        # One view of the source site's health for scraping and downloads
+        self.hosts = HostMonitor(
+            initial_limit=HOST_INITIAL_CONCURRENCY,
+            max_limit=HOST_MAX_CONCURRENCY,
+            latency_target=HOST_LATENCY_TARGET,
+            failure_threshold=HOST_FAILURE_THRESHOLD,
+            open_max=HOST_OPEN_MAX
+        )
+        self.scraper = AsyncScraper(
+            concurrency=SCRAPE_CONCURRENCY,
+            rate=SCRAPE_RATE,
+            burst=SCRAPE_BURST,
+            journal=self.journal,
+            cache=HttpCache(HTTP_CACHE_DIR) if HTTP_CACHE_DIR else None,
+            hosts=self.hosts
         )
         self.max_retry_attempts = max_retry_attempts
         self.download_timeout = download_timeout
-        logging.basicConfig(
-            level=logging.INFO, 
-            format='%(asctime)s - %(levelname)s: %(message)s'
+        self.downloader = DownloadManager(
+            max_concurrent=DOWNLOAD_CONCURRENCY,
+            max_retry_attempts=max_retry_attempts,
+            timeout=download_timeout,
+            spool_memory=SPOOL_MAX_MEMORY if STREAM_UPLOADS else None,
+            spool_budget=SPOOL_BUDGET,
+            hosts=self.hosts
+        )
+        self.quality = QualityPolicy(
+            QUALITY_POLICY, int(QUALITY_MAX_MB * 1024 * 1024), QUALITY_PROBE
+        )
+        self.covers = CoverArtCache()
+        self.file_ids = FileIdCache(self.database, self.uploads.shards[0].name)
+        self.tracks = TrackIndex(self.database)
+        self.jobs = jobstate.JobStateWriter(self.database)
+        # Albums shared with every other worker process on the same database
+        self.queue = WorkQueue(
+            self.database,
+            worker_id=WORKER_ID,
+            lease_seconds=QUEUE_LEASE,
+            heartbeat_interval=QUEUE_HEARTBEAT,
+            max_attempts=QUEUE_MAX_ATTEMPTS,
+            retry_delay=QUEUE_RETRY_DELAY
+        )
+        # Page ranges of the back-catalog backfill and its own index rate
+        self.backfill_shards = BackfillShards(
+            self.database, worker_id=WORKER_ID, lease_seconds=BACKFILL_LEASE
+        )
+        self.backfill_rate = TokenBucket(BACKFILL_RATE)
+        self.pipeline = self._build_pipeline()
+        # Skip tracks already uploaded according to job state and the track
+        # index; a replay into a new channel turns both off
+        self.resume = True
+        self.track_dedupe = TRACK_DEDUPE
+        # Files downloaded but not yet uploaded and removed; the semaphore
+        # is created in main() inside the running event loop
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self.inflight_files = 0
+        self.grouped_files = 0
+        # Albums claimed from the queue and not yet committed
+        self._claims: Optional[asyncio.Semaphore] = None
+        self.metrics_server = MetricsServer(
+            host=METRICS_HOST, port=METRICS_PORT, extra=self.stats
         )
+        self.throughput = metrics.Throughput()
         self.logger = logging.getLogger(__name__)
 
-    def download_with_aria2c(
-        self, 
-        url: str, 
-        output_dir: Optional[str] = None, 
-        filename: Optional[str] = None
-    ) -> str:
+    def _progress_logger(self, name: str, quality: str):
         """
-        Download file using aria2c with enhanced error handling and flexibility
+        Build a download progress callback that logs every 25%
         
         Args:
-            url (str): URL of the file to download
-            output_dir (Optional[str]): Directory to save downloaded file
-            filename (Optional[str]): Specific filename for the download
+            name (str): Song name
+            quality (str): Download quality label
+        """
+        state = {"next": 25}
+
+        def progress(received: int, total: int) -> None:
+            percent = received * 100 // total if total else 0
+            if percent >= state["next"]:
+                self.logger.info(f"{name} ({quality}): {percent}%")
+                state["next"] = (percent // 25 + 1) * 25
+
+        return progress
+
+    def _build_pipeline(self) -> Pipeline:
+        """
+        Wire the stages: discover -> (work queue) -> scrape -> download ->
+        thumbnail -> upload -> commit
+        """
+        pipeline = Pipeline()
+        pipeline.add_stage("discover", self._discover, workers=1,
+                           on_error=self._discover_failed)
+        pipeline.add_stage("scrape", self._scrape, workers=SCRAPE_WORKERS,
+                           maxsize=PIPELINE_QUEUE_SIZE, on_error=self._album_failed)
+        pipeline.add_stage("download", self._download, workers=DOWNLOAD_WORKERS,
+                           maxsize=PIPELINE_QUEUE_SIZE, on_error=self._track_failed)
+        pipeline.add_stage("thumbnail", self._thumbnail, workers=THUMBNAIL_WORKERS,
+                           maxsize=PIPELINE_QUEUE_SIZE, on_error=self._track_failed)
+        pipeline.add_stage("upload", self._upload, workers=UPLOAD_WORKERS,
+                           maxsize=PIPELINE_QUEUE_SIZE, on_error=self._track_failed)
+        # Unbounded: commit must always accept finished albums, or a full
+        # queue would stall the upload workers that release in-flight slots
+        pipeline.add_stage("commit", self._commit, workers=1,
+                           on_error=self._commit_failed)
+        return pipeline
+
+    def stats(self) -> Dict:
+        """
+        Current pipeline queue depths and in-flight file usage
         
         Returns:
-            str: Path to the downloaded file
+            Dict: Per-stage stats plus the in-flight file count and limit
         """
-        if output_dir is None:
-            output_dir = tempfile.mkdtemp()
-        
-        os.makedirs(output_dir, exist_ok=True)
-        
-        cmd = [
-            'aria2c',
-            url,
-            '-d', output_dir,
-            '--max-concurrent-downloads=1',
-            '--max-connection-per-server=5',
-            '--min-split-size=1M',
-            '--allow-overwrite=true',
-            '--timeout=30',  # Added connection timeout
-            '--connect-timeout=10'
+        return {
+            "stages": self.pipeline.stats(),
+            "inflight_files": self.inflight_files,
+            "max_inflight_files": MAX_INFLIGHT_FILES,
+            "file_ids": self.file_ids.stats(),
+            "tracks": self.tracks.stats(),
+            "job_state": self.jobs.stats(),
+            "queue": self.queue.stats(),
+            "database": self.database.stats(),
+            "uploads": self.uploads.stats(),
+            "hosts": self.hosts.stats(),
+            "albums_per_hour": round(
+                ALBUMS.total(result="done") / self.throughput.uptime * 3600, 2
+            )
+        }
+
+    def summary(self) -> Dict:
+        """
+        Throughput since the previous summary plus every recorded metric
+
+        Returns:
+            Dict: Recent albums per hour and download bytes per second,
+            lifetime albums per hour, and the metrics snapshot
+        """
+        rates = self.throughput.update({
+            "albums": ALBUMS.total(result="done"),
+            "bytes": DOWNLOAD_BYTES.total()
+        })
+        return {
+            "uptime_s": round(self.throughput.uptime),
+            "albums_per_hour": round(rates["albums"] * 3600, 2),
+            "albums_per_hour_total": self.stats()["albums_per_hour"],
+            "download_bytes_per_s": round(rates["bytes"]),
+            "metrics": metrics.REGISTRY.snapshot()
+        }
+
+    async def _report_stats(self) -> None:
+        while True:
+            await asyncio.sleep(PIPELINE_REPORT_INTERVAL)
+            stats = self.stats()
+            depths = ", ".join(
+                f"{name}={stage['queued']}/{stage['active']}"
+                for name, stage in stats["stages"].items()
+            )
+            self.logger.info(
+                f"Pipeline queued/active: {depths}; "
+                f"files in flight: {stats['inflight_files']}/{stats['max_inflight_files']}; "
+                f"file_id cache: {stats['file_ids']['hits']} hits, "
+                f"{stats['file_ids']['misses']} misses, "
+                f"{stats['file_ids']['bytes_saved']} bytes saved; "
+                f"duplicate tracks skipped: "
+                f"{stats['tracks']['skipped_before_download']} before download, "
+                f"{stats['tracks']['skipped_after_download']} after; "
+                f"FloodWaits: {sum(bot['flood_waits'] for bot in stats['uploads'].values())}; "
+                f"queue: {stats['queue']['held']} albums held, "
+                f"{stats['queue']['completed']} completed, {stats['queue']['failed']} failed; "
+                f"database calls: {sum(op['count'] for op in stats['database'].values())}, "
+                f"slowest mean: {max((op['avg_ms'] for op in stats['database'].values()), default=0)}ms"
+            )
+            self.logger.info(f"Summary: {json.dumps(self.summary(), default=str)}")
+
+    async def _discover(self, page: PageJob) -> None:
+        """
+        Fetch one index page, queue its unknown albums and decide whether
+        to continue with the next page
+        """
+        cycle = page.cycle
+        index = await self.scraper.index_page(page.page)
+        urls = index.albums
+        if not urls and not index.past_end:
+            # A changed layout or an error page, not the end of the catalog;
+            # the crawl resumes at this page on its next attempt
+            raise IndexPageError(f"No albums found on index page {page.page}")
+        known = await asyncio.gather(*(self.albums.exists(url) for url in urls))
+        new_urls = [url for url, exists in zip(urls, known) if not exists]
+        # Albums another worker already queued count as known
+        queued = await self.queue.enqueue(new_urls, page=page.page)
+        if not urls:
+            self.logger.info(f"Page {page.page} is past the end of the index, stopping")
+        elif not queued:
+            self.logger.info(f"Page {page.page} is fully known, stopping")
+        else:
+            if cycle.newest is None:
+                cycle.newest = {"url": urls[0], "page": page.page}
+            cycle.queued += queued
+            await cycle.pages.put(page)
+
+            if cycle.watermark_url in urls:
+                self.logger.info(f"Reached watermark on page {page.page}, stopping")
+            elif index.is_last:
+                self.logger.info(f"Reached last page {page.page}")
+            else:
+                await self.pipeline.put("discover", PageJob(cycle, index.next_page))
+                return
+        await cycle.pages.put(None)
+
+    async def _discover_failed(self, page: PageJob, error: Exception) -> None:
+        page.cycle.error = error
+        await page.cycle.pages.put(None)
+
+    async def _scrape(self, album: AlbumJob) -> None:
+        if album.record is None:
+            album.record = await self.scraper.scrape_album(album.url)
+        songs = album.record.get("songs", [])
+        chosen = await asyncio.gather(*(self._select_links(song) for song in songs))
+        album.tracks = [
+            TrackJob(album, song, link)
+            for song, links in zip(songs, chosen)
+            for link in links
         ]
+
+        # Resume an album interrupted by a crash at its first unfinished track
+        states = await self.jobs.load_album(album.url) if self.resume else {}
+        pending = [
+            track for track in album.tracks
+            if states.get(track.link.get('url'), {}).get("status") not in jobstate.FINISHED
+        ]
+        if len(pending) < len(album.tracks):
+            self.logger.info(
+                f"Resuming {album.url}: {len(album.tracks) - len(pending)} "
+                f"of {len(album.tracks)} tracks already done"
+            )
+        album.remaining = len(pending)
+        if not pending:
+            await self.pipeline.put("commit", album)
+        for track in pending:
+            await self.jobs.set(track.link.get('url'), album.url, jobstate.PENDING)
+        for track in pending:
+            await self.pipeline.put("download", track)
+
+    async def _select_links(self, song: Dict) -> List[Dict]:
+        """
+        Apply the quality policy to a song's download links, probing them
+        first so dead and oversized files are never downloaded
+        """
+        links = song.get("download_links", [])
+        probes = None
+        if self.quality.probe and links:
+            probes = await asyncio.gather(*(self.downloader.probe(link.get('url')) for link in links))
+        chosen = self.quality.select(links, probes)
+        if len(chosen) < len(links):
+            self.logger.info(
+                f"{song.get('name')}: downloading {', '.join(link.get('quality', '?') for link in chosen) or 'nothing'} "
+                f"of {len(links)} qualities"
+            )
+        return chosen
+
+    async def _album_failed(self, album: AlbumJob, error: Exception) -> None:
+        self.logger.error(f"Error processing {album.url}: {error}")
+        album.error = error
+        album.record = None
+        await self.pipeline.put("commit", album)
+
+    async def _download(self, track: TrackJob) -> None:
+        url = track.link.get('url')
+        if self.track_dedupe:
+            # Two small ranged requests instead of the whole file
+            fingerprint = await self.downloader.probe_fingerprint(url)
+            if fingerprint and await self.tracks.find_fingerprint(fingerprint):
+                self.tracks.skipped_before_download += 1
+                self.logger.info(f"Skipping known track {track.name} ({track.quality})")
+                await self.jobs.set(url, track.album.url, jobstate.SKIPPED, fingerprint=fingerprint)
+                await self._finish_track(track)
+                return
+
+        # Bound the number of files held on disk or in memory; released in _finish_track
+        await self._inflight.acquire()
+        track.holds_slot = True
+        self.inflight_files += 1
+        handle = self.downloader.submit(
+            url,
+            progress=self._progress_logger(track.name, track.quality)
+        )
+        track.file = await handle
+        track.sha256 = handle.sha256
+        track.fingerprint = handle.fingerprint
+        track.size = handle.received
+
+        if self.track_dedupe and await self.tracks.find_sha256(track.sha256):
+            self.tracks.skipped_after_download += 1
+            self.logger.info(f"Skipping known track {track.name} ({track.quality})")
+            await self.jobs.set(url, track.album.url, jobstate.SKIPPED, sha256=track.sha256)
+            await self._finish_track(track)
+            return
+        await self.jobs.set(url, track.album.url, jobstate.DOWNLOADED, sha256=track.sha256)
+        await self.pipeline.put("thumbnail", track)
+
+    async def _thumbnail(self, track: TrackJob) -> None:
+        # One thumbnail per album, shared by all of its tracks
+        track.thumb = await self.covers.get(track.album.url, track.file)
+        await self.pipeline.put("upload", track)
+
+    async def _upload(self, track: TrackJob) -> None:
+        if UPLOAD_MEDIA_GROUP:
+            track.album.ready.append(track)
+            self.grouped_files += 1
+            await self._flush_album(track.album)
+        else:
+            await self._upload_track(track)
+
+    async def _send_cover(self, track: TrackJob) -> None:
+        # Every API call goes through the scheduler, which picks a bot and
+        # applies rate limits and FloodWait; identical bytes are sent by
+        # that bot's cached file_id instead of uploaded again
+        await self.uploads.submit(DUMP_ID, lambda shard: self.file_ids.send(
+            "photo", track.thumb, lambda photo: shard.client.send_photo(
+                DUMP_ID, 
+                photo=photo, 
+                caption=track.album.caption
+            ), owner=shard.name
+        ))
+
+    async def _upload_track(self, track: TrackJob, cover: bool = True) -> None:
+        """
+        Send one track as its own message, preceded by the album cover
+        """
+        if cover and track.thumb:
+            await self._send_cover(track)
         
-        if filename:
-            cmd.extend(['-o', filename])
-        
-        for attempt in range(self.max_retry_attempts):
-            try:
-                result = subprocess.run(
-                    cmd, 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=self.download_timeout,
-                    check=True
+        # A cached document keeps its original thumbnail, so thumb is only
+        # uploaded together with new audio
+        message = await self.uploads.submit(DUMP_ID, lambda shard: self.file_ids.send(
+            "document", track.file, lambda document: shard.client.send_document(
+                DUMP_ID, 
+                document=document, 
+                caption=track.caption, 
+                thumb=track.thumb
+            ), digest=track.sha256, size=track.size, owner=shard.name
+        ))
+        await self._track_uploaded(track, message)
+
+    async def _flush_album(self, album: AlbumJob) -> None:
+        """
+        Send the album's ready tracks as media groups once a group is full,
+        no more tracks of the album can arrive, or every in-flight file slot
+        is held by a waiting track (so downloads can never stall on slots)
+        """
+        while album.ready and (
+            len(album.ready) >= MEDIA_GROUP_SIZE
+            or album.expecting <= 0
+            or self.grouped_files >= MAX_INFLIGHT_FILES
+        ):
+            batch = album.ready[:MEDIA_GROUP_SIZE]
+            del album.ready[:MEDIA_GROUP_SIZE]
+            self.grouped_files -= len(batch)
+            await self._upload_group(batch)
+
+    async def _upload_group(self, batch: List[TrackJob]) -> None:
+        """
+        Send tracks of one album in a single ``send_media_group`` call with
+        the album metadata on the first item, falling back to one message
+        per track if the group is rejected
+        """
+        album = batch[0].album
+        thumb = next((track.thumb for track in batch if track.thumb), None)
+        if len(batch) == 1:
+            # Media groups need at least two items
+            cover = bool(thumb) and not album.cover_sent
+            album.cover_sent = album.cover_sent or cover
+            await self._guarded_upload(batch[0], cover)
+            return
+
+        def media(files: List[str]) -> List[InputMediaDocument]:
+            return [
+                InputMediaDocument(
+                    file,
+                    thumb=track.thumb,
+                    caption=f"{album.caption}\n\n{track.caption}" if index == 0 else track.caption
                 )
-                
-                downloaded_files = os.listdir(output_dir)
-                if not downloaded_files:
-                    raise RuntimeError("No file was downloaded")
-                
-                downloaded_file = os.path.join(output_dir, downloaded_files[0])
-                
-                if not os.path.exists(downloaded_file) or os.path.getsize(downloaded_file) == 0:
-                    raise RuntimeError("Download failed or resulted in an empty file")
-                
-                return downloaded_file
-            
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-                self.logger.warning(f"Download attempt {attempt + 1} failed: {str(e)}")
-                if attempt == self.max_retry_attempts - 1:
-                    raise RuntimeError(f"Download failed after {self.max_retry_attempts} attempts")
-    
-    async def process_song(self, song: Dict, app: Client, dump_id: int) -> None:
-        """
-        Process and upload a single song
-        
+                for index, (file, track) in enumerate(zip(files, batch))
+            ]
+
+        album.uploading += len(batch)
+        messages = None
+        try:
+            if thumb and not album.cover_sent:
+                await self._send_cover(batch[0])
+                album.cover_sent = True
+            messages = await self.uploads.submit(DUMP_ID, lambda shard: self.file_ids.send_group(
+                "document",
+                [(track.file, track.sha256, track.size) for track in batch],
+                lambda files: shard.client.send_media_group(DUMP_ID, media(files)),
+                owner=shard.name
+            ))
+        except Exception as e:
+            self.logger.warning(
+                f"Media group of {len(batch)} tracks from {album.url} failed, "
+                f"sending them one by one: {e}"
+            )
+        finally:
+            album.uploading -= len(batch)
+
+        if messages is None:
+            for track in batch:
+                await self._guarded_upload(track, cover=False)
+            return
+        for track, message in zip(batch, messages):
+            await self._track_uploaded(track, message)
+
+    async def _guarded_upload(self, track: TrackJob, cover: bool) -> None:
+        # Keeps one failed track from taking the rest of its group with it
+        try:
+            await self._upload_track(track, cover)
+        except Exception as e:
+            await self._track_failed(track, e)
+
+    async def _track_uploaded(self, track: TrackJob, message) -> None:
+        await self.jobs.set(
+            track.link.get('url'), track.album.url, jobstate.UPLOADED,
+            message_id=getattr(message, "id", None)
+        )
+        await self.tracks.record(
+            track.sha256, track.fingerprint, track.size, track.link.get('url'),
+            track.album.url, track.name, track.quality
+        )
+        await self._finish_track(track)
+
+    async def _track_failed(self, track: TrackJob, error: Exception) -> None:
+        track.error = error
+        self.logger.error(f"Error processing song {track.name} ({track.quality}): {error}")
+        await self.jobs.set(track.link.get('url'), track.album.url, jobstate.FAILED, error=str(error))
+        await self._finish_track(track)
+
+    async def _finish_track(self, track: TrackJob) -> None:
+        """
+        Remove the track's file or close its spool, free its in-flight slot and hand the
+        album to the commit stage once all of its tracks are finished
+        """
+        if isinstance(track.file, str):
+            if os.path.exists(track.file):
+                os.remove(track.file)
+        elif track.file is not None:
+            track.file.close()
+        if track.holds_slot:
+            track.holds_slot = False
+            self.inflight_files -= 1
+            self._inflight.release()
+        if track.album.track_finished():
+            await self.pipeline.put("commit", track.album)
+        elif track.album.ready:
+            # A skipped or failed track may leave the waiting tracks as the
+            # album's last ones
+            await self._flush_album(track.album)
+
+    async def _commit(self, album: AlbumJob) -> None:
+        failed = {track.link.get('url') for track in album.tracks if track.error is not None}
+        try:
+            if album.refresh is not None:
+                if album.error is None:
+                    # New tracks of a known album are posted; store its new state
+                    # without the failed ones, so the next refresh offers them again
+                    await self.albums.update(self._without_links(album.refresh, failed))
+                ALBUMS.inc(result="failed" if failed or album.error is not None else "done")
+            elif album.record is not None and not failed:
+                # Insert processed item to database
+                await self.albums.insert(album.record)
+                if not album.replayed:
+                    await self.queue.complete(album.url)
+                ALBUMS.inc(result="done")
+            else:
+                # Not stored, so the album is claimed again and resumes at its
+                # failed tracks through job state; a replay is simply run again
+                error = str(album.error)
+                if failed:
+                    first = next(track.error for track in album.tracks if track.error is not None)
+                    error = f"{len(failed)} tracks failed, first: {first}"
+                if not album.replayed:
+                    await self.queue.fail(album.url, error, album.attempts)
+                ALBUMS.inc(result="failed")
+        finally:
+            self.covers.discard(album.url)
+            self._claims.release()
+
+    @staticmethod
+    def _without_links(record: Dict, urls: Set[str]) -> Dict:
+        """
+        Album record minus the given download links
+
         Args:
-            song (Dict): Song metadata dictionary
-            app (Client): Pyrogram client instance
-            dump_id (int): Telegram dump channel/group ID
+            record (Dict): Album record
+            urls (Set[str]): Download link URLs to leave out
+
+        Returns:
+            Dict: ``record`` itself when ``urls`` is empty; otherwise a copy
+            without those links and without ``page_sha256``, so the next
+            refresh parses the page even though it has not changed
         """
-        for download in song.get("download_links", []):
-            try:
-                file_path = self.download_with_aria2c(download.get('url'))
-                
-                # Generate thumbnail
-                thumb = f"{song.get('name')}_thumb.png"
-                subprocess.run([
-                    "ffmpeg", 
-                    "-i", file_path, 
-                    "-an", 
-                    "-c:v", "copy", 
-                    thumb
-                ], check=True)
-                
-                # Prepare captions
-                movie_caption = "Metadata:\n" + "\n".join(
-                    f"{k}: {v}" for k, v in song.get("movie_info", {}).items()
-                )
-                song_caption = f"{song.get('name')}\nQuality: {download.get('quality')}"
-                
-                # Upload thumbnail
-                await app.send_photo(
-                    dump_id, 
-                    photo=thumb, 
-                    caption=movie_caption
-                )
-                
-                # Upload song
-                await app.send_document(
-                    dump_id, 
-                    document=file_path, 
-                    caption=song_caption, 
-                    thumb=thumb
-                )
-                
-                # Clean up temporary files
-                os.remove(file_path)
-                os.remove(thumb)
-                
-            except Exception as e:
-                self.logger.error(f"Error processing song {song.get('name')}: {e}")
+        if not urls:
+            return record
+        songs = [
+            dict(song, download_links=[
+                link for link in song.get('download_links', []) if link.get('url') not in urls
+            ])
+            for song in record.get('songs', [])
+        ]
+        return dict(record, songs=songs, page_sha256=None)
+
+    async def _commit_failed(self, album: AlbumJob, error: Exception) -> None:
+        self.logger.error(f"Error committing {album.url}: {error}")
+
+    async def crawl(self) -> int:
+        """
+        Run one incremental pass over the newest-first index
+
+        Paging starts at the resume cursor (page 1 for a fresh cycle) and
+        stops at the first page without albums new to the queue, at the
+        page holding the previous cycle's watermark, or at the end of the
+        index. Albums are only queued here; the cursor moves past a page
+        once its albums are safely in the work queue.
+
+        Returns:
+            int: Number of new albums queued
+        """
+        cursor, watermark = await asyncio.gather(
+            self.crawl_state.load_cursor(), self.crawl_state.load_watermark()
+        )
+        cursor, watermark = cursor or {}, watermark or {}
+        cycle = CrawlCycle(cursor.get("newest"), watermark.get("url"))
+        await self.pipeline.put("discover", PageJob(cycle, cursor.get("page", 1)))
+
+        while True:
+            page = await cycle.pages.get()
+            if page is None:
+                break
+            await self.crawl_state.save_cursor(page.page + 1, cycle.newest)
+            await self.crawl_state.acquire_lease(self.queue.worker_id, CRAWL_LEASE)
+
+        if cycle.error is not None:
+            raise cycle.error
+        if cycle.newest is not None:
+            await self.crawl_state.save_watermark(cycle.newest["url"], cycle.newest["page"])
+        await self.crawl_state.clear_cursor()
+        return cycle.queued
+
+    async def _crawl_due(self) -> bool:
+        """
+        Whether the fleet needs a crawl: one was interrupted, or the last
+        one finished more than ``CRAWL_INTERVAL`` seconds ago
+        """
+        if await self.crawl_state.load_cursor():
+            return True
+        finished_at = await self.crawl_state.load_finished_at()
+        if finished_at is None:
+            return True
+        return (datetime.now(timezone.utc) - finished_at).total_seconds() >= CRAWL_INTERVAL
+
+    async def _feed(self) -> None:
+        """
+        Claim albums from the work queue into the pipeline, holding at most
+        ``QUEUE_PREFETCH`` at a time so other workers get their share
+        """
+        while True:
+            await self._claims.acquire()
+            job = await self.queue.claim()
+            if job is None:
+                self._claims.release()
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                continue
+            await self.pipeline.put("scrape", AlbumJob(job["_id"], job.get("attempts", 1)))
 
     async def main(self):
         """
         Main async method to scrape, download, and upload songs
+
+        Every worker process processes albums from the shared queue; the
+        one holding the crawl lease also queues new albums when a crawl is due.
+        """
+        self._inflight = asyncio.Semaphore(MAX_INFLIGHT_FILES)
+        self._claims = asyncio.Semaphore(QUEUE_PREFETCH)
+        worker_id = self.queue.worker_id
+        await asyncio.gather(
+            self.database.setup(self.albums, self.tracks, self.jobs, self.queue),
+            self.warm.restore_seen(self.albums)
+        )
+        async with self.metrics_server, self.uploads, self.scraper, self.downloader, \
+                self.jobs, self.queue, self.pipeline:
+            reporter = asyncio.ensure_future(self._report_stats())
+            feeder = asyncio.ensure_future(self._feed())
+            try:
+                while True:
+                    if await self._crawl_due() and await self.crawl_state.acquire_lease(worker_id, CRAWL_LEASE):
+                        try:
+                            queued = await self.crawl()
+                            self.logger.info(f"Queued {queued} new albums")
+                        except Exception as e:
+                            self.logger.error(f"Crawl error: {e}")
+                        finally:
+                            await self.crawl_state.release_lease(worker_id)
+                    # Check again later; an interrupted crawl resumes from the cursor
+                    await asyncio.sleep(60)
+            finally:
+                feeder.cancel()
+                reporter.cancel()
+                self.covers.close()
+                if self.journal is not None:
+                    self.journal.close()
+                self.warm.save_seen(self.albums.seen)
+        self.database.close()
+
+    async def replay(self, since: Optional[date] = None, until: Optional[date] = None,
+                     year: Optional[str] = None, language: Optional[str] = None,
+                     fresh: bool = False) -> int:
+        """
+        Deliver albums from the scrape journal without fetching any page
+
+        The newest journaled record of each matching album goes straight to
+        the download stage. By default tracks already uploaded (job state)
+        or known by content (track index) are skipped, which fills gaps in
+        the current channel; ``fresh`` sends everything again, for example
+        to populate a new ``DUMP_ID``.
+
+        Args:
+            since (Optional[date]): Only albums fetched on or after this UTC day
+            until (Optional[date]): Only albums fetched on or before this UTC day
+            year (Optional[str]): Only albums of this release year
+            language (Optional[str]): Only albums in this language
+            fresh (bool): Ignore job state and track deduplication
+
+        Returns:
+            int: Number of albums replayed
+        """
+        if self.journal is None:
+            raise RuntimeError("Replay needs JOURNAL_DIR")
+        records = await asyncio.to_thread(
+            lambda: latest(self.journal.read(since, until, year, language))
+        )
+        self.logger.info(f"Replaying {len(records)} albums from {self.journal.directory}")
+        self.resume = not fresh
+        self.track_dedupe = TRACK_DEDUPE and not fresh
+        self._inflight = asyncio.Semaphore(MAX_INFLIGHT_FILES)
+        self._claims = asyncio.Semaphore(QUEUE_PREFETCH)
+        await self.database.setup(self.albums, self.tracks, self.jobs)
+        async with self.metrics_server, self.uploads, self.downloader, self.jobs, self.pipeline:
+            reporter = asyncio.ensure_future(self._report_stats())
+            try:
+                for record in records:
+                    await self._claims.acquire()
+                    await self.pipeline.put("scrape", AlbumJob(record["url"], record=record))
+                # Every slot comes back once its album is committed
+                for _ in range(QUEUE_PREFETCH):
+                    await self._claims.acquire()
+            finally:
+                reporter.cancel()
+                self.covers.close()
+        self.database.close()
+        return len(records)
+
+    async def backfill(self, shard_size: int = BACKFILL_SHARD_SIZE,
+                       concurrency: int = BACKFILL_CONCURRENCY, restart: bool = False) -> int:
+        """
+        Queue every album of the back catalog that is not in the database yet
+
+        The page count of the index is read from its pagination and the
+        pages are planned as shards of ``shard_size`` pages, which
+        ``concurrency`` tasks (and any other process running a backfill on
+        the same database) work through under one ``BACKFILL_RATE`` limit.
+        Progress is checkpointed after every page, so a stopped backfill
+        continues where it left off; ``restart`` plans it from scratch.
+
+        Albums are queued with backfill priority and delivered by the
+        regular workers, which always claim newly released albums first.
+
+        Args:
+            shard_size (int): Index pages per shard
+            concurrency (int): Shards processed at once
+            restart (bool): Discard the progress of earlier backfills
+
+        Returns:
+            int: Number of albums queued by this run
         """
-        async with self.app:
-            page = 1
-            while True:
-                try:
-                    data = fetch_main(page)
-                    if len(data) != 10:
-                        self.logger.info("Reached end of pages. Waiting 1 hour...")
-                        await asyncio.sleep(3600)
-                        page = 1
-                        continue
-
-                    for item in data:
-                        if not check_db(self.db, self.collection_name, item.get('url')):
-                            # Process songs in parallel
-                            await asyncio.gather(*(
-                                self.process_song(song, self.app, DUMP_ID) 
-                                for song in item.get("songs", [])
-                            ))
-                            
-                            # Insert processed item to database
-                            insert_document(self.db, self.collection_name, item)
-                            page += 1
-
-                except Exception as e:
-                    self.logger.error(f"Processing error on page {page}: {e}")
-                    await asyncio.sleep(60)  # Wait before retry
+        await asyncio.gather(
+            self.database.setup(self.albums, self.queue, self.backfill_shards),
+            self.warm.restore_seen(self.albums)
+        )
+        async with self.metrics_server, self.scraper:
+            if restart:
+                await self.backfill_shards.reset()
+            pages = await self.scraper.page_count()
+            planned = await self.backfill_shards.plan(pages, shard_size)
+            self.logger.info(f"Backfilling {pages} index pages, {planned} new shards planned")
+            queued = await asyncio.gather(*(self._backfill_shards(pages) for _ in range(concurrency)))
+            progress = await self.backfill_shards.progress()
+            self.logger.info(
+                f"Backfill queued {sum(queued)} albums; {progress['pages_done']}/{progress['pages']} pages, "
+                f"{progress['done']} shards done, {progress['pending'] + progress['running']} left"
+            )
+        self.warm.save_seen(self.albums.seen)
+        self.database.close()
+        return sum(queued)
+
+    async def _backfill_shards(self, total_pages: int) -> int:
+        """
+        Claim shards and queue the unknown albums of their pages until none
+        is left
+
+        A shard that fails on one of its pages is given back at its
+        checkpoint and claimed again after a backoff; only
+        ``BACKFILL_RETRIES`` failures in a row stop this task.
+
+        Args:
+            total_pages (int): Pages of the index; the shard ending there has no next shard to overlap
+
+        Returns:
+            int: Number of albums queued
+        """
+        queued = 0
+        failures = 0
+        while True:
+            shard = await self.backfill_shards.claim()
+            if shard is None:
+                return queued
+            shard_id, page, total = shard["_id"], shard["next_page"], shard["queued"]
+            # New releases push every album down the index while the
+            # backfill runs, so each shard also reads the next shard's
+            # first page to catch albums shifted across the boundary
+            last = shard["end"] + 1 if shard["end"] < total_pages else shard["end"]
+            try:
+                leased = True
+                while page <= last:
+                    await self.backfill_rate.acquire()
+                    try:
+                        index = await self.scraper.index_page(page)
+                    except Exception as e:
+                        if page <= shard["end"]:
+                            raise
+                        # The overlap page only catches shifted albums; its
+                        # own shard reads it again
+                        self.logger.warning(f"Skipping overlap page {page} of backfill shard {shard_id}: {e}")
+                        break
+                    urls = index.albums
+                    if not urls and not index.past_end and page <= shard["end"]:
+                        raise IndexPageError(f"No albums found on index page {page}")
+                    known = await asyncio.gather(*(self.albums.exists(url) for url in urls))
+                    count = await self.queue.enqueue(
+                        [url for url, exists in zip(urls, known) if not exists],
+                        page=page, priority=PRIORITY_BACKFILL
+                    )
+                    total += count
+                    queued += count
+                    page += 1
+                    leased = await self.backfill_shards.checkpoint(shard_id, page, total)
+                    if not leased:
+                        self.logger.warning(f"Lost the lease on backfill shard {shard_id}")
+                        break
+                    if not urls:
+                        # Past the end of the index
+                        break
+                if leased:
+                    await self.backfill_shards.complete(shard_id)
+                    self.logger.info(f"Backfill shard {shard_id} done, {total} albums queued")
+                failures = 0
+            except Exception as e:
+                failures += 1
+                self.logger.error(f"Backfill of shard {shard_id} stopped at page {page}: {e}")
+                await self.backfill_shards.release(shard_id)
+                if failures >= BACKFILL_RETRIES:
+                    self.logger.error(f"Giving up after {failures} failed shards in a row")
+                    return queued
+                await asyncio.sleep(min(BACKFILL_LEASE, 2 ** failures))
+
+    async def refresh(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Post the tracks that known albums gained since they were posted
+
+        Every stored album page is revalidated with a conditional GET
+        against the HTTP cache. Only a page that differs from the stored
+        record is parsed; its download links are compared with the stored
+        ones and just the new or changed tracks go through download and
+        upload. A changed "Last Updated" date without new links only
+        updates the stored record.
+
+        Args:
+            limit (Optional[int]): Check at most this many albums
+
+        Returns:
+            Dict[str, int]: Albums per result: ``unchanged``, ``updated`` or ``new_tracks``
+        """
+        await self.database.setup(self.albums, self.tracks, self.jobs)
+        known = await self.albums.find(
+            {}, {"_id": 0, "url": 1, "songs": 1, "movie_info": 1, "page_sha256": 1}
+        )
+        known = known[:limit] if limit else known
+        self.logger.info(f"Checking {len(known)} known albums for new tracks")
+        self._inflight = asyncio.Semaphore(MAX_INFLIGHT_FILES)
+        self._claims = asyncio.Semaphore(QUEUE_PREFETCH)
+        results: Dict[str, int] = {}
+        async with self.metrics_server, self.uploads, self.scraper, self.downloader, \
+                self.jobs, self.pipeline:
+            reporter = asyncio.ensure_future(self._report_stats())
+            try:
+                for start in range(0, len(known), SCRAPE_CONCURRENCY):
+                    batch = known[start:start + SCRAPE_CONCURRENCY]
+                    for stored, result in zip(batch, await asyncio.gather(
+                        *(self._refresh_album(stored) for stored in batch), return_exceptions=True
+                    )):
+                        if isinstance(result, Exception):
+                            self.logger.error(f"Could not refresh {stored['url']}: {result}")
+                            result = "failed"
+                        REFRESHED.inc(result=result)
+                        results[result] = results.get(result, 0) + 1
+                # Every slot comes back once its album is committed
+                for _ in range(QUEUE_PREFETCH):
+                    await self._claims.acquire()
+            finally:
+                reporter.cancel()
+                self.covers.close()
+        self.database.close()
+        self.logger.info(f"Refresh finished: {json.dumps(results)}")
+        return results
+
+    async def _refresh_album(self, stored: Dict) -> str:
+        """
+        Check one known album and queue its new tracks for posting
+
+        Returns:
+            str: ``unchanged``, ``updated`` or ``new_tracks``
+        """
+        fresh = await self.scraper.rescrape_album(stored["url"], stored.get("page_sha256"))
+        if fresh is None:
+            return "unchanged"
+        delta = track_delta(stored, fresh)
+        if not delta["songs"]:
+            # Remember the page so the next refresh can skip it unparsed
+            await self.albums.update(fresh)
+            last_updated = (stored.get("movie_info") or {}).get("Last Updated")
+            return "unchanged" if fresh["movie_info"].get("Last Updated") == last_updated else "updated"
+        self.logger.info(
+            f"{stored['url']}: {sum(len(song['download_links']) for song in delta['songs'])} new tracks"
+        )
+        await self._claims.acquire()
+        await self.pipeline.put("scrape", AlbumJob(stored["url"], record=delta, refresh=fresh))
+        return "new_tracks"
 
 def main():
     """Entry point for the script"""
+    parser = argparse.ArgumentParser(description="Post masstamilan albums to Telegram")
+    commands = parser.add_subparsers(dest="command")
+    replay = commands.add_parser(
+        "replay", help="deliver albums from the scrape journal without scraping"
+    )
+    replay.add_argument("--since", type=date.fromisoformat, help="first fetch day, YYYY-MM-DD")
+    replay.add_argument("--until", type=date.fromisoformat, help="last fetch day, YYYY-MM-DD")
+    replay.add_argument("--year", help="release year from the album's movie info")
+    replay.add_argument("--language", help="language from the album's movie info")
+    replay.add_argument("--fresh", action="store_true",
+                        help="send every track again, e.g. to a new DUMP_ID")
+    backfill = commands.add_parser(
+        "backfill", help="queue the back catalog in checkpointed page shards"
+    )
+    backfill.add_argument("--shard-size", type=int, default=BACKFILL_SHARD_SIZE,
+                          help="index pages per shard")
+    backfill.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY,
+                          help="shards processed at once")
+    backfill.add_argument("--restart", action="store_true",
+                          help="discard the progress of earlier backfills")
+    refresh = commands.add_parser(
+        "refresh", help="post tracks that known albums gained since they were posted"
+    )
+    refresh.add_argument("--limit", type=int, help="check at most this many albums")
+    args = parser.parse_args()
+
     downloader = MusicDownloader()
-    downloader.app.run(downloader.main())
+    if args.command == "refresh":
+        downloader.app.run(downloader.refresh(args.limit))
+    elif args.command == "backfill":
+        downloader.app.run(downloader.backfill(args.shard_size, args.concurrency, args.restart))
+    elif args.command == "replay":
+        downloader.app.run(downloader.replay(
+            args.since, args.until, args.year, args.language, args.fresh
+        ))
+    else:
+        downloader.app.run(downloader.main())
 
 if __name__ == "__main__":
     main()
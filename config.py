@@ -3,9 +3,141 @@ import os
 
 load_dotenv()
 
+
+class ConfigError(RuntimeError):
+    """A setting a command needs is missing or malformed"""
+
+
+# Settings that failed to parse and fell back to their default; the first
+# require() call reports them, so importing this module never fails
+_INVALID = {}
+
+
+def _number(name, parse, kind, default):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return parse(value)
+    except ValueError:
+        _INVALID[name] = f"{name} must be {kind}, got {value!r}"
+        return default
+
+
+def _int(name, default=None):
+    return _number(name, int, "an integer", default)
+
+
+def _float(name, default=None):
+    return _number(name, float, "a number", None if default is None else float(default))
+
+
+def require(*names):
+    """
+    Check the settings a command needs before it creates anything with them
+
+    Args:
+        *names (str): Setting names, e.g. ``"API_ID", "DATABASE"``
+
+    Raises:
+        ConfigError: Naming every one of ``names`` that is not set, and every
+            malformed setting whether it is in ``names`` or not
+    """
+    problems = list(_INVALID.values()) + [
+        f"{name} is not set"
+        for name in names
+        if name not in _INVALID and not globals().get(name)
+    ]
+    if problems:
+        raise ConfigError("Invalid configuration: " + "; ".join(problems))
+
+
+# Telegram and database credentials are only checked by require(), so a
+# command that does not need them starts without them
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-API_ID = int(os.environ.get('API_ID', ''))
+API_ID = _int('API_ID')
 API_HASH = os.environ.get('API_HASH', '')
 DATABASE = os.getenv("DATABASE")
-DUMP_ID = int(os.environ.get('DUMP_ID', ''))
+DUMP_ID = _int('DUMP_ID')
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+SCRAPE_CONCURRENCY = _int('SCRAPE_CONCURRENCY', 10)
+SCRAPE_RATE = _float('SCRAPE_RATE', 5)
+SCRAPE_BURST = _float('SCRAPE_BURST', 20)
+CRAWL_INTERVAL = _int('CRAWL_INTERVAL', 3600)
+DOWNLOAD_CONCURRENCY = _int('DOWNLOAD_CONCURRENCY', 8)
+SCRAPE_WORKERS = _int('SCRAPE_WORKERS', 4)
+DOWNLOAD_WORKERS = _int('DOWNLOAD_WORKERS', 8)
+THUMBNAIL_WORKERS = _int('THUMBNAIL_WORKERS', 2)
+UPLOAD_WORKERS = _int('UPLOAD_WORKERS', 4)
+PIPELINE_QUEUE_SIZE = _int('PIPELINE_QUEUE_SIZE', 32)
+MAX_INFLIGHT_FILES = _int('MAX_INFLIGHT_FILES', 16)
+PIPELINE_REPORT_INTERVAL = _int('PIPELINE_REPORT_INTERVAL', 60)
+TRACK_DEDUPE = os.environ.get('TRACK_DEDUPE', '1') == '1'
+# Extra bot tokens to shard uploads over; BOT_TOKEN is always used first
+BOT_TOKENS = [BOT_TOKEN] + [
+    token.strip() for token in os.environ.get('BOT_TOKENS', '').split(',')
+    if token.strip() and token.strip() != BOT_TOKEN
+]
+UPLOAD_GLOBAL_RATE = _float('UPLOAD_GLOBAL_RATE', 25)
+UPLOAD_CHAT_RATE = _float('UPLOAD_CHAT_RATE', 20)  # per minute
+UPLOAD_CHAT_BURST = _float('UPLOAD_CHAT_BURST', 20)
+# Send the tracks of an album as media groups instead of one message each
+UPLOAD_MEDIA_GROUP = os.environ.get('UPLOAD_MEDIA_GROUP', '1') == '1'
+# Shared album work queue; run any number of workers against one database
+WORKER_ID = os.environ.get('WORKER_ID') or None  # defaults to host:pid
+QUEUE_LEASE = _float('QUEUE_LEASE', 300)
+QUEUE_HEARTBEAT = _float('QUEUE_HEARTBEAT', 60)
+QUEUE_MAX_ATTEMPTS = _int('QUEUE_MAX_ATTEMPTS', 5)
+QUEUE_RETRY_DELAY = _float('QUEUE_RETRY_DELAY', 60)
+QUEUE_PREFETCH = _int('QUEUE_PREFETCH', 8)
+QUEUE_POLL_INTERVAL = _float('QUEUE_POLL_INTERVAL', 5)
+CRAWL_LEASE = _float('CRAWL_LEASE', 900)
+# Keep downloaded tracks in memory between download and upload; a file
+# above SPOOL_MAX_MEMORY bytes, or beyond SPOOL_BUDGET in total, goes to disk
+STREAM_UPLOADS = os.environ.get('STREAM_UPLOADS', '1') == '1'
+SPOOL_MAX_MEMORY = _int('SPOOL_MAX_MEMORY', 32 * 1024 * 1024)
+SPOOL_BUDGET = _int('SPOOL_BUDGET', 256 * 1024 * 1024)
+# Database calls that may run at once (also the connection pool size)
+DB_WORKERS = _int('DB_WORKERS', 16)
+# Prometheus metrics and JSON stats on http://METRICS_HOST:METRICS_PORT/metrics
+# and /stats; port 0 disables the endpoint
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = _int('METRICS_PORT', 9108)
+LOG_FILE = os.environ.get('LOG_FILE', 'music_scraper.log')
+LOG_MAX_BYTES = _int('LOG_MAX_BYTES', 10 * 1024 * 1024)
+LOG_BACKUPS = _int('LOG_BACKUPS', 5)
+# Scraped albums are appended to gzip JSONL files here for replay; empty disables
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR', 'journal')
+# Back-catalog backfill: pages per checkpointed shard, shards worked on at
+# once and index pages fetched per second across all of them
+BACKFILL_SHARD_SIZE = _int('BACKFILL_SHARD_SIZE', 10)
+BACKFILL_CONCURRENCY = _int('BACKFILL_CONCURRENCY', 4)
+BACKFILL_RATE = _float('BACKFILL_RATE', 1)
+BACKFILL_LEASE = _float('BACKFILL_LEASE', 300)
+# Album pages with their ETag/Last-Modified, revalidated by `beta.py refresh`;
+# empty disables the cache
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', 'http_cache')
+# Adaptive per-host concurrency shared by scraping and downloads: starts at
+# HOST_INITIAL_CONCURRENCY, grows while answers arrive within
+# HOST_LATENCY_TARGET seconds and halves on slow answers, 429s, 5xx and
+# timeouts; HOST_FAILURE_THRESHOLD failures in a row pause the host for a
+# jittered backoff of up to HOST_OPEN_MAX seconds
+HOST_INITIAL_CONCURRENCY = _int('HOST_INITIAL_CONCURRENCY', 4)
+HOST_MAX_CONCURRENCY = _int('HOST_MAX_CONCURRENCY', 32)
+HOST_LATENCY_TARGET = _float('HOST_LATENCY_TARGET', 3)
+HOST_FAILURE_THRESHOLD = _int('HOST_FAILURE_THRESHOLD', 5)
+HOST_OPEN_MAX = _float('HOST_OPEN_MAX', 300)
+# Which download links of a song to fetch: all, best (highest bitrate) or
+# best+compact (highest and lowest); QUALITY_MAX_MB leaves out larger files
+# (0: no limit). Links are probed with HEAD first unless QUALITY_PROBE=0
+QUALITY_POLICY = os.environ.get('QUALITY_POLICY', 'all')
+QUALITY_MAX_MB = _float('QUALITY_MAX_MB', 0)
+QUALITY_PROBE = os.environ.get('QUALITY_PROBE', '1') == '1'
+# Files a short scheduled run restores at boot instead of rebuilding: the
+# Pyrogram sessions, a snapshot of the known albums (trusted for
+# WARM_SEEN_MAX_AGE seconds) and main.py's crawl cursor
+WARM_STATE_DIR = os.environ.get('WARM_STATE_DIR', 'state')
+WARM_SEEN_MAX_AGE = _float('WARM_SEEN_MAX_AGE', 7 * 24 * 3600)
+# main.py: finish at the first index page without new albums instead of
+# walking the whole catalog and waiting for the next hour
+RUN_ONCE = os.environ.get('RUN_ONCE', '0') == '1'
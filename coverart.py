@@ -0,0 +1,325 @@
+import asyncio
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+import metrics
+
+# Telegram rejects document thumbnails above these limits
+THUMB_MAX_SIDE = 320
+THUMB_MAX_BYTES = 200 * 1024
+
+# A file path or a seekable binary file object (such as a Spool)
+AudioSource = Union[str, BinaryIO]
+
+# ID3 picture type for the front cover
+FRONT_COVER = 3
+
+THUMBNAIL_SECONDS = metrics.histogram(
+    "massify_thumbnail_seconds", "Time to create an album thumbnail, by art source"
+)
+THUMBNAIL_FAILURES = metrics.counter(
+    "massify_thumbnail_failures_total", "Thumbnails that could not be created"
+)
+
+_ffmpeg_lock = threading.Lock()
+_ffmpeg_found: Optional[bool] = None
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _split_terminated(data: bytes, encoding: int) -> Tuple[bytes, bytes]:
+    """Split ``data`` after the first string terminator for ``encoding``"""
+    if encoding in (1, 2):
+        # UTF-16 strings end with an aligned double NUL
+        for i in range(0, len(data) - 1, 2):
+            if data[i:i + 2] == b"\x00\x00":
+                return data[:i], data[i + 2:]
+        return data, b""
+    head, _, tail = data.partition(b"\x00")
+    return head, tail
+
+
+def _parse_picture_frame(frame_id: bytes, body: bytes) -> Optional[Tuple[int, bytes]]:
+    if len(body) < 4:
+        return None
+    encoding = body[0]
+    if frame_id == b"PIC":
+        # ID3v2.2: fixed three-character image format instead of a MIME type
+        picture_type = body[4] if len(body) > 4 else 0
+        rest = body[5:]
+    else:
+        _, rest = _split_terminated(body[1:], 0)
+        if not rest:
+            return None
+        picture_type, rest = rest[0], rest[1:]
+    _, data = _split_terminated(rest, encoding)
+    return (picture_type, data) if data else None
+
+
+def parse_id3_picture(tag: bytes) -> Optional[bytes]:
+    """
+    Extract the embedded picture from a complete ID3v2 tag
+
+    The front cover is preferred; otherwise the first picture is returned.
+
+    Args:
+        tag (bytes): The tag including its 10-byte header
+
+    Returns:
+        Optional[bytes]: Encoded image data, or None if the tag holds no picture
+    """
+    if len(tag) < 10 or tag[:3] != b"ID3":
+        return None
+    version, flags = tag[3], tag[5]
+    body = tag[10:10 + _syncsafe(tag[6:10])]
+    if flags & 0x80 and version < 4:
+        # Tag-wide unsynchronisation (v2.4 flags it per frame instead)
+        body = body.replace(b"\xff\x00", b"\xff")
+    if flags & 0x40 and version == 3 and len(body) >= 4:
+        body = body[4 + int.from_bytes(body[:4], "big"):]
+    elif flags & 0x40 and version == 4 and len(body) >= 4:
+        body = body[_syncsafe(body[:4]):]
+
+    id_len, header_len = (3, 6) if version == 2 else (4, 10)
+    pictures = []
+    pos = 0
+    while pos + header_len <= len(body):
+        frame_id = body[pos:pos + id_len]
+        if not frame_id.strip(b"\x00"):
+            break  # padding
+        if version == 2:
+            size = int.from_bytes(body[pos + 3:pos + 6], "big")
+        elif version == 4:
+            size = _syncsafe(body[pos + 4:pos + 8])
+        else:
+            size = int.from_bytes(body[pos + 4:pos + 8], "big")
+        frame = body[pos + header_len:pos + header_len + size]
+        if frame_id in (b"APIC", b"PIC"):
+            if version == 4 and body[pos + 9] & 0x02:
+                frame = frame.replace(b"\xff\x00", b"\xff")
+            picture = _parse_picture_frame(frame_id, frame)
+            if picture is not None:
+                if picture[0] == FRONT_COVER:
+                    return picture[1]
+                pictures.append(picture[1])
+        pos += header_len + size
+    return pictures[0] if pictures else None
+
+
+def read_embedded_picture(source: AudioSource) -> Optional[bytes]:
+    """
+    Read the embedded cover from the ID3v2 tag at the start of a file
+
+    Only the tag itself is read, not the audio that follows it.
+
+    Args:
+        source (AudioSource): Path to an MP3 file, or the file itself
+
+    Returns:
+        Optional[bytes]: Encoded image data, or None if there is none
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return read_embedded_picture(f)
+    source.seek(0)
+    try:
+        header = source.read(10)
+        if len(header) < 10 or header[:3] != b"ID3":
+            return None
+        return parse_id3_picture(header + source.read(_syncsafe(header[6:10])))
+    finally:
+        source.seek(0)
+
+
+def make_thumbnail(image: bytes, max_side: int = THUMB_MAX_SIDE,
+                   max_bytes: int = THUMB_MAX_BYTES) -> bytes:
+    """
+    Convert any image Pillow can read into a Telegram-compliant JPEG thumbnail
+
+    Args:
+        image (bytes): Encoded source image
+        max_side (int): Maximum width and height in pixels
+        max_bytes (int): Maximum encoded size
+
+    Returns:
+        bytes: JPEG data no larger than ``max_bytes``
+    """
+    with Image.open(io.BytesIO(image)) as source:
+        picture = source.convert("RGB")
+    picture.thumbnail((max_side, max_side))
+    quality = 90
+    while True:
+        buffer = io.BytesIO()
+        picture.save(buffer, "JPEG", quality=quality, optimize=True)
+        if buffer.tell() <= max_bytes:
+            return buffer.getvalue()
+        if quality > 40:
+            quality -= 10
+        else:
+            picture.thumbnail((picture.width * 3 // 4, picture.height * 3 // 4))
+
+
+def ensure_ffmpeg() -> bool:
+    """
+    Put ffmpeg on the PATH the first time it is needed
+
+    An ffmpeg already on the PATH is used as is; otherwise static_ffmpeg
+    provides one, downloading it on its first use. Runs that never need a
+    thumbnail from ffmpeg never pay for that. Blocks; call it from a thread
+    in async code.
+
+    Returns:
+        bool: True if ffmpeg can be run
+    """
+    global _ffmpeg_found
+    with _ffmpeg_lock:
+        if _ffmpeg_found is None:
+            if shutil.which("ffmpeg") is None:
+                try:
+                    import static_ffmpeg
+                    static_ffmpeg.add_paths()
+                except Exception as e:
+                    logging.getLogger("ensure_ffmpeg").warning(f"No ffmpeg available: {e}")
+            _ffmpeg_found = shutil.which("ffmpeg") is not None
+        return _ffmpeg_found
+
+
+async def extract_with_ffmpeg(source: AudioSource) -> Optional[bytes]:
+    """
+    Extract the attached picture with ffmpeg, for containers or tags the
+    ID3 reader does not understand
+
+    Args:
+        source (AudioSource): Path to an audio file, or the file itself (piped to ffmpeg)
+
+    Returns:
+        Optional[bytes]: JPEG image data, or None if ffmpeg finds no picture
+    """
+    if not await asyncio.to_thread(ensure_ffmpeg):
+        return None
+    piped = not isinstance(source, str)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-v", "error", "-i", "pipe:0" if piped else source,
+            "-an", "-frames:v", "1", "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1",
+            stdin=asyncio.subprocess.PIPE if piped else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        return None
+    data = None
+    if piped:
+        source.seek(0)
+        data = await asyncio.to_thread(source.read)
+        source.seek(0)
+    try:
+        stdout, _ = await process.communicate(data)
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg stops reading once it has the picture
+        stdout = await process.stdout.read()
+        await process.wait()
+    return stdout if process.returncode == 0 and stdout else None
+
+
+class CoverArtCache:
+    """
+    Produces one thumbnail per album and shares it between the album's tracks
+
+    The first track of an album to reach the thumbnail stage extracts the
+    cover; concurrent tracks of the same album wait for that result instead
+    of repeating the work. Call ``discard`` when the album is finished.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory (Optional[str]): Where thumbnails are written (a temporary one by default)
+        """
+        self.directory = directory
+        self._owns_directory = directory is None
+        self._thumbs: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+        self._counter = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def get(self, album_key: str, audio: AudioSource) -> Optional[str]:
+        """
+        Return the album's thumbnail, creating it from ``audio`` if needed
+
+        Args:
+            album_key (str): Identifier of the album (its URL)
+            audio (AudioSource): A downloaded track of the album, as a path or file object
+
+        Returns:
+            Optional[str]: Path to a JPEG thumbnail, or None if the album has no art
+        """
+        future = self._thumbs.get(album_key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._thumbs[album_key] = future
+            try:
+                thumb = await self._create(audio)
+            except asyncio.CancelledError:
+                # Let waiting tracks continue and a later track retry
+                self._thumbs.pop(album_key, None)
+                future.set_result(None)
+                raise
+            except Exception as e:
+                THUMBNAIL_FAILURES.inc()
+                self.logger.warning(f"Could not create thumbnail for {album_key}: {e}")
+                thumb = None
+            future.set_result(thumb)
+        return await asyncio.shield(future)
+
+    async def _create(self, audio: AudioSource) -> Optional[str]:
+        start = time.perf_counter()
+        source = "embedded"
+        image = await asyncio.to_thread(read_embedded_picture, audio)
+        if image is None:
+            source = "ffmpeg"
+            image = await extract_with_ffmpeg(audio)
+        if image is None:
+            THUMBNAIL_SECONDS.observe(time.perf_counter() - start, source="none")
+            return None
+        thumb = await asyncio.to_thread(make_thumbnail, image)
+        THUMBNAIL_SECONDS.observe(time.perf_counter() - start, source=source)
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="massify_thumbs_")
+        os.makedirs(self.directory, exist_ok=True)
+        self._counter += 1
+        path = os.path.join(self.directory, f"thumb_{self._counter:06d}.jpg")
+        with open(path, "wb") as f:
+            f.write(thumb)
+        return path
+
+    def discard(self, album_key: str) -> None:
+        """
+        Forget an album's thumbnail and delete its file
+
+        Args:
+            album_key (str): Identifier of the album (its URL)
+        """
+        future = self._thumbs.pop(album_key, None)
+        if future is not None and future.done() and future.result():
+            if os.path.exists(future.result()):
+                os.remove(future.result())
+
+    def close(self) -> None:
+        """
+        Drop all cached thumbnails and remove the directory if this cache created it
+        """
+        for album_key in list(self._thumbs):
+            self.discard(album_key)
+        if self._owns_directory and self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
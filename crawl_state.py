@@ -0,0 +1,166 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from pymongo import errors
+
+from database import AsyncDatabase
+
+
+class CrawlState:
+    """
+    Incremental crawl bookkeeping persisted in a MongoDB collection
+
+    Two values are kept in one document per crawl:
+
+    - watermark: the newest album URL (and the page it was on) processed by
+      the last completed cycle. The index is newest-first, so a cycle can
+      stop as soon as it reaches this album again.
+    - cursor: the next page to fetch in the cycle that is currently running,
+      plus the newest URL seen so far in that cycle. It is written after
+      every completed page and removed when the cycle finishes, so a crash
+      resumes at the first unfinished page.
+
+    The same document carries a lease so that only one of several worker
+    processes runs a crawl cycle at a time, and the time the last cycle
+    finished so that the others know when the next one is due.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection_name: str = "crawl_state",
+                 key: str = "tamil-songs"):
+        """
+        Args:
+            database (AsyncDatabase): Database wrapper
+            collection_name (str): Collection holding crawl state documents
+            key (str): Identifier of the crawl (one document per crawl)
+        """
+        self.database = database
+        self.collection = database[collection_name]
+        self.key = key
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def _load(self) -> Dict:
+        try:
+            document = await self.database.run(
+                "crawl_state.load", self.collection.find_one, {"_id": self.key}
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not load crawl state: {e}")
+            return {}
+        return document or {}
+
+    async def _set(self, update: Dict) -> None:
+        try:
+            await self.database.run(
+                "crawl_state.save", self.collection.update_one,
+                {"_id": self.key}, update, upsert=True
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not save crawl state: {e}")
+
+    async def load_watermark(self) -> Optional[Dict]:
+        """
+        Returns:
+            Optional[Dict]: ``{"url", "page", "updated_at"}`` or None before the first cycle
+        """
+        return (await self._load()).get("watermark")
+
+    async def save_watermark(self, url: str, page: int) -> None:
+        """
+        Record the newest album processed by a completed cycle
+
+        Args:
+            url (str): Album URL
+            page (int): Index page the album was listed on
+        """
+        await self._set({"$set": {"watermark": {
+            "url": url,
+            "page": page,
+            "updated_at": datetime.now(timezone.utc)
+        }}})
+
+    async def load_cursor(self) -> Optional[Dict]:
+        """
+        Returns:
+            Optional[Dict]: ``{"page", "newest"}`` of an unfinished cycle, or None
+        """
+        return (await self._load()).get("cursor")
+
+    async def save_cursor(self, page: int, newest: Optional[Dict]) -> None:
+        """
+        Record progress of the running cycle
+
+        Args:
+            page (int): Next page to fetch
+            newest (Optional[Dict]): ``{"url", "page"}`` of the newest album seen this cycle
+        """
+        await self._set({"$set": {"cursor": {
+            "page": page,
+            "newest": newest,
+            "updated_at": datetime.now(timezone.utc)
+        }}})
+
+    async def clear_cursor(self) -> None:
+        """
+        Mark the running cycle as finished
+        """
+        await self._set({
+            "$unset": {"cursor": ""},
+            "$set": {"finished_at": datetime.now(timezone.utc)}
+        })
+
+    async def load_finished_at(self) -> Optional[datetime]:
+        """
+        Returns:
+            Optional[datetime]: When the last cycle finished (UTC), or None before the first
+        """
+        finished_at = (await self._load()).get("finished_at")
+        if finished_at is not None and finished_at.tzinfo is None:
+            finished_at = finished_at.replace(tzinfo=timezone.utc)
+        return finished_at
+
+    async def acquire_lease(self, owner: str, seconds: float) -> bool:
+        """
+        Take or extend the exclusive right to run the crawl
+
+        Args:
+            owner (str): Identifier of the worker
+            seconds (float): Lease lifetime; call again before it ends to keep it
+
+        Returns:
+            bool: True if ``owner`` now holds the lease
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            await self.database.run(
+                "crawl_state.lease", self.collection.update_one,
+                {"_id": self.key, "$or": [
+                    {"lease": {"$exists": False}},
+                    {"lease.owner": owner},
+                    {"lease.expires": {"$lt": now}}
+                ]},
+                {"$set": {"lease": {"owner": owner, "expires": now + timedelta(seconds=seconds)}}},
+                upsert=True
+            )
+            return True
+        except errors.DuplicateKeyError:
+            return False  # Held by another worker
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not acquire crawl lease: {e}")
+            return False
+
+    async def release_lease(self, owner: str) -> None:
+        """
+        Give up the crawl lease if ``owner`` holds it
+
+        Args:
+            owner (str): Identifier of the worker
+        """
+        try:
+            await self.database.run(
+                "crawl_state.lease", self.collection.update_one,
+                {"_id": self.key, "lease.owner": owner},
+                {"$unset": {"lease": ""}}
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not release crawl lease: {e}")
@@ -1,5 +1,50 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
 from pymongo import MongoClient, errors
 
+from dedupe import SeenUrls
+import metrics
+
+DB_SECONDS = metrics.histogram(
+    "massify_db_seconds", "Latency of database calls by operation"
+)
+DB_ERRORS = metrics.counter(
+    "massify_db_errors_total", "Database calls that raised, by operation"
+)
+
+logger = logging.getLogger("database")
+
+# One pooled client per URI for the whole process
+_clients: Dict[str, MongoClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(uri, max_pool_size=100):
+    """
+    Returns the process-wide client for a URI, creating it on first use.
+
+    A ``MongoClient`` is thread-safe and keeps its own connection pool, so
+    every caller shares one instead of opening new connections.
+
+    Parameters:
+    - uri (str): MongoDB connection URI.
+    - max_pool_size (int): Connection pool size used when the client is created.
+
+    Returns:
+    - MongoClient: The shared client.
+    """
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(uri, maxPoolSize=max_pool_size)
+            _clients[uri] = client
+        return client
+
 def connect_to_mongodb(uri, db_name):
     """
     Connects to MongoDB and returns the database object.
@@ -12,15 +57,40 @@ def connect_to_mongodb(uri, db_name):
     - db: Database object if connection is successful, else None.
     """
     try:
-        client = MongoClient(uri)
+        client = get_client(uri)
         db = client[db_name]
-        print("Connected to MongoDB")
+        logger.info("Connected to MongoDB")
         return db
     except errors.PyMongoError as e:
-        print(f"Error: Could not connect to MongoDB.\n{e}")
+        logger.error(f"Could not connect to MongoDB: {e}")
         return None
 
-def insert_document(db, collection_name, document):
+def ensure_indexes(db, collection_name):
+    """
+    Creates the unique index on ``url`` used by the duplicate check.
+
+    Safe to call on every startup; MongoDB treats an existing identical
+    index as a no-op. If the collection already holds duplicate URLs the
+    unique build fails, and a plain index is created instead so lookups
+    stay indexed.
+
+    Parameters:
+    - db: Database object.
+    - collection_name (str): Name of the collection.
+    """
+    collection = db[collection_name]
+    try:
+        collection.create_index("url", unique=True, name="url_unique")
+    except errors.DuplicateKeyError as e:
+        logger.warning(f"Duplicate URLs present, using non-unique index: {e}")
+        try:
+            collection.create_index("url", name="url_lookup")
+        except errors.PyMongoError as e:
+            logger.error(f"Could not create URL index: {e}")
+    except errors.PyMongoError as e:
+        logger.error(f"Could not create URL index: {e}")
+
+def insert_document(db, collection_name, document, seen=None):
     """
     Inserts a document into the specified collection.
 
@@ -28,13 +98,19 @@ def insert_document(db, collection_name, document):
     - db: Database object.
     - collection_name (str): Name of the collection.
     - document (dict): The document to insert.
+    - seen (SeenUrls, optional): Seen-URL set to update with the document's URL.
     """
     try:
         collection = db[collection_name]
         result = collection.insert_one(document)
-        print(f"Inserted document with ID: {result.inserted_id}")
+        logger.debug(f"Inserted document with ID: {result.inserted_id}")
+    except errors.DuplicateKeyError:
+        logger.info(f"Document already exists: {document.get('url')}")
     except errors.PyMongoError as e:
-        print(f"Error: Could not insert document.\n{e}")
+        logger.error(f"Could not insert document: {e}")
+        return
+    if seen is not None and document.get("url"):
+        seen.add(document["url"])
 
 def find_documents(db, collection_name, query=None):
     """
@@ -53,24 +129,59 @@ def find_documents(db, collection_name, query=None):
         cursor = collection.find(query) if query else collection.find()
         return list(cursor)
     except errors.PyMongoError as e:
-        print(f"Error: Could not retrieve documents.\n{e}")
+        logger.error(f"Could not retrieve documents: {e}")
         return []
 
-def check_db(db, collection_name, url):
+def check_db(db, collection_name, url, seen=None):
     """
-    Checks if a document with a specific name exists in the collection.
+    Checks if a document with a specific URL exists in the collection.
+
+    URLs found in ``seen`` are answered without a database round trip.
+    Otherwise a single indexed lookup is made that only returns ``_id``.
 
     Parameters:
     - db: Database object.
     - collection_name (str): Name of the collection.
-    - name (str): The name to check for in the documents.
+    - url (str): The URL to check for in the documents.
+    - seen (SeenUrls, optional): Warmed seen-URL set to consult first.
 
     Returns:
     - bool: True if the document exists, otherwise False.
     """
-    documents = find_documents(db, collection_name)
-    urls = [doc.get("url") for doc in documents]
-    return url in urls 
+    if seen is not None and url in seen:
+        return True
+    try:
+        collection = db[collection_name]
+        exists = collection.find_one({"url": url}, projection={"_id": 1}) is not None
+    except errors.PyMongoError as e:
+        logger.error(f"Could not check document: {e}")
+        return False
+    if exists and seen is not None:
+        seen.add(url)
+    return exists
+
+def load_seen_urls(db, collection_name):
+    """
+    Builds a seen-URL set from every album URL stored in the collection.
+
+    Only the ``url`` field is transferred, so warming costs one pass over
+    the index-sized data rather than the full album documents.
+
+    Parameters:
+    - db: Database object.
+    - collection_name (str): Name of the collection.
+
+    Returns:
+    - SeenUrls: The warmed set (empty if the query fails).
+    """
+    seen = SeenUrls()
+    try:
+        cursor = db[collection_name].find({}, projection={"url": 1, "_id": 0})
+        seen.update(doc.get("url") for doc in cursor)
+        logger.info(f"Loaded {len(seen)} known URLs")
+    except errors.PyMongoError as e:
+        logger.error(f"Could not load known URLs: {e}")
+    return seen
 
 def get_info(db, collection_name, name):
     """
@@ -126,6 +237,246 @@ def update_document(db, collection_name, query, new_values):
     except errors.PyMongoError as e:
         return f"Error: Could not update document.\n{e}"
 
+class OperationStats:
+    """
+    Call count, error count and latency of one kind of database operation.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, failed=False):
+        """
+        Records one call.
+
+        Parameters:
+        - seconds (float): Time from submission to completion.
+        - failed (bool): Whether the call raised.
+        """
+        self.count += 1
+        self.errors += failed
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        """
+        Returns:
+        - dict: count, errors, mean and max latency in milliseconds.
+        """
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2)
+        }
+
+class AsyncDatabase:
+    """
+    Asynchronous access to a MongoDB database through one shared client.
+
+    pymongo calls block, so every call runs on a dedicated thread pool sized
+    like the client's connection pool, and the event loop keeps scraping,
+    downloading and uploading while it waits for the database. Each call is
+    named (``"albums.exists"``, ``"tracks.record"``, ...) and its latency is
+    recorded under that name.
+
+    Stores (albums, tracks, job state, ...) take this object in place of a
+    plain database and get their collections with ``database[name]``.
+    """
+
+    def __init__(self, db, max_workers=16):
+        """
+        Parameters:
+        - db: pymongo (or compatible) Database object.
+        - max_workers (int): Database calls that may run at the same time.
+        """
+        self.db = db
+        self.max_workers = max_workers
+        self.metrics: Dict[str, OperationStats] = {}
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="mongo")
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def __getitem__(self, collection_name):
+        return self.db[collection_name]
+
+    async def run(self, operation: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs a blocking database call without blocking the event loop.
+
+        Parameters:
+        - operation (str): Name the latency is recorded under.
+        - fn (Callable): The pymongo call (or a function making several).
+        - *args, **kwargs: Arguments for ``fn``.
+
+        Returns:
+        - Any: Whatever ``fn`` returns; its exceptions propagate.
+        """
+        loop = asyncio.get_running_loop()
+        stats = self.metrics.setdefault(operation, OperationStats())
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+        except Exception:
+            elapsed = time.perf_counter() - start
+            stats.observe(elapsed, failed=True)
+            DB_SECONDS.observe(elapsed, operation=operation)
+            DB_ERRORS.inc(operation=operation)
+            raise
+        elapsed = time.perf_counter() - start
+        stats.observe(elapsed)
+        DB_SECONDS.observe(elapsed, operation=operation)
+        return result
+
+    async def setup(self, *stores):
+        """
+        Creates the indexes of every store at startup, concurrently.
+
+        Parameters:
+        - *stores: Objects with an ``async ensure_indexes()`` method.
+        """
+        await asyncio.gather(*(store.ensure_indexes() for store in stores))
+
+    def stats(self):
+        """
+        Returns:
+        - dict: Latency snapshot per operation name.
+        """
+        return {name: stats.snapshot() for name, stats in sorted(self.metrics.items())}
+
+    def close(self):
+        """
+        Stops the worker threads; the shared client stays open for other users.
+        """
+        self._executor.shutdown(wait=False)
+
+def open_database(uri, db_name, max_workers=16):
+    """
+    Opens an ``AsyncDatabase`` on the shared client for ``uri``.
+
+    Parameters:
+    - uri (str): MongoDB connection URI.
+    - db_name (str): Name of the database.
+    - max_workers (int): Database calls that may run at the same time.
+
+    Returns:
+    - AsyncDatabase: The database wrapper.
+    """
+    return AsyncDatabase(get_client(uri, max_pool_size=max_workers)[db_name], max_workers)
+
+class AlbumStore:
+    """
+    Scraped album records, one document per album page URL.
+
+    Keeps the warmed seen-URL set so most duplicate checks never reach the
+    database.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection_name: str):
+        """
+        Parameters:
+        - database (AsyncDatabase): Database wrapper.
+        - collection_name (str): Name of the album collection.
+        """
+        self.database = database
+        self.collection_name = collection_name
+        self.collection = database[collection_name]
+        self.seen = SeenUrls()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def ensure_indexes(self):
+        """
+        Creates the unique ``url`` index (see ``ensure_indexes``).
+        """
+        await self.database.run(
+            "albums.create_index", ensure_indexes, self.database.db, self.collection_name
+        )
+
+    async def load_seen(self) -> int:
+        """
+        Warms the seen-URL set from the collection.
+
+        Returns:
+        - int: Number of known URLs.
+        """
+        self.seen = await self.database.run(
+            "albums.load_seen", load_seen_urls, self.database.db, self.collection_name
+        )
+        return len(self.seen)
+
+    async def exists(self, url: str) -> bool:
+        """
+        Checks whether an album has been stored.
+
+        Parameters:
+        - url (str): Album page URL.
+
+        Returns:
+        - bool: True if the album is known. Database errors propagate, so an
+          unreachable database is never mistaken for a new album.
+        """
+        if url in self.seen:
+            return True
+        document = await self.database.run(
+            "albums.exists", self.collection.find_one, {"url": url}, {"_id": 1}
+        )
+        if document is not None:
+            self.seen.add(url)
+        return document is not None
+
+    async def insert(self, record: Dict) -> bool:
+        """
+        Stores a scraped album record.
+
+        Parameters:
+        - record (dict): Album document with a ``url`` field.
+
+        Returns:
+        - bool: True if inserted, False if the album was already stored.
+          Other database errors propagate.
+        """
+        try:
+            await self.database.run("albums.insert", self.collection.insert_one, record)
+            inserted = True
+        except errors.DuplicateKeyError:
+            self.logger.info(f"Album already stored: {record.get('url')}")
+            inserted = False
+        if record.get("url"):
+            self.seen.add(record["url"])
+        return inserted
+
+    async def update(self, record: Dict) -> bool:
+        """
+        Overwrites the fields of a stored album with a newer scrape.
+
+        Parameters:
+        - record (dict): Album document with a ``url`` field.
+
+        Returns:
+        - bool: True if the album was stored before.
+        """
+        result = await self.database.run(
+            "albums.update", self.collection.update_one, {"url": record["url"]}, {"$set": record}
+        )
+        return result.matched_count == 1
+
+    async def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None):
+        """
+        Parameters:
+        - query (dict, optional): Filter; all albums if None.
+        - projection (dict, optional): Fields to return.
+
+        Returns:
+        - list: Matching album documents.
+        """
+        return await self.database.run(
+            "albums.find", lambda: list(self.collection.find(query or {}, projection))
+        )
+
 # Example usage
 if __name__ == "__main__":
     uri = "mongodb://localhost:27017/"
@@ -143,7 +494,7 @@ if __name__ == "__main__":
 
     # Check if a document exists
     name = "John Doe"
-    exists = check_db(db, collection_name, name)
+    exists = check_db(db, collection_name, "http://example.com")
     print(f"Document exists: {exists}")
 
     # Retrieve information
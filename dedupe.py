@@ -0,0 +1,82 @@
+import hashlib
+import sys
+from array import array
+from typing import Iterable, Optional, Set
+
+
+class SeenUrls:
+    """
+    In-process set of album URLs that are already stored in the database.
+
+    URLs are kept as 64-bit BLAKE2b digests instead of strings, which keeps a
+    catalog of a million albums to a few tens of megabytes. A collision needs
+    around four billion entries to become likely, so membership is treated as
+    exact: a hit means the album is known and no database query is needed.
+    """
+
+    def __init__(self, urls: Optional[Iterable[str]] = None):
+        self._digests: Set[int] = set()
+        if urls is not None:
+            self.update(urls)
+
+    @staticmethod
+    def _digest(url: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+    def add(self, url: str) -> None:
+        """
+        Record a URL as seen
+
+        Args:
+            url (str): Album URL
+        """
+        self._digests.add(self._digest(url))
+
+    def update(self, urls: Iterable[str]) -> None:
+        """
+        Record several URLs as seen, ignoring empty values
+
+        Args:
+            urls (Iterable[str]): Album URLs
+        """
+        self._digests.update(self._digest(url) for url in urls if url)
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns:
+            bytes: The digests as big-endian 64-bit integers, eight bytes per URL
+        """
+        digests = array("Q", sorted(self._digests))
+        if sys.byteorder == "little":
+            digests.byteswap()
+        return digests.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SeenUrls":
+        """
+        Args:
+            data (bytes): Output of ``to_bytes``
+
+        Returns:
+            SeenUrls: The same set of URLs
+
+        Raises:
+            ValueError: If ``data`` is not a whole number of digests
+        """
+        digests = array("Q")
+        if len(data) % digests.itemsize:
+            raise ValueError(f"{len(data)} bytes is not a whole number of digests")
+        digests.frombytes(data)
+        if sys.byteorder == "little":
+            digests.byteswap()
+        seen = cls()
+        seen._digests = set(digests)
+        return seen
+
+    def __contains__(self, url: object) -> bool:
+        return isinstance(url, str) and self._digest(url) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
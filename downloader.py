@@ -0,0 +1,478 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import re
+import shutil
+import tempfile
+from typing import Callable, Dict, Optional, Union
+from urllib.parse import unquote, urlsplit
+
+import aiohttp
+
+import metrics
+from audiocheck import is_mp3
+from hosthealth import HostMonitor
+from hashing import FINGERPRINT_CHUNK, StreamHasher, fingerprint
+from quality import Probe
+from spool import Spool, SpoolBudget
+
+ProgressCallback = Callable[[int, int], None]
+# A finished download: a file path, or a Spool when downloading to memory
+DownloadResult = Union[str, Spool]
+
+DOWNLOAD_SECONDS = metrics.histogram(
+    "massify_download_seconds", "Time to download one file, retries included"
+)
+DOWNLOAD_BYTES = metrics.counter(
+    "massify_download_bytes_total", "Bytes received by downloads"
+)
+DOWNLOAD_RETRIES = metrics.counter(
+    "massify_download_retries_total", "Download attempts that failed and were retried"
+)
+DOWNLOAD_FAILURES = metrics.counter(
+    "massify_download_failures_total", "Downloads that failed after all attempts"
+)
+DOWNLOAD_RESUMES = metrics.counter(
+    "massify_download_resumes_total", "Retries that continued a partial download with a range request"
+)
+DOWNLOAD_REJECTED = metrics.counter(
+    "massify_download_rejected_total", "Downloads that failed verification, by reason"
+)
+
+
+class DownloadError(RuntimeError):
+    """Raised when a download fails after all retry attempts"""
+
+
+class Download:
+    """
+    Handle for one scheduled download
+
+    ``future`` resolves to the path of the finished file (or its ``Spool``
+    when the manager spools to memory) or raises ``DownloadError``. ``received`` and ``total`` are updated as bytes arrive
+    (``total`` is 0 when the server sends no Content-Length). The content
+    hash and fingerprint are computed while the file is written. ``path``
+    is chosen once, before the first byte arrives, and never changes.
+    """
+
+    def __init__(self, url: str, filename: Optional[str] = None,
+                 progress: Optional[ProgressCallback] = None):
+        self.url = url
+        self.filename = filename
+        self.progress = progress
+        self.path: Optional[str] = None
+        self.spool: Optional[Spool] = None
+        self.received = 0
+        self.total = 0
+        self.hasher = StreamHasher()
+        # ETag or Last-Modified of the partial body, sent as If-Range on resume
+        self.validator: Optional[str] = None
+        self.resumable = False
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def sha256(self) -> str:
+        return self.hasher.sha256
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self.hasher.fingerprint
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class DownloadManager:
+    """
+    In-process asynchronous HTTP downloader
+
+    All downloads share one pooled aiohttp session and run as tasks on the
+    event loop, at most ``max_concurrent`` at a time, so transfers overlap
+    with scraping and Telegram uploads instead of blocking them. Each file is
+    fetched as a single keep-alive stream: the tracks are a few megabytes,
+    so parallelism comes from downloading many files at once rather than
+    splitting each one into segments.
+
+    A failed attempt keeps the bytes it received: the next attempt asks
+    only for the rest with a Range request, guarded by ``If-Range`` so a
+    file that changed on the server is fetched again from the start.
+    Attempts are spaced by exponential backoff with full jitter. A download
+    only succeeds once it matches its Content-Length and, for MP3 files,
+    starts with valid MPEG audio frames, so truncated transfers and error
+    pages never reach the uploader. Requests go through the host's
+    adaptive concurrency limit and circuit breaker, so a struggling mirror
+    gets fewer parallel transfers and a failing one is left alone until a
+    probe succeeds.
+
+    With ``spool_memory`` set, files are not written to disk at all: each
+    one is streamed into a ``Spool`` that stays in memory up to that size
+    (and within ``spool_budget`` across all files) and is handed straight
+    to the uploader. The caller owns the spool and must close it.
+    """
+
+    def __init__(self,
+                 max_concurrent: int = 8,
+                 max_retry_attempts: int = 3,
+                 timeout: float = 300,
+                 chunk_size: int = 64 * 1024,
+                 output_dir: Optional[str] = None,
+                 user_agent: Optional[str] = None,
+                 spool_memory: Optional[int] = None,
+                 spool_budget: Optional[int] = None,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 hosts: Optional[HostMonitor] = None):
+        """
+        Args:
+            max_concurrent (int): Global cap on simultaneous downloads
+            max_retry_attempts (int): Attempts per file before giving up
+            timeout (float): Total timeout per attempt in seconds
+            chunk_size (int): Bytes read from the socket per write
+            output_dir (Optional[str]): Directory for finished files (a temporary one by default)
+            user_agent (Optional[str]): Optional custom user agent string
+            spool_memory (Optional[int]): Download into memory spools that move to disk
+                above this size, instead of into files
+            spool_budget (Optional[int]): Cap on spooled bytes held in memory across all downloads
+            backoff_base (float): Upper bound of the first retry delay in seconds, doubled per attempt
+            backoff_max (float): Cap on the retry delay in seconds
+            hosts (Optional[HostMonitor]): Adaptive per-host concurrency and circuit
+                breakers, shared with the scraper (a private one by default)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_retry_attempts = max_retry_attempts
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.output_dir = output_dir
+        self._owns_output_dir = output_dir is None
+        self.spool_memory = spool_memory
+        self.spool_budget = SpoolBudget(spool_budget) if spool_memory and spool_budget else None
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hosts = hosts or HostMonitor()
+        self.headers = {
+            'User-Agent': user_agent or 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[Download, asyncio.Task] = {}
+        self._counter = itertools.count(1)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def start(self) -> None:
+        """
+        Open the HTTP session and the output directory
+        """
+        if self.session is None:
+            if self.spool_memory is None:
+                if self.output_dir is None:
+                    self.output_dir = tempfile.mkdtemp(prefix="massify_")
+                os.makedirs(self.output_dir, exist_ok=True)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrent, keepalive_timeout=60),
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=10)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+    async def close(self) -> None:
+        """
+        Cancel unfinished downloads, close the session and remove the
+        temporary output directory if this manager created it
+        """
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self._owns_output_dir and self.output_dir:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            self.output_dir = None
+
+    async def __aenter__(self) -> "DownloadManager":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def submit(self, url: str, filename: Optional[str] = None,
+               progress: Optional[ProgressCallback] = None) -> Download:
+        """
+        Schedule a download and return immediately
+
+        Args:
+            url (str): URL of the file to download
+            filename (Optional[str]): File name to use instead of the server's
+            progress (Optional[ProgressCallback]): Called as ``progress(received, total)``
+
+        Returns:
+            Download: Handle whose ``future`` resolves to the file path or spool
+        """
+        download = Download(url, filename, progress)
+        task = asyncio.ensure_future(self._run(download))
+        self._tasks[download] = task
+        task.add_done_callback(lambda _: self._tasks.pop(download, None))
+        return download
+
+    async def download(self, url: str, filename: Optional[str] = None,
+                       progress: Optional[ProgressCallback] = None) -> DownloadResult:
+        """
+        Download a file and wait for it
+
+        Args:
+            url (str): URL of the file to download
+            filename (Optional[str]): File name to use instead of the server's
+            progress (Optional[ProgressCallback]): Called as ``progress(received, total)``
+
+        Returns:
+            DownloadResult: Path to the downloaded file, or its spool
+        """
+        return await self.submit(url, filename, progress)
+
+    async def probe(self, url: str) -> Probe:
+        """
+        Learn a file's size and type without downloading it
+
+        Sends a HEAD request, or a one-byte range request when the server
+        does not answer HEAD with a size.
+
+        Args:
+            url (str): URL of the file
+
+        Returns:
+            Probe: Size, content type and whether the link is alive; ``alive``
+            is None if the probe failed for reasons unrelated to the link
+        """
+        await self.start()
+        try:
+            async with self._semaphore:
+                async with self.hosts.slot(url) as slot, \
+                        self.session.head(url, allow_redirects=True) as response:
+                    slot.record(response.status)
+                    status, content_type = response.status, response.content_type
+                    size = response.content_length if response.status == 200 else None
+                if status in (405, 501) or (status < 400 and size is None):
+                    async with self.hosts.slot(url) as slot, \
+                            self.session.get(url, headers={'Range': 'bytes=0-0'}) as response:
+                        slot.record(response.status)
+                        status, content_type = response.status, response.content_type
+                        total = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                        size = int(total) if status == 206 and total.isdigit() else \
+                            response.content_length if status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"Probe failed for {url}: {e}")
+            return Probe(url)
+        if status == 429 or status >= 500:
+            return Probe(url, status=status)
+        # A missing file, or a page in place of one, will not get better
+        alive = status < 400 and content_type != "text/html"
+        return Probe(url, alive, size, content_type, status)
+
+    async def probe_fingerprint(self, url: str) -> Optional[str]:
+        """
+        Compute a remote file's fingerprint from two ranged requests
+
+        Args:
+            url (str): URL of the file
+
+        Returns:
+            Optional[str]: The fingerprint, or None if the server does not
+            honour range requests or the probe fails
+        """
+        await self.start()
+        try:
+            async with self._semaphore:
+                head, size = await self._fetch_range(url, f"bytes=0-{FINGERPRINT_CHUNK - 1}")
+                if size is None:
+                    return None
+                if size <= FINGERPRINT_CHUNK:
+                    return fingerprint(size, head, head)
+                tail, _ = await self._fetch_range(url, f"bytes=-{FINGERPRINT_CHUNK}")
+                return fingerprint(size, head, tail) if tail is not None else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"Fingerprint probe failed for {url}: {e}")
+            return None
+
+    async def _fetch_range(self, url: str, byte_range: str):
+        async with self.hosts.slot(url) as slot, \
+                self.session.get(url, headers={'Range': byte_range}) as response:
+            slot.record(response.status)
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            if response.status != 206 or '/' not in content_range:
+                # Full body instead of a range; do not read it
+                return None, None
+            total = content_range.rsplit('/', 1)[1]
+            return await response.read(), (int(total) if total.isdigit() else None)
+
+    async def _run(self, download: Download) -> None:
+        await self.start()
+        try:
+            async with self._semaphore:
+                with DOWNLOAD_SECONDS.time():
+                    result = await self._fetch_with_retries(download)
+        except asyncio.CancelledError:
+            self._discard(download)
+            download.future.cancel()
+            raise
+        except Exception as e:
+            DOWNLOAD_FAILURES.inc()
+            self._discard(download)
+            download.future.set_exception(
+                e if isinstance(e, DownloadError) else DownloadError(str(e))
+            )
+        else:
+            download.future.set_result(result)
+
+    @staticmethod
+    def _discard(download: Download) -> None:
+        # Nothing of a failed download outlives it
+        if download.spool is not None:
+            download.spool.close()
+        if download.path and os.path.exists(download.path):
+            os.remove(download.path)
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Full jitter: a random delay up to the exponential bound, so that
+        downloads failing together do not retry in lockstep
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    async def _fetch_with_retries(self, download: Download) -> DownloadResult:
+        for attempt in range(1, self.max_retry_attempts + 1):
+            try:
+                return await self._fetch(download)
+            except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+                self.logger.warning(
+                    f"Download attempt {attempt} failed for {download.url} "
+                    f"after {download.received} bytes: {e}"
+                )
+                if attempt == self.max_retry_attempts:
+                    raise DownloadError(
+                        f"Download failed after {self.max_retry_attempts} attempts: {e}"
+                    ) from e
+                DOWNLOAD_RETRIES.inc()
+                await asyncio.sleep(self._backoff(attempt))
+
+    def _open_output(self, download: Download, name: str, resume: bool):
+        if self.spool_memory is not None:
+            if download.spool is None:
+                download.spool = Spool(
+                    name, self.spool_memory, self.spool_budget, self.output_dir
+                )
+            f = download.spool
+            if resume:
+                f.seek(download.received)
+            else:
+                f.seek(0)
+            f.truncate()
+            return f
+        if download.path is None:
+            # One subdirectory per download keeps the server's file name,
+            # which Telegram shows as the document name
+            directory = os.path.join(self.output_dir, f"{next(self._counter):06d}")
+            os.makedirs(directory, exist_ok=True)
+            download.path = os.path.join(directory, name)
+        f = open(download.path, 'r+b' if resume else 'wb')
+        if resume:
+            f.seek(download.received)
+            f.truncate()
+        return f
+
+    @staticmethod
+    def _resumed_total(download: Download, response: aiohttp.ClientResponse) -> Optional[int]:
+        # A 206 continues the partial body only if it starts where it ended
+        match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response.headers.get('Content-Range', ''))
+        if response.status != 206 or not match or int(match.group(1)) != download.received:
+            return None
+        if match.group(2) != '*':
+            return int(match.group(2))
+        return download.received + (response.content_length or 0)
+
+    async def _fetch(self, download: Download) -> DownloadResult:
+        headers = {}
+        if download.received and download.resumable:
+            headers['Range'] = f'bytes={download.received}-'
+            if download.validator:
+                headers['If-Range'] = download.validator
+        async with self.hosts.slot(download.url) as slot, \
+                self.session.get(download.url, headers=headers) as response:
+            # Latency to the headers; the body's transfer time depends on its size
+            slot.record(response.status)
+            if response.status == 416:
+                # The partial body is no longer valid; start over next attempt
+                download.received = 0
+                raise DownloadError("Range not satisfiable")
+            response.raise_for_status()
+            total = self._resumed_total(download, response) if headers else None
+            resume = total is not None
+            if resume:
+                DOWNLOAD_RESUMES.inc()
+                download.total = total
+            else:
+                download.total = response.content_length or 0
+                download.received = 0
+                download.hasher = StreamHasher()
+                etag = response.headers.get('ETag', '')
+                # Weak ETags cannot be used in If-Range
+                download.validator = (etag if etag and not etag.startswith('W/') else None) or \
+                    response.headers.get('Last-Modified')
+                download.resumable = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+            name = download.filename or self._server_filename(response)
+            content_type = response.content_type
+            f = self._open_output(download, name, resume)
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    f.write(chunk)
+                    download.hasher.update(chunk)
+                    download.received += len(chunk)
+                    DOWNLOAD_BYTES.inc(len(chunk))
+                    if download.progress:
+                        download.progress(download.received, download.total)
+            finally:
+                if download.spool is None:
+                    f.close()
+        await self._verify(download, name, content_type)
+        if download.spool is not None:
+            download.spool.seek(0)
+            return download.spool
+        return download.path
+
+    async def _verify(self, download: Download, name: str, content_type: str) -> None:
+        """
+        Reject a finished transfer that cannot be the expected file
+        """
+        reason = None
+        if download.received == 0:
+            reason = "empty"
+        elif download.total and download.received != download.total:
+            # Retried with a range request for the missing bytes
+            reason = "short"
+        elif content_type == "text/html":
+            reason = "html"
+        elif name.lower().endswith(".mp3") or content_type == "audio/mpeg":
+            if not await asyncio.to_thread(is_mp3, download.spool or download.path):
+                reason = "not_mp3"
+        if reason is None:
+            return
+        DOWNLOAD_REJECTED.inc(reason=reason)
+        error = DownloadError(
+            f"Rejected download ({reason}): {download.received} of {download.total} bytes, {content_type}"
+        )
+        if reason != "short":
+            # Nothing worth resuming
+            download.received = 0
+        raise error
+
+    @staticmethod
+    def _server_filename(response: aiohttp.ClientResponse) -> str:
+        disposition = response.content_disposition
+        name = disposition.filename if disposition and disposition.filename else None
+        if not name:
+            name = unquote(os.path.basename(urlsplit(str(response.url)).path)) or "download"
+        # Keep the name usable as a single path component
+        return re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name).strip() or "download"
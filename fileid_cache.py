@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from pymongo import errors
+from pyrogram.errors import BadRequest
+
+from database import AsyncDatabase
+
+# A file path, or a file object such as a Spool (then digest and size must be given)
+Upload = Union[str, BinaryIO]
+Sender = Callable[[Any], Awaitable[Any]]
+GroupSender = Callable[[List[Any]], Awaitable[List[Any]]]
+
+# Message attributes that can carry an uploaded file, in lookup order
+MEDIA_ATTRIBUTES = ("document", "audio", "photo", "video", "voice", "animation")
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    SHA-256 of a file's contents
+
+    Args:
+        path (str): File to hash
+        chunk_size (int): Bytes read per step
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def message_file_id(message: Any) -> Optional[str]:
+    """
+    Return the file_id of the media attached to a Pyrogram message
+
+    Args:
+        message (Any): Message returned by a send method
+
+    Returns:
+        Optional[str]: The file_id, or None if the message carries no file
+    """
+    for attribute in MEDIA_ATTRIBUTES:
+        media = getattr(message, attribute, None)
+        if media is not None and getattr(media, "file_id", None):
+            return media.file_id
+    return None
+
+
+class FileIdCache:
+    """
+    Telegram file_id cache keyed by content hash and persisted in MongoDB
+
+    After a file has been uploaded once, later sends of identical bytes pass
+    the stored file_id and nothing is transferred again. file_ids are only
+    valid for the bot that received them, so entries are scoped by ``owner``.
+    """
+
+    def __init__(self, database: AsyncDatabase, owner: str, collection_name: str = "file_ids"):
+        """
+        Args:
+            database (AsyncDatabase): Database wrapper
+            owner (str): Default identifier of the uploading bot (its numeric ID)
+            collection_name (str): Collection holding cached file_ids
+        """
+        self.database = database
+        self.collection = database[collection_name]
+        self.owner = owner
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _key(self, kind: str, digest: str, owner: Optional[str] = None) -> str:
+        return f"{owner or self.owner}:{kind}:{digest}"
+
+    async def get(self, kind: str, digest: str, owner: Optional[str] = None) -> Optional[str]:
+        """
+        Look up a cached file_id
+
+        Args:
+            kind (str): Media kind the file was sent as (photo, document, ...)
+            digest (str): Content hash of the file
+            owner (Optional[str]): Bot the file_id belongs to (defaults to ``owner``)
+
+        Returns:
+            Optional[str]: The file_id, or None on a miss
+        """
+        try:
+            document = await self.database.run(
+                "file_ids.get", self.collection.find_one, {"_id": self._key(kind, digest, owner)}, {"file_id": 1}
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not read file_id cache: {e}")
+            return None
+        return document["file_id"] if document else None
+
+    async def put(self, kind: str, digest: str, file_id: str, size: int,
+                  owner: Optional[str] = None) -> None:
+        """
+        Store the file_id returned for an upload
+
+        Args:
+            kind (str): Media kind the file was sent as
+            digest (str): Content hash of the file
+            file_id (str): file_id returned by Telegram
+            size (int): File size in bytes
+            owner (Optional[str]): Bot that uploaded the file (defaults to ``owner``)
+        """
+        try:
+            await self.database.run(
+                "file_ids.put", self.collection.update_one,
+                {"_id": self._key(kind, digest, owner)},
+                {"$set": {
+                    "file_id": file_id,
+                    "size": size,
+                    "updated_at": datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not write file_id cache: {e}")
+
+    async def forget(self, kind: str, digest: str, owner: Optional[str] = None) -> None:
+        """
+        Drop an entry whose file_id Telegram no longer accepts
+
+        Args:
+            kind (str): Media kind the file was sent as
+            digest (str): Content hash of the file
+            owner (Optional[str]): Bot the file_id belongs to (defaults to ``owner``)
+        """
+        try:
+            await self.database.run(
+                "file_ids.forget", self.collection.delete_one, {"_id": self._key(kind, digest, owner)}
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not delete file_id cache entry: {e}")
+
+    async def send(self, kind: str, path: Upload, send: Sender,
+                   digest: Optional[str] = None, size: Optional[int] = None,
+                   owner: Optional[str] = None) -> Any:
+        """
+        Send a file, reusing a cached file_id when the same bytes were sent before
+
+        Args:
+            kind (str): Media kind the file is sent as
+            path (Upload): Local file or file object to upload on a cache miss
+            send (Sender): Coroutine function called with the file_id or path
+            digest (Optional[str]): Content hash, computed from ``path`` if omitted
+            size (Optional[int]): File size in bytes, read from ``path`` if omitted
+            owner (Optional[str]): Bot that sends the file (defaults to ``owner``)
+
+        Returns:
+            Any: The message returned by ``send``
+        """
+        if digest is None:
+            digest = await asyncio.to_thread(file_digest, path)
+        if size is None:
+            size = os.path.getsize(path)
+
+        # Sends of the same bytes run one at a time, so concurrent callers
+        # reuse the first upload's file_id instead of uploading in parallel
+        key = self._key(kind, digest, owner)
+        while key in self._pending:
+            await asyncio.shield(self._pending[key])
+        pending = asyncio.get_running_loop().create_future()
+        self._pending[key] = pending
+        try:
+            file_id = await self.get(kind, digest, owner)
+            if file_id is not None:
+                try:
+                    message = await send(file_id)
+                except (BadRequest, ValueError) as e:
+                    # Expired or foreign file_id; rate limits and network errors propagate
+                    self.logger.warning(f"Cached file_id rejected, uploading again: {e}")
+                    await self.forget(kind, digest, owner)
+                else:
+                    self.hits += 1
+                    self.bytes_saved += size
+                    return message
+
+            self.misses += 1
+            message = await send(path)
+            new_id = message_file_id(message)
+            if new_id is not None:
+                await self.put(kind, digest, new_id, size, owner)
+            return message
+        finally:
+            del self._pending[key]
+            pending.set_result(None)
+
+    async def send_group(self, kind: str, files: Sequence[Tuple[Upload, str, int]],
+                         send: GroupSender, owner: Optional[str] = None) -> List[Any]:
+        """
+        Send several files in one call, reusing cached file_ids where possible
+
+        If Telegram rejects the group while it contains cached file_ids,
+        those entries are dropped and the group is sent again with every
+        file uploaded.
+
+        Args:
+            kind (str): Media kind the files are sent as
+            files (Sequence[Tuple[Upload, str, int]]): ``(path, digest, size)`` of each file
+            send (GroupSender): Coroutine function called with one file_id or path per
+                file, returning one message per file in the same order
+            owner (Optional[str]): Bot that sends the files (defaults to ``owner``)
+
+        Returns:
+            List[Any]: The messages returned by ``send``
+        """
+        file_ids = list(await asyncio.gather(
+            *(self.get(kind, digest, owner) for _, digest, _ in files)
+        ))
+        if any(file_ids):
+            try:
+                messages = await send([
+                    file_id or path for file_id, (path, _, _) in zip(file_ids, files)
+                ])
+            except (BadRequest, ValueError) as e:
+                self.logger.warning(f"Cached file_id rejected in group, uploading again: {e}")
+                for file_id, (_, digest, _) in zip(file_ids, files):
+                    if file_id is not None:
+                        await self.forget(kind, digest, owner)
+                file_ids = [None] * len(files)
+            else:
+                await self._record_group(kind, files, file_ids, messages, owner)
+                return messages
+
+        messages = await send([path for path, _, _ in files])
+        await self._record_group(kind, files, file_ids, messages, owner)
+        return messages
+
+    async def _record_group(self, kind: str, files: Sequence[Tuple[Upload, str, int]],
+                            file_ids: List[Optional[str]], messages: List[Any],
+                            owner: Optional[str]) -> None:
+        for file_id, (_, digest, size), message in zip(file_ids, files, messages):
+            if file_id is not None:
+                self.hits += 1
+                self.bytes_saved += size
+                continue
+            self.misses += 1
+            new_id = message_file_id(message)
+            if new_id is not None:
+                await self.put(kind, digest, new_id, size, owner)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Hit and miss counts and bytes not re-uploaded
+        """
+        return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved}
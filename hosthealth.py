@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+HOST_LIMIT = metrics.gauge(
+    "massify_host_concurrency_limit", "Adaptive limit on requests in flight, by host"
+)
+HOST_STATE = metrics.gauge(
+    "massify_host_circuit_open", "1 while the host's circuit breaker is open or probing, by host"
+)
+CIRCUIT_OPENS = metrics.counter(
+    "massify_circuit_opens_total", "Times a host's circuit breaker opened, by host"
+)
+
+# Errors that say something about the host rather than about the request
+_HOST_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+
+class HostHealth:
+    """
+    Adaptive concurrency limit and circuit breaker for one host
+
+    The number of requests in flight follows an AIMD rule: every request
+    that answers within ``latency_target`` raises the limit by
+    ``1 / limit`` (one slot per window of successes), while a slow answer,
+    a 429, a 5xx, a timeout or a dropped connection halves it, at most once
+    per ``cooldown`` so one burst of errors counts once.
+
+    After ``failure_threshold`` failures in a row the breaker opens: no
+    request is sent until a jittered, exponentially growing delay has
+    passed. Then a single probe goes out; if it succeeds the breaker closes
+    and waiting requests continue at once, otherwise it opens again for
+    longer. Requests wait for the breaker instead of failing, so callers'
+    own retries are not used up while the host is down.
+    """
+
+    def __init__(self, host: str, initial_limit: int = 4, min_limit: int = 1,
+                 max_limit: int = 32, latency_target: float = 3.0, cooldown: float = 2.0,
+                 failure_threshold: int = 5, open_base: float = 2.0, open_max: float = 300.0):
+        """
+        Args:
+            host (str): Host name, used in logs and metric labels
+            initial_limit (int): Requests in flight allowed at first
+            min_limit (int): Floor of the limit
+            max_limit (int): Ceiling of the limit
+            latency_target (float): Seconds to response headers above which a request counts as slow
+            cooldown (float): Minimum seconds between two decreases
+            failure_threshold (int): Consecutive failures that open the breaker
+            open_base (float): Upper bound of the first open period in seconds, doubled per reopening
+            open_max (float): Cap on the open period in seconds
+        """
+        self.host = host
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.failure_threshold = failure_threshold
+        self.open_base = open_base
+        self.open_max = open_max
+        self.state = CLOSED
+        self.active = 0
+        self.failures = 0
+        self.opens = 0
+        self.open_until = 0.0
+        self._decreased_at = 0.0
+        # Created on first use so the controller can be built outside the event loop
+        self._condition: Optional[asyncio.Condition] = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._publish()
+
+    def _publish(self) -> None:
+        HOST_LIMIT.set(int(self.limit), host=self.host)
+        HOST_STATE.set(0 if self.state == CLOSED else 1, host=self.host)
+
+    def slot(self) -> "HostSlot":
+        """
+        Returns:
+            HostSlot: Async context manager around one request to the host
+        """
+        return HostSlot(self)
+
+    async def acquire(self) -> bool:
+        """
+        Wait until a request may be sent
+
+        Returns:
+            bool: True if this request is the probe of an open breaker
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            while True:
+                if self.state == OPEN:
+                    remaining = self.open_until - time.monotonic()
+                    if remaining > 0:
+                        try:
+                            await asyncio.wait_for(self._condition.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    self.state = HALF_OPEN
+                    self.active += 1
+                    self._publish()
+                    return True
+                if self.state == CLOSED and self.active < int(self.limit):
+                    self.active += 1
+                    return False
+                # Full, or a probe is in flight
+                await self._condition.wait()
+
+    async def release(self, probe: bool, latency: Optional[float], failed: bool) -> None:
+        """
+        Record the outcome of a request and free its slot
+
+        Args:
+            probe (bool): Whether the request was the breaker's probe
+            latency (Optional[float]): Seconds to response headers, None if the request was abandoned
+            failed (bool): Whether the host failed to serve the request
+        """
+        async with self._condition:
+            self.active -= 1
+            now = time.monotonic()
+            if latency is None:
+                # Cancelled: says nothing about the host; let the next request probe
+                if probe:
+                    self.state = OPEN
+                    self.open_until = now
+            elif failed:
+                self.failures += 1
+                self._decrease(now)
+                if probe or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                    self._open(now)
+            else:
+                self.failures = 0
+                if latency > self.latency_target:
+                    self._decrease(now)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                if probe:
+                    self.state = CLOSED
+                    self.opens = 0
+                    self.logger.info(f"{self.host} is answering again, circuit closed")
+            self._publish()
+            self._condition.notify_all()
+
+    def _decrease(self, now: float) -> None:
+        if now - self._decreased_at >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._decreased_at = now
+
+    def _open(self, now: float) -> None:
+        self.opens += 1
+        bound = min(self.open_max, self.open_base * 2 ** (self.opens - 1))
+        # Half the bound plus jitter: never reprobe at once, never in lockstep
+        delay = bound / 2 + random.uniform(0, bound / 2)
+        self.state = OPEN
+        self.open_until = now + delay
+        self.failures = 0
+        CIRCUIT_OPENS.inc(host=self.host)
+        self.logger.warning(f"{self.host} is failing, circuit open for {delay:.1f}s")
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dict: Current limit, requests in flight and breaker state
+        """
+        return {"limit": int(self.limit), "active": self.active, "state": self.state}
+
+
+class HostSlot:
+    """
+    One request to a host: waits for capacity on entry, reports the outcome on exit
+
+    Call ``record`` with the status as soon as response headers arrive, so
+    the latency excludes the body; without it the latency is measured at
+    exit. Timeouts and connection errors raised inside count as failures,
+    as do 429 and 5xx statuses; other errors are the request's own fault.
+    """
+
+    def __init__(self, health: HostHealth):
+        self.health = health
+        self.probe = False
+        self.status: Optional[int] = None
+        self.latency: Optional[float] = None
+        self._start = 0.0
+
+    def record(self, status: int) -> None:
+        """
+        Args:
+            status (int): HTTP status of the response
+        """
+        self.status = status
+        self.latency = time.monotonic() - self._start
+
+    async def __aenter__(self) -> "HostSlot":
+        self.probe = await self.health.acquire()
+        self._start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            await self.health.release(self.probe, None, False)
+            return
+        if self.latency is None:
+            self.latency = time.monotonic() - self._start
+        failed = self.status is not None and (self.status == 429 or self.status >= 500)
+        if exc is not None and isinstance(exc, _HOST_ERRORS):
+            failed = True
+        await self.health.release(self.probe, self.latency, failed)
+
+
+class HostMonitor:
+    """
+    ``HostHealth`` per host, created on first use and shared by every
+    client that talks to the same hosts
+    """
+
+    def __init__(self, **settings):
+        """
+        Args:
+            **settings: Keyword arguments for each ``HostHealth``
+        """
+        self.settings = settings
+        self._hosts: Dict[str, HostHealth] = {}
+
+    def host(self, url: str) -> HostHealth:
+        """
+        Args:
+            url (str): Any URL on the host
+
+        Returns:
+            HostHealth: The host's controller
+        """
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = HostHealth(host, **self.settings)
+        return self._hosts[host]
+
+    def slot(self, url: str) -> HostSlot:
+        """
+        Args:
+            url (str): URL about to be requested
+
+        Returns:
+            HostSlot: Async context manager around the request
+        """
+        return self.host(url).slot()
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            Dict[str, Dict]: ``HostHealth.stats`` per host
+        """
+        return {host: health.stats() for host, health in self._hosts.items()}
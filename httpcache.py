@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional
+
+
+class CacheEntry:
+    """
+    A cached response body with the validators it was served with
+    """
+
+    def __init__(self, url: str, body: str, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, stored_at: Optional[str] = None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """
+        Conditional request headers that revalidate this entry
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    On-disk cache of page bodies for conditional GETs
+
+    Each URL is one gzip-compressed JSON file named after the SHA-256 of the
+    URL, holding the body with its ``ETag`` and ``Last-Modified`` headers.
+    A later request for the URL sends them as ``If-None-Match`` and
+    ``If-Modified-Since``; a ``304 Not Modified`` answer costs a few hundred
+    bytes and the body comes from disk. Files are replaced atomically, so a
+    crash never leaves a half-written entry. All methods block; call them
+    from a thread in async code.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Directory holding the cache files
+        """
+        self.directory = directory
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json.gz")
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """
+        Args:
+            url (str): Page URL
+
+        Returns:
+            Optional[CacheEntry]: The cached response, or None if there is none
+        """
+        try:
+            with gzip.open(self._path(url), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable cache entry for {url}: {e}")
+            return None
+        if data.get("url") != url:
+            return None
+        return CacheEntry(url, data["body"], data.get("etag"), data.get("last_modified"),
+                          data.get("stored_at"))
+
+    def store(self, url: str, body: str, headers: Mapping[str, str]) -> bool:
+        """
+        Cache a response if it carries a validator
+
+        Args:
+            url (str): Page URL
+            body (str): Response text
+            headers (Mapping[str, str]): Response headers
+
+        Returns:
+            bool: True if the response was cached
+        """
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if not etag and not last_modified:
+            # Nothing to revalidate with; drop a stale entry instead
+            self.discard(url)
+            return False
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps({
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "stored_at": datetime.now(timezone.utc).isoformat(),
+                    "body": body
+                }, ensure_ascii=False).encode("utf-8"))
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+        return True
+
+    def discard(self, url: str) -> None:
+        """
+        Args:
+            url (str): Page URL whose entry is removed
+        """
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,125 @@
+import asyncio
+from typing import BinaryIO, Dict, List, Optional, Union
+
+
+class CrawlCycle:
+    """
+    State shared by the pages of one incremental crawl cycle
+
+    Discovery puts every page whose albums have been queued into ``pages``
+    in page order, followed by ``None`` once paging stops, so the cycle
+    owner can advance the resume cursor as pages complete.
+    """
+
+    def __init__(self, newest: Optional[Dict] = None, watermark_url: Optional[str] = None):
+        """
+        Args:
+            newest (Optional[Dict]): ``{"url", "page"}`` of the newest album seen so far
+            watermark_url (Optional[str]): Newest album of the previous completed cycle
+        """
+        self.newest = newest
+        self.watermark_url = watermark_url
+        self.pages: asyncio.Queue = asyncio.Queue()
+        self.queued = 0
+        self.error: Optional[Exception] = None
+
+
+class PageJob:
+    """
+    One index page of a crawl cycle
+    """
+
+    def __init__(self, cycle: CrawlCycle, page: int):
+        self.cycle = cycle
+        self.page = page
+
+
+class AlbumJob:
+    """
+    One album claimed from the work queue, or replayed from the scrape
+    journal, moving through the pipeline
+
+    ``attempts`` counts claims of the album, including this one.
+
+    ``record`` is the scraped album document (url, songs, movie_info) and
+    is None if scraping failed. A replayed album starts with its journaled
+    record and is never scraped or reported back to the work queue.
+
+    A refreshed album starts with only its new tracks and carries the
+    complete new record in ``refresh``, which replaces the stored one on
+    commit, minus the links of tracks that failed.
+
+    ``remaining`` counts tracks not yet finished. In media-group mode,
+    uploaded tracks wait in ``ready`` until a group is sent; ``uploading``
+    counts tracks in groups currently being sent.
+    """
+
+    def __init__(self, url: str, attempts: int = 0, record: Optional[Dict] = None,
+                 refresh: Optional[Dict] = None):
+        self.url = url
+        self.attempts = attempts
+        self.replayed = record is not None
+        self.refresh = refresh
+        self.error: Optional[Exception] = None
+        self.record: Optional[Dict] = record
+        self.tracks: List["TrackJob"] = []
+        self.remaining = 0
+        self.ready: List["TrackJob"] = []
+        self.uploading = 0
+        self.cover_sent = False
+
+    @property
+    def caption(self) -> str:
+        """
+        Metadata caption built from the album's movie info
+        """
+        movie_info = (self.record or {}).get("movie_info", {})
+        return "Metadata:\n" + "\n".join(f"{k}: {v}" for k, v in movie_info.items())
+
+    @property
+    def expecting(self) -> int:
+        """
+        Unfinished tracks that are neither waiting in ``ready`` nor being uploaded
+        """
+        return self.remaining - len(self.ready) - self.uploading
+
+    def track_finished(self) -> bool:
+        """
+        Mark one track as finished
+
+        Returns:
+            bool: True when this was the album's last unfinished track
+        """
+        self.remaining -= 1
+        return self.remaining == 0
+
+
+class TrackJob:
+    """
+    One download link (a song in one quality) moving through the pipeline
+    """
+
+    def __init__(self, album: AlbumJob, song: Dict, link: Dict):
+        self.album = album
+        self.song = song
+        self.link = link
+        # Downloaded audio: a path, or a Spool when downloading to memory
+        self.file: Optional[Union[str, BinaryIO]] = None
+        self.sha256: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.size = 0
+        self.thumb: Optional[str] = None
+        self.holds_slot = False
+        self.error: Optional[Exception] = None
+
+    @property
+    def name(self) -> str:
+        return self.song.get("name", "")
+
+    @property
+    def quality(self) -> str:
+        return self.link.get("quality", "")
+
+    @property
+    def caption(self) -> str:
+        return f"{self.name}\nQuality: {self.quality}"
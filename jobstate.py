@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from pymongo import UpdateOne, errors
+
+from database import AsyncDatabase
+
+PENDING = "pending"
+DOWNLOADED = "downloaded"
+UPLOADED = "uploaded"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# Statuses that need no further work after a restart
+FINISHED = (UPLOADED, SKIPPED)
+
+
+class JobStateWriter:
+    """
+    Per-track progress records written in batches
+
+    Every download link gets one document keyed by its URL whose status
+    moves through pending, downloaded and uploaded (or skipped/failed).
+    Updates are buffered and coalesced per link, then written with one
+    unordered ``bulk_write`` when the buffer reaches ``batch_size`` or every
+    ``flush_interval`` seconds, instead of one round trip per update.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection_name: str = "job_state",
+                 batch_size: int = 100, flush_interval: float = 1.0):
+        """
+        Args:
+            database (AsyncDatabase): Database wrapper
+            collection_name (str): Collection holding track states
+            batch_size (int): Buffered links that trigger an immediate flush
+            flush_interval (float): Seconds between background flushes
+        """
+        self.database = database
+        self.collection = database[collection_name]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: Dict[str, Dict] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.writes = 0
+        self.batches = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def ensure_indexes(self) -> None:
+        """
+        Index states by album for resume lookups
+        """
+        try:
+            await self.database.run(
+                "job_state.create_index", self.collection.create_index,
+                "album_url", name="album_lookup"
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not create job state index: {e}")
+
+    async def start(self) -> None:
+        """
+        Start the background flusher
+        """
+        if self._flusher is None:
+            self._lock = asyncio.Lock()
+            self._flusher = asyncio.ensure_future(self._flush_periodically())
+
+    async def close(self) -> None:
+        """
+        Stop the flusher and write whatever is still buffered
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    async def __aenter__(self) -> "JobStateWriter":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def set(self, link_url: str, album_url: str, status: str, **fields) -> None:
+        """
+        Buffer a status change for a download link
+
+        Args:
+            link_url (str): Download URL identifying the track
+            album_url (str): URL of the album page
+            status (str): New status
+            **fields: Extra fields to store (message_id, sha256, error, ...)
+        """
+        update = self._buffer.setdefault(link_url, {})
+        update.update(fields)
+        update.update({
+            "album_url": album_url,
+            "status": status,
+            "updated_at": datetime.now(timezone.utc)
+        })
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Write all buffered updates in one bulk operation
+        """
+        if not self._buffer:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            if not buffer:
+                return
+            requests = [
+                UpdateOne({"_id": link_url}, {"$set": fields}, upsert=True)
+                for link_url, fields in buffer.items()
+            ]
+            try:
+                await self.database.run(
+                    "job_state.bulk_write", self.collection.bulk_write, requests, ordered=False
+                )
+                self.writes += len(requests)
+                self.batches += 1
+            except errors.PyMongoError as e:
+                self.logger.error(f"Could not write job state: {e}")
+                # Retry on the next flush; newer buffered fields take precedence
+                for link_url, fields in buffer.items():
+                    fields.update(self._buffer.get(link_url, {}))
+                    self._buffer[link_url] = fields
+
+    async def load_album(self, album_url: str) -> Dict[str, Dict]:
+        """
+        Current state of every recorded track of an album
+
+        Args:
+            album_url (str): URL of the album page
+
+        Returns:
+            Dict[str, Dict]: State documents keyed by download URL
+        """
+        try:
+            documents = await self.database.run(
+                "job_state.load_album",
+                lambda: list(self.collection.find({"album_url": album_url}))
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not load job state: {e}")
+            documents = []
+        states = {document["_id"]: document for document in documents}
+        # Updates not flushed yet are newer than what the database holds
+        for link_url, fields in self._buffer.items():
+            if fields.get("album_url") == album_url:
+                states.setdefault(link_url, {"_id": link_url}).update(fields)
+        return states
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Track updates written and bulk batches used
+        """
+        return {"writes": self.writes, "batches": self.batches}
@@ -0,0 +1,183 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+SUFFIX = ".jsonl.gz"
+# Sorts before any real fetch time
+_NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _fetched_at(record: Dict) -> Optional[datetime]:
+    value = record.get("fetched_at")
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+
+class ScrapeJournal:
+    """
+    Append-only, gzip-compressed JSONL log of scraped album records
+
+    Every scraped album (url, songs, movie_info, ``fetched_at`` and the
+    ``page_sha256`` of the page it was parsed from) is appended as one line.
+    Each process writes its own file per UTC day, named
+    ``<day>-<random>.jsonl.gz``, so workers sharing a directory never
+    interleave writes and a restart never appends to a file cut short by a
+    crash. Each line is flushed with a zlib sync point, so a crash loses at
+    most the line being written.
+
+    The journal makes delivery independent of scraping: ``read`` filters
+    records by fetch date, year or language and ``latest`` keeps the newest
+    record per album, ready to be fed straight into the upload pipeline.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Directory holding the journal files
+        """
+        self.directory = directory
+        self._file: Optional[gzip.GzipFile] = None
+        self._day: Optional[str] = None
+        self._lock = threading.Lock()
+        self.appended = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _open(self, day: str) -> gzip.GzipFile:
+        if self._file is not None and self._day == day:
+            return self._file
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{day}-{uuid.uuid4().hex[:8]}{SUFFIX}")
+        self._file = gzip.open(path, "ab")
+        self._day = day
+        return self._file
+
+    def append(self, record: Dict) -> None:
+        """
+        Write one album record; blocking, call it from a thread in async code
+
+        Args:
+            record (Dict): Scraped album with ``fetched_at`` (datetime) and ``page_sha256``
+        """
+        fetched_at = _fetched_at(record) or datetime.now(timezone.utc)
+        line = json.dumps(record, default=_encode, ensure_ascii=False) + "\n"
+        with self._lock:
+            f = self._open(fetched_at.astimezone(timezone.utc).date().isoformat())
+            f.write(line.encode("utf-8"))
+            f.flush(zlib.Z_SYNC_FLUSH)
+            self.appended += 1
+
+    def close(self) -> None:
+        """
+        Finish the current file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def __enter__(self) -> "ScrapeJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def files(self, since: Optional[date] = None, until: Optional[date] = None) -> List[str]:
+        """
+        Args:
+            since (Optional[date]): First fetch day to include
+            until (Optional[date]): Last fetch day to include
+
+        Returns:
+            List[str]: Journal files of the selected days, oldest first
+        """
+        paths = []
+        for path in sorted(glob.glob(os.path.join(self.directory, f"*{SUFFIX}"))):
+            day = os.path.basename(path)[:10]
+            if since is not None and day < since.isoformat():
+                continue
+            if until is not None and day > until.isoformat():
+                continue
+            paths.append(path)
+        return paths
+
+    def _lines(self, path: str) -> Iterator[str]:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield line
+        except (EOFError, OSError, zlib.error) as e:
+            # A writer that crashed leaves a file without its gzip trailer;
+            # everything up to the last sync point is still readable
+            self.logger.warning(f"Journal file {path} ends early: {e}")
+
+    def read(self, since: Optional[date] = None, until: Optional[date] = None,
+             year: Optional[str] = None, language: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Iterate over journaled album records
+
+        Args:
+            since (Optional[date]): Only albums fetched on or after this UTC day
+            until (Optional[date]): Only albums fetched on or before this UTC day
+            year (Optional[str]): Only albums whose movie info has this ``Year``
+            language (Optional[str]): Only albums in this ``Language`` (case-insensitive)
+
+        Yields:
+            Dict: Album records with ``fetched_at`` as a datetime
+        """
+        for path in self.files(since, until):
+            for line in self._lines(path):
+                if not line.endswith("\n"):
+                    # Cut off mid-line by a crash
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self.logger.warning(f"Skipping unreadable journal line in {path}")
+                    continue
+                record["fetched_at"] = _fetched_at(record)
+                movie_info = record.get("movie_info") or {}
+                if year is not None and str(movie_info.get("Year", "")).strip() != str(year):
+                    continue
+                if language is not None and \
+                        str(movie_info.get("Language", "")).strip().lower() != language.lower():
+                    continue
+                yield record
+
+
+def latest(records: Iterable[Dict]) -> List[Dict]:
+    """
+    Keep the most recently fetched record of every album
+
+    Args:
+        records (Iterable[Dict]): Journal records, possibly several per URL
+
+    Returns:
+        List[Dict]: One record per URL, in order of first appearance
+    """
+    newest: Dict[str, Dict] = {}
+    for record in records:
+        url = record.get("url")
+        if not url:
+            continue
+        current = newest.get(url)
+        if current is None or (record.get("fetched_at") or _NEVER) >= (current.get("fetched_at") or _NEVER):
+            newest[url] = record
+    return list(newest.values())
@@ -0,0 +1,57 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(path: str = 'music_scraper.log',
+                  level: int = logging.INFO,
+                  max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue to a rotating file and the console
+
+    Logging calls only put the record on an in-memory queue; a background
+    thread formats it and does the file and terminal writes, so slow disks
+    never block the event loop. The file is rotated at ``max_bytes`` and
+    ``backup_count`` old files are kept. Calling this again returns the
+    listener set up first.
+
+    Args:
+        path (str): Log file
+        level (int): Lowest level that is logged
+        max_bytes (int): Size at which the log file is rotated
+        backup_count (int): Rotated files kept next to the current one
+
+    Returns:
+        logging.handlers.QueueListener: The running listener, stopped at exit
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    records: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(
+        records, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
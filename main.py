@@ -1,4 +1,5 @@
 import json
+from typing import Optional
 from pyrogram import Client
 from scraper import *
 from config import *
@@ -6,25 +7,59 @@ from database import *
 import os
 import subprocess
 import tempfile
+import shutil
 import asyncio
-import static_ffmpeg
+import metrics
+from audiocheck import is_mp3
+from coverart import THUMBNAIL_SECONDS, ensure_ffmpeg
+from downloader import DOWNLOAD_BYTES, DOWNLOAD_FAILURES, DOWNLOAD_SECONDS
+from logsetup import setup_logging
+from metrics import MetricsServer
+from quality import QualityPolicy
+from uploader import UPLOAD_SECONDS
+from warmstate import WarmState
 
 
 
 database_name = "Spidydb"
-db = connect_to_mongodb(DATABASE, database_name)
-collection_name = COLLECTION_NAME
+# Opened in main(); the client only connects on its first query
+albums: Optional[AlbumStore] = None
+indexed = False
 
+ALBUMS = metrics.counter("massify_albums_total", "Albums finished, by result")
+# Built in main(), after the settings are checked
+quality: Optional[QualityPolicy] = None
 
-app = Client("Massify", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN, workers=10)
+warm = WarmState(WARM_STATE_DIR, WARM_SEEN_MAX_AGE)
 
+# Signed in on the first upload, so a run with nothing to post never connects
+app: Optional[Client] = None
 
 
-static_ffmpeg.add_paths()
+async def telegram():
+    global app
+    if app is None:
+        require("API_ID", "API_HASH", "BOT_TOKEN", "DUMP_ID")
+        app = Client("Massify", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN,
+                     workers=10, workdir=warm.workdir())
+    if not app.is_connected:
+        await app.start()
+    return app
 
 
 def download_with_aria2c(url, output_dir=None, filename=None):
-    if output_dir is None:
+    with DOWNLOAD_SECONDS.time():
+        try:
+            downloaded_file = _download_with_aria2c(url, output_dir, filename)
+        except RuntimeError:
+            DOWNLOAD_FAILURES.inc()
+            raise
+    DOWNLOAD_BYTES.inc(os.path.getsize(downloaded_file))
+    return downloaded_file
+
+def _download_with_aria2c(url, output_dir=None, filename=None):
+    created_dir = output_dir is None
+    if created_dir:
         output_dir = tempfile.mkdtemp()
     os.makedirs(output_dir, exist_ok=True)
     cmd = [
@@ -34,6 +69,10 @@ def download_with_aria2c(url, output_dir=None, filename=None):
         '--max-concurrent-downloads=1',  # Limit to 1 download
         '--max-connection-per-server=5',  # Optimize download
         '--min-split-size=1M',  # Minimum split size
+        '--continue=true',  # Retries resume the partial file with range requests
+        '--max-tries=5',
+        '--retry-wait=2',
+        '--auto-file-renaming=false',  # Never write a second copy next to the first
         '--allow-overwrite=true'  # Allow overwriting existing files
     ]
     if filename:
@@ -43,61 +82,161 @@ def download_with_aria2c(url, output_dir=None, filename=None):
         if filename:
             downloaded_file = os.path.join(output_dir, filename)
         else:
-            # Attempt to find the downloaded file in the output directory
-            downloaded_files = os.listdir(output_dir)
+            # Skip aria2c control files; anything else besides the one
+            # download is a leftover we cannot tell apart from it
+            downloaded_files = sorted(
+                name for name in os.listdir(output_dir) if not name.endswith('.aria2')
+            )
             if not downloaded_files:
                 raise RuntimeError("No file was downloaded")
+            if len(downloaded_files) > 1:
+                raise RuntimeError(f"Cannot tell the download apart from {downloaded_files}")
             downloaded_file = os.path.join(output_dir, downloaded_files[0])
         if not os.path.exists(downloaded_file) or os.path.getsize(downloaded_file) == 0:
             raise RuntimeError("Download failed or resulted in an empty file")
+        if os.path.exists(downloaded_file + '.aria2'):
+            raise RuntimeError("Download is incomplete")
+        if downloaded_file.lower().endswith('.mp3') and not is_mp3(downloaded_file):
+            raise RuntimeError("Downloaded file is not MP3 audio")
         
         return downloaded_file
     except subprocess.CalledProcessError as e:
+        if created_dir:
+            shutil.rmtree(output_dir, ignore_errors=True)
         raise RuntimeError(f"Download failed. Error: {e.stderr}")
     except Exception as e:
+        if created_dir:
+            shutil.rmtree(output_dir, ignore_errors=True)
         raise RuntimeError(f"An error occurred during download: {str(e)}")
  
+async def post_album(item):
+    global indexed
+    sthumb = False
+    for song in item.get("songs", []):
+        for download in quality.select(song.get("download_links", [])):
+            print(f"{song.get('name')} - Quality: {download.get('quality')} - {song.get('song_link')}")
+            print("Downloading....")
+            file_path = download_with_aria2c(download.get('url'))
+            print(f"File downloaded successfully to: {file_path}")
+            try:
+                caption = "Metadata: \n"
+                movie_info = item.get("movie_info", {})
+                for key, value in movie_info.items():
+                    caption+= f"{key}: {value}\n"
+                client = await telegram()
+                if not sthumb:
+                    thumb = f"{song.get('name')}thumb.png"
+                    ensure_ffmpeg()
+                    with THUMBNAIL_SECONDS.time(source="ffmpeg"):
+                        os.system(f"""ffmpeg -i "{file_path}" -an -c:v copy "{thumb}" > ffmpeglog.txt """)
+                    await client.send_photo(DUMP_ID,photo=thumb,caption=caption)
+                    sthumb = True
+                cap = f"{song.get('name')}\nQuality: {download.get('quality')}"
+                with UPLOAD_SECONDS.time(bot=client.name):
+                    await client.send_audio(DUMP_ID,audio=file_path,caption=cap,thumb=thumb)
+            finally:
+                # The temporary download directory, also on errors
+                shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+    if not indexed:
+        # Deferred to the first album stored; a run with nothing new skips it
+        await albums.database.setup(albums)
+        indexed = True
+    await albums.insert(item)
+    ALBUMS.inc(result="done")
+    if sthumb:
+        os.remove(thumb)
+
+# Passes over one index page before its failed albums are left for the next cycle
+PAGE_ATTEMPTS = 3
+# Fetches of one index page, a minute apart, before the pass stops at it
+INDEX_ATTEMPTS = 5
+
 async def main():
-    async with app:
+    global albums, quality
+    require("DATABASE", "COLLECTION_NAME")
+    # Chosen by bitrate label only; this loop has no probing downloader
+    quality = QualityPolicy(QUALITY_POLICY, int(QUALITY_MAX_MB * 1024 * 1024), probe=False)
+    albums = AlbumStore(open_database(DATABASE, database_name), COLLECTION_NAME)
+    async with MetricsServer(host=METRICS_HOST, port=METRICS_PORT):
         try:
-            page = 1
-            while True:
-                 data = fetch_main(page)
-                 if len(data) == 10:
-                     for item in data:
-                         print(f"URL: {item.get('url')}")
-                         if not check_db(db, collection_name, item.get('url')):
-                            sthumb = False
-                            for song in item.get("songs", []):
-                                for download in song.get("download_links", []):
-                                    print(f"{song.get('name')} - Quality: {download.get('quality')} - {song.get('song_link')}")
-                                    print("Downloading....")
-                                    file_path = download_with_aria2c(download.get('url'))
-                                    print(f"File downloaded successfully to: {file_path}")
-                                    caption = "Metadata: \n"
-                                    movie_info = item.get("movie_info", {})
-                                    for key, value in movie_info.items():
-                                        caption+= f"{key}: {value}\n"
-                                    if not sthumb:
-                                        thumb = f"{song.get('name')}thumb.png"
-                                        os.system(f"""ffmpeg -i "{file_path}" -an -c:v copy "{thumb}" > ffmpeglog.txt """)
-                                        await app.send_photo(DUMP_ID,photo=thumb,caption=caption)
-                                        sthumb = True
-                                    cap = f"{song.get('name')}\nQuality: {download.get('quality')}"
-                                    await app.send_audio(DUMP_ID,audio=file_path,caption=cap,thumb=thumb)
-                                    result = item
-                            insert_document(db, collection_name, result)
-                            os.remove(thumb)        
-                            page+=1   
-                 else:
-                   print("Must Have Reached The End. Waiting for One Hour to Refresh......")
-                   time.sleep(3600)
-        except Exception as e:
-               print(f"Download error: {e}")
-    
-        
+            await crawl()
+        finally:
+            if app is not None and app.is_connected:
+                await app.stop()
+            warm.save_seen(albums.seen)
+            albums.database.close()
+
+async def crawl():
+    await warm.restore_seen(albums)
+    # An interrupted pass resumes where it stopped
+    page = warm.load_cursor() or 1
+    first_page = page
+    attempt = 1
+    index_attempt = 1
+    while True:
+        try:
+            index = fetch_index(page)
+            error = None
+            if not index.albums and not index.past_end:
+                error = f"No albums found on index page {page}"
+        except requests.exceptions.RequestException as e:
+            error = f"Index page {page} failed: {e}"
+        if error:
+            if index_attempt < INDEX_ATTEMPTS:
+                print(f"{error}. Retrying in a minute......")
+                index_attempt += 1
+                await asyncio.sleep(60)
+                continue
+            # Give up on the page for now; the next pass resumes at it
+            warm.save_cursor(page)
+            if RUN_ONCE:
+                raise IndexPageError(f"{error}, giving up after {INDEX_ATTEMPTS} attempts")
+            print(f"{error}. Waiting for One Hour to Retry......")
+            index_attempt = 1
+            await asyncio.sleep(3600)
+            continue
+        index_attempt = 1
+
+        new = 0
+        failed = []
+        for url in index.albums:
+            print(f"URL: {url}")
+            if await albums.exists(url):
+                continue
+            new += 1
+            try:
+                await post_album(scrape_album(url))
+            except Exception as e:
+                print(f"Download error: {e}")
+                ALBUMS.inc(result="failed")
+                failed.append(url)
+
+        if failed and attempt < PAGE_ATTEMPTS:
+            # Posted albums are known now, so only the failed ones are tried again
+            print(f"{len(failed)} albums failed on page {page}, retrying......")
+            attempt += 1
+            continue
+        attempt = 1
+        if new:
+            warm.save_seen(albums.seen)
+        if not (index.is_last or index.past_end or (RUN_ONCE and not new)):
+            page = index.next_page
+            warm.save_cursor(page)
+            continue
+        warm.clear_cursor()
+        if RUN_ONCE and first_page != 1:
+            # Albums added while the pass was interrupted are on the first pages
+            page = first_page = 1
+            continue
+        if RUN_ONCE:
+            print(f"Nothing new after page {page}. Done.")
+            return
+        print("Must Have Reached The End. Waiting for One Hour to Refresh......")
+        await asyncio.sleep(3600)
+        page = first_page = 1
 
 
 if __name__ == "__main__":
+    setup_logging(LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS)
     logging.info("Music Bot Started...")
-    app.run(main())
+    asyncio.run(main())
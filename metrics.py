@@ -0,0 +1,474 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+
+# Upper bounds in seconds, from a database round trip to a slow upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    A named metric with one series per label combination
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        """
+        Args:
+            name (str): Prometheus metric name
+            description (str): Help text
+        """
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float, Optional[Tuple[str, str]]]]:
+        """
+        Yields:
+            Tuple: Sample name suffix, labels, value and an extra label (histogram ``le``)
+        """
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict:
+        """
+        Returns:
+            Dict: JSON-friendly values keyed by label string ("" without labels)
+        """
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Lines of the Prometheus text exposition format
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, value, extra in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing total, such as bytes downloaded or errors
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Args:
+            amount (float): Increment, must not be negative
+            **labels: Label values of the series
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self, **labels) -> float:
+        """
+        Args:
+            **labels: Only sum series having these label values
+
+        Returns:
+            float: Sum over the matching series
+        """
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(value for key, value in self._values.items() if wanted <= set(key))
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", key, value, None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {_format_labels(key): value for key, value in sorted(self._values.items())}
+
+
+class Gauge(Metric):
+    """
+    Value sampled when metrics are read, such as a queue depth
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        """
+        Args:
+            value (float): Current value
+            **labels: Label values of the series
+        """
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """
+        Args:
+            function (Callable[[], float]): Called for the current value on every read
+            **labels: Label values of the series
+        """
+        with self._lock:
+            self._functions[_label_key(labels)] = function
+
+    def _read(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        return dict(sorted(values.items()))
+
+    def samples(self):
+        for key, value in self._read().items():
+            yield "", key, value, None
+
+    def snapshot(self) -> Dict:
+        return {_format_labels(key): value for key, value in self._read().items()}
+
+
+class _Series:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram(Metric):
+    """
+    Latency distribution over fixed buckets, with count and sum
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Prometheus metric name
+            description (str): Help text
+            buckets (Tuple[float, ...]): Ascending bucket upper bounds
+        """
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, _Series] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Args:
+            value (float): Observed value, usually seconds
+            **labels: Label values of the series
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.counts[bisect.bisect_left(self.buckets, value)] += 1
+            series.count += 1
+            series.sum += value
+            series.max = max(series.max, value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """
+        Observe the duration of the ``with`` block, also when it raises
+
+        Args:
+            **labels: Label values of the series
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, series: _Series, q: float) -> float:
+        # Linear interpolation inside the bucket holding the quantile
+        rank = q * series.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (series.max,), series.counts):
+            if count and seen + count >= rank:
+                return lower + (min(bound, series.max) - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return series.max
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (key, list(series.counts), series.count, series.sum)
+                for key, series in self._series.items()
+            )
+        for key, counts, count, total in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                yield "_bucket", key, cumulative, ("le", _format_value(bound))
+            yield "_sum", key, total, None
+            yield "_count", key, count, None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                _format_labels(key): {
+                    "count": series.count,
+                    "avg_ms": round(series.sum / series.count * 1000, 2),
+                    "p50_ms": round(self._quantile(series, 0.5) * 1000, 2),
+                    "p95_ms": round(self._quantile(series, 0.95) * 1000, 2),
+                    "max_ms": round(series.max * 1000, 2)
+                }
+                for key, series in sorted(self._series.items()) if series.count
+            }
+
+
+class MetricsRegistry:
+    """
+    All metrics of the process, rendered together
+
+    Modules create their metrics once at import time through the
+    module-level ``counter``, ``gauge`` and ``histogram`` helpers, so any
+    component can be instrumented without threading a registry through
+    its constructor.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric, or return the one already registered under its name
+
+        Args:
+            metric (Metric): New metric
+
+        Returns:
+            Metric: The registered metric
+        """
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} is already a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        """
+        Args:
+            name (str): Metric name
+
+        Returns:
+            Optional[Metric]: The metric, or None if it does not exist
+        """
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            Dict[str, Dict]: JSON-friendly values of every metric that has any
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        snapshot = {}
+        for metric in metrics:
+            values = metric.snapshot()
+            if values:
+                snapshot[metric.name] = values
+        return snapshot
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, description: str) -> Counter:
+    """
+    Returns:
+        Counter: The process-wide counter named ``name``
+    """
+    return REGISTRY.register(Counter(name, description))
+
+
+def gauge(name: str, description: str) -> Gauge:
+    """
+    Returns:
+        Gauge: The process-wide gauge named ``name``
+    """
+    return REGISTRY.register(Gauge(name, description))
+
+
+def histogram(name: str, description: str,
+              buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Returns:
+        Histogram: The process-wide histogram named ``name``
+    """
+    return REGISTRY.register(Histogram(name, description, buckets))
+
+
+class Throughput:
+    """
+    Per-second rates of counters between two consecutive reports
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._last = self.started
+        self._totals: Dict[str, float] = {}
+
+    def update(self, totals: Dict[str, float]) -> Dict[str, float]:
+        """
+        Args:
+            totals (Dict[str, float]): Current counter totals by name
+
+        Returns:
+            Dict[str, float]: Rate per second of each total since the previous call
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._last, 1e-9)
+        rates = {
+            name: (total - self._totals.get(name, 0)) / elapsed
+            for name, total in totals.items()
+        }
+        self._last = now
+        self._totals = dict(totals)
+        return rates
+
+    @property
+    def uptime(self) -> float:
+        """
+        Seconds since the tracker was created
+        """
+        return time.monotonic() - self.started
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving ``/metrics`` for Prometheus and ``/stats`` as JSON
+
+    Use as an async context manager; with ``port`` 0 nothing is served.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY,
+                 host: str = "127.0.0.1", port: int = 9108,
+                 extra: Optional[Callable[[], Dict]] = None):
+        """
+        Args:
+            registry (MetricsRegistry): Metrics to serve
+            host (str): Interface to listen on, local only by default
+            port (int): Port to listen on, 0 to disable the server
+            extra (Optional[Callable[[], Dict]]): Additional state merged into ``/stats``
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.extra = extra
+        self._runner: Optional[web.AppRunner] = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+            charset="utf-8"
+        )
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        stats = {"metrics": self.registry.snapshot()}
+        if self.extra is not None:
+            stats.update(self.extra())
+        return web.Response(text=json.dumps(stats, default=str), content_type="application/json")
+
+    async def start(self) -> None:
+        """
+        Start listening
+        """
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/stats", self._stats)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Another worker on this host may hold the port; run without metrics
+            self.logger.warning(f"Could not serve metrics on {self.host}:{self.port}: {e}")
+            await self.close()
+            return
+        self.logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        """
+        Stop listening
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "MetricsServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import metrics
+
+Handler = Callable[[Any], Awaitable[None]]
+ErrorHandler = Callable[[Any, Exception], Awaitable[None]]
+
+STAGE_SECONDS = metrics.histogram(
+    "massify_stage_seconds",
+    "Time a stage handler spent on one item, including waits on full downstream queues"
+)
+STAGE_FAILURES = metrics.counter(
+    "massify_stage_failures_total", "Items whose stage handler raised"
+)
+STAGE_QUEUED = metrics.gauge(
+    "massify_stage_queued", "Items waiting in a stage queue"
+)
+STAGE_ACTIVE = metrics.gauge(
+    "massify_stage_active", "Stage workers busy with an item"
+)
+
+
+class Stage:
+    """
+    One pipeline stage: a bounded queue served by a fixed number of workers
+
+    The handler receives one item at a time and forwards results itself with
+    ``Pipeline.put``, so a stage can route an item to any other stage (for
+    example straight to the final stage when there is nothing to do). When a
+    downstream queue is full, ``put`` blocks the handler, which holds this
+    stage's workers busy and so propagates backpressure upstream.
+    """
+
+    def __init__(self, name: str, handler: Handler, workers: int = 1,
+                 maxsize: int = 0, on_error: Optional[ErrorHandler] = None):
+        """
+        Args:
+            name (str): Stage name used for routing and stats
+            handler (Handler): Coroutine function processing one item
+            workers (int): Number of concurrent workers
+            maxsize (int): Queue capacity (0 for unbounded)
+            on_error (Optional[ErrorHandler]): Called with the item and exception when the handler raises
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.on_error = on_error
+        self.queue: Optional[asyncio.Queue] = None
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Queued items, busy workers and lifetime counters
+        """
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "active": self.active,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed
+        }
+
+
+class Pipeline:
+    """
+    A set of named stages joined by bounded asyncio queues
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def add_stage(self, name: str, handler: Handler, workers: int = 1,
+                  maxsize: int = 0, on_error: Optional[ErrorHandler] = None) -> Stage:
+        """
+        Register a stage; stages are reported in registration order
+
+        Args:
+            name (str): Stage name used for routing and stats
+            handler (Handler): Coroutine function processing one item
+            workers (int): Number of concurrent workers
+            maxsize (int): Queue capacity (0 for unbounded)
+            on_error (Optional[ErrorHandler]): Called with the item and exception when the handler raises
+
+        Returns:
+            Stage: The registered stage
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} already exists")
+        stage = Stage(name, handler, workers, maxsize, on_error)
+        self.stages[name] = stage
+        STAGE_QUEUED.set_function(lambda: stage.stats()["queued"], stage=name)
+        STAGE_ACTIVE.set_function(lambda: stage.active, stage=name)
+        return stage
+
+    async def start(self) -> None:
+        """
+        Create the queues and start every stage's workers
+        """
+        if self._tasks:
+            return
+        for stage in self.stages.values():
+            stage.queue = asyncio.Queue(stage.maxsize)
+            for _ in range(stage.workers):
+                self._tasks.append(asyncio.ensure_future(self._worker(stage)))
+
+    async def close(self) -> None:
+        """
+        Stop all workers; queued items are dropped
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self) -> "Pipeline":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def put(self, stage: str, item: Any) -> None:
+        """
+        Queue an item for a stage, waiting while the queue is full
+
+        Args:
+            stage (str): Target stage name
+            item (Any): Item to process
+        """
+        await self.stages[stage].queue.put(item)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns:
+            Dict[str, Dict[str, int]]: ``Stage.stats()`` for every stage
+        """
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    def depths(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Number of queued items per stage
+        """
+        return {name: stage.stats()["queued"] for name, stage in self.stages.items()}
+
+    async def _worker(self, stage: Stage) -> None:
+        while True:
+            item = await stage.queue.get()
+            stage.active += 1
+            start = time.perf_counter()
+            try:
+                await stage.handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stage.failed += 1
+                STAGE_FAILURES.inc(stage=stage.name)
+                if stage.on_error is None:
+                    self.logger.error(f"Unhandled error in stage {stage.name}: {e}")
+                else:
+                    try:
+                        await stage.on_error(item, e)
+                    except Exception as handler_error:
+                        self.logger.error(f"Error handler of stage {stage.name} failed: {handler_error}")
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage.name)
+                stage.active -= 1
+                stage.processed += 1
+                stage.queue.task_done()
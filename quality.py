@@ -0,0 +1,122 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+import metrics
+
+BEST = "best"
+BEST_COMPACT = "best+compact"
+ALL = "all"
+MODES = (ALL, BEST, BEST_COMPACT)
+
+_BITRATE = re.compile(r'(\d+)\s*kbps', re.I)
+
+QUALITY_SKIPPED = metrics.counter(
+    "massify_quality_skipped_total", "Download links left out before downloading, by reason"
+)
+QUALITY_BYTES_AVOIDED = metrics.counter(
+    "massify_quality_bytes_avoided_total", "Probed bytes of download links left out"
+)
+
+
+def bitrate(link: Dict) -> int:
+    """
+    Args:
+        link (Dict): Download link with a ``quality`` label such as ``320kbps``
+
+    Returns:
+        int: Bitrate in kbit/s, 0 if the label has none
+    """
+    match = _BITRATE.search(link.get("quality", ""))
+    return int(match.group(1)) if match else 0
+
+
+class Probe:
+    """
+    What a HEAD or one-byte range request revealed about a download link
+
+    ``alive`` is False for links that cannot be downloaded (a 4xx answer
+    or an HTML page instead of a file) and None when the probe itself
+    failed, which says nothing about the link.
+    """
+
+    def __init__(self, url: str, alive: Optional[bool] = None, size: Optional[int] = None,
+                 content_type: Optional[str] = None, status: Optional[int] = None):
+        self.url = url
+        self.alive = alive
+        self.size = size
+        self.content_type = content_type
+        self.status = status
+
+
+class QualityPolicy:
+    """
+    Which of a song's download links to download
+
+    - ``all``: every link (the default)
+    - ``best``: the highest bitrate only
+    - ``best+compact``: the highest and the lowest bitrate
+
+    Links whose probe shows them dead are never chosen; when the best one
+    is dead the next best takes its place. With ``max_bytes`` set, links
+    probed larger than that are left out first, unless none would remain,
+    in which case the smallest is kept.
+    """
+
+    def __init__(self, mode: str = ALL, max_bytes: int = 0, probe: bool = True):
+        """
+        Args:
+            mode (str): One of ``all``, ``best`` or ``best+compact``
+            max_bytes (int): Largest file to download, 0 for no limit
+            probe (bool): Probe links for size, type and availability before choosing
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown quality policy {mode!r}, expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.probe = probe
+
+    def select(self, links: List[Dict], probes: Optional[Sequence[Probe]] = None) -> List[Dict]:
+        """
+        Choose the links to download
+
+        Args:
+            links (List[Dict]): A song's download links
+            probes (Optional[Sequence[Probe]]): Probe per link, in the same order
+
+        Returns:
+            List[Dict]: The chosen links, in their original order
+        """
+        probes = list(probes) if probes is not None else [Probe(link.get("url", "")) for link in links]
+        candidates = []
+        for index, (link, probe) in enumerate(zip(links, probes)):
+            if probe.alive is False:
+                self._skip("dead", probe)
+            else:
+                candidates.append((index, link, probe))
+
+        if self.max_bytes:
+            fitting = [c for c in candidates if c[2].size is None or c[2].size <= self.max_bytes]
+            if not fitting and candidates:
+                fitting = [min(candidates, key=lambda c: c[2].size)]
+            for c in candidates:
+                if c not in fitting:
+                    self._skip("too_large", c[2])
+            candidates = fitting
+
+        ranked = sorted(candidates, key=lambda c: bitrate(c[1]), reverse=True)
+        if self.mode == BEST:
+            chosen = ranked[:1]
+        elif self.mode == BEST_COMPACT:
+            chosen = ranked[:1] + ranked[-1:] if len(ranked) > 1 else ranked
+        else:
+            chosen = ranked
+        for c in candidates:
+            if c not in chosen:
+                self._skip("policy", c[2])
+        return [link for _, link, _ in sorted(chosen, key=lambda c: c[0])]
+
+    @staticmethod
+    def _skip(reason: str, probe: Probe) -> None:
+        QUALITY_SKIPPED.inc(reason=reason)
+        if probe.size:
+            QUALITY_BYTES_AVOIDED.inc(probe.size)
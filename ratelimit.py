@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    ``acquire`` waits only as long as needed for enough tokens, so bursts up
+    to ``capacity`` go through immediately and sustained traffic is smoothed
+    to ``rate``.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (Optional[float]): Maximum stored tokens (defaults to ``rate``)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Created on first use so the bucket can be built outside the event loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Wait until ``tokens`` are available and take them
+
+        Args:
+            tokens (float): Number of tokens to take
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created on first use
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate (float): Requests per second allowed for each host
+            burst (Optional[float]): Requests a host may receive back to back
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        """
+        Return the bucket for the host of ``url``
+
+        Args:
+            url (str): Any URL on the host
+
+        Returns:
+            TokenBucket: The host's bucket
+        """
+        host = urlsplit(url).netloc.lower()
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def acquire(self, url: str) -> None:
+        """
+        Wait for a request slot on the host of ``url``
+
+        Args:
+            url (str): URL about to be requested
+        """
+        await self.bucket(url).acquire()
@@ -1,22 +1,39 @@
+import asyncio
+import hashlib
 import requests
-from bs4 import BeautifulSoup
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import re
 import time
+from datetime import datetime, timezone
 from urllib.parse import urljoin
-import json
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('music_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
+
+import metrics
+from hosthealth import HostMonitor
+from httpcache import HttpCache
+from journal import ScrapeJournal
+from ratelimit import HostRateLimiter
+
 logger = logging.getLogger(__name__)
 
+PAGE_SECONDS = metrics.histogram(
+    "massify_scrape_page_seconds", "Time to fetch one index or album page"
+)
+INDEX_SECONDS = metrics.histogram(
+    "massify_scrape_index_seconds", "Time to scrape an index page and all its albums"
+)
+SCRAPE_ERRORS = metrics.counter(
+    "massify_scrape_errors_total", "Index and album pages that could not be scraped"
+)
+SCRAPE_BYTES = metrics.counter(
+    "massify_scrape_bytes_total", "Page bytes received, by page type"
+)
+NOT_MODIFIED = metrics.counter(
+    "massify_scrape_not_modified_total", "Conditional page requests answered with 304 Not Modified"
+)
+
 class SongDownloadScraper:
     """
     A web scraper for downloading music from MassTamilan website
@@ -45,29 +62,9 @@ class SongDownloadScraper:
             response = requests.get(url, headers=self.headers, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            songs = []
-            
-            for index, tr in enumerate(soup.find_all('tr', attrs={'itemprop': 'itemListElement'}), 1):
-                # Find song name
-                name_link = tr.find('a', href=True, title=lambda x: x and 'Download' in x)
-                
-                # Find download links with 'dlink anim' class
-                download_links = tr.find_all('a', class_='dlink anim')
-                
-                if name_link and download_links:
-                    song_details = {
-                        'name': name_link.text.strip(),
-                        'song_link': urljoin(self.BASE_URL, name_link['href']),
-                        'download_links': [
-                            {
-                                'quality': link.text.strip(),
-                                'url': urljoin(self.BASE_URL, link['href'])
-                            } for link in download_links
-                        ]
-                    }
-                    songs.append(song_details)
-                    self.logger.info(f"Processed song: {song_details['name']}")
+            songs = parse_links(response.text, self.BASE_URL)
+            for song_details in songs:
+                self.logger.info(f"Processed song: {song_details['name']}")
             
             return songs
         
@@ -75,6 +72,218 @@ class SongDownloadScraper:
             self.logger.error(f"Error fetching URL {url}: {e}")
             return []
 
+# Only these elements carry album data; everything else on the page is skipped
+# while parsing instead of being built into the tree
+ALBUM_STRAINER = SoupStrainer(['tr', 'fieldset', 'figcaption'])
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+def _album_soup(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, HTML_PARSER, parse_only=ALBUM_STRAINER)
+
+def _songs_from_soup(soup: BeautifulSoup, base_url: str) -> List[Dict]:
+    songs = []
+    
+    for tr in soup.find_all('tr', attrs={'itemprop': 'itemListElement'}):
+        # Find song name
+        name_link = next(
+            (a for a in tr.find_all('a', href=True) if 'Download' in a.get('title', '')),
+            None
+        )
+        
+        # Find download links with 'dlink anim' class
+        download_links = tr.select('a.dlink.anim')
+        
+        if name_link and download_links:
+            songs.append({
+                'name': name_link.text.strip(),
+                'song_link': urljoin(base_url, name_link['href']),
+                'download_links': [
+                    {
+                        'quality': link.text.strip(),
+                        'url': urljoin(base_url, link['href'])
+                    } for link in download_links
+                ]
+            })
+    
+    return songs
+
+def _movie_info_from_soup(soup: BeautifulSoup, url: str) -> Dict[str, str]:
+    logger = logging.getLogger('extract_movie_info')
+    
+    # Extract poster caption
+    poster_caption = soup.find('figcaption', class_='cen')
+    poster_caption_text = poster_caption.text.strip() if poster_caption else "N/A"
+    
+    # Extract movie details from fieldset
+    fieldset = soup.find('fieldset', id='movie-handle')
+    if not fieldset:
+        logger.warning(f"No movie details found for URL: {url}")
+        return {}
+
+    # One pass over the fieldset collects the first link per section and
+    # the text following each bold label
+    links = {}
+    for a in fieldset.find_all('a', href=True):
+        for section in ('/artist/', '/music/', '/browse-by-year/', '/tamil-songs'):
+            if section in a['href']:
+                links.setdefault(section, a.text.strip())
+    labels = {}
+    for b in fieldset.find_all('b'):
+        sibling = b.next_sibling
+        if sibling is not None:
+            labels.setdefault(b.text.strip(), sibling.text.strip())
+
+    movie_info = {
+        "Movie": poster_caption_text.replace(" Poster",""),
+        "Starring": links.get('/artist/', "N/A"),
+        "Music": links.get('/music/', "N/A"),
+        "Director": labels.get("Director:", "N/A"),
+        "Lyricists": labels.get("Lyricists:", "N/A"),
+        "Year": links.get('/browse-by-year/', "N/A"),
+        "Language": links.get('/tamil-songs', "N/A"),
+        "First Released": labels.get("Fist Released on MassTamilan:", "N/A"),
+        "Last Updated": labels.get("Last Updated on MassTamilan:", "N/A")
+    }
+
+    logger.info(f"Successfully extracted movie info for URL: {url}")
+    return movie_info
+
+def parse_album(html: str, url: str, base_url: str = SongDownloadScraper.BASE_URL) -> Dict:
+    """
+    Parse songs and movie info out of an album page in a single pass
+    
+    :param html: Album page HTML
+    :param url: URL of the page
+    :param base_url: Base URL used to resolve relative links
+    :return: Album record with url, songs and movie_info
+    """
+    soup = _album_soup(html)
+    return {
+        'url': url,
+        'songs': _songs_from_soup(soup, base_url),
+        'movie_info': _movie_info_from_soup(soup, url)
+    }
+
+def parse_links(html: str, base_url: str = SongDownloadScraper.BASE_URL) -> List[Dict]:
+    """
+    Parse song download links out of an album page
+    
+    :param html: Album page HTML
+    :param base_url: Base URL used to resolve relative links
+    :return: List of song details with download links
+    """
+    return _songs_from_soup(_album_soup(html), base_url)
+
+def parse_movie_info(html: str, url: str) -> Dict[str, str]:
+    """
+    Parse movie information out of an album page
+    
+    :param html: Album page HTML
+    :param url: URL of the page, used for logging
+    :return: Dictionary of movie details
+    """
+    return _movie_info_from_soup(_album_soup(html), url)
+
+_PAGE_NUMBER = re.compile(r'[?&]page=(\d+)')
+# Album pages are one path segment ending in "-songs", like /leo-songs
+_ALBUM_PATH = re.compile(r'^(?:https?://[^/]+)?/[^/?#]+-songs/?$')
+
+class IndexPageError(RuntimeError):
+    """Raised when an index page lists no albums although the catalog does not end there"""
+
+class IndexPage:
+    """
+    Albums and pagination of one index page
+    
+    ``albums`` holds every album listed on the page, in page order.
+    ``next_page`` and ``last_page`` come from the pagination links and are
+    None when the page has none. An index page that lists no albums is
+    never taken for the end of the catalog by itself: only a page without
+    a next page (``is_last``) or a page past the last one linked ends it.
+    """
+
+    def __init__(self, page: int, albums: List[str], next_page: Optional[int] = None,
+                 last_page: Optional[int] = None):
+        """
+        :param page: Page number
+        :param albums: Album page URLs
+        :param next_page: Page linked as the next one
+        :param last_page: Highest page number linked
+        """
+        self.page = page
+        self.albums = albums
+        self.next_page = next_page
+        self.last_page = last_page
+
+    @property
+    def is_last(self) -> bool:
+        """
+        Whether this page lists albums and no page follows it
+        """
+        return bool(self.albums) and self.next_page is None
+
+    @property
+    def past_end(self) -> bool:
+        """
+        Whether this page lies beyond the last page of its own pagination
+        """
+        return not self.albums and self.last_page is not None and self.page > self.last_page
+
+def parse_index_page(html: str, page: int, base_url: str = SongDownloadScraper.BASE_URL) -> IndexPage:
+    """
+    Parse album links and pagination out of an index page
+    
+    Albums are the links of the album cards (``div.a-i``). Should the cards
+    ever be renamed, album-shaped links outside the header, navigation,
+    sidebar and footer are used instead, so a layout change degrades to a
+    looser match rather than to wrong links.
+    
+    :param html: Index page HTML
+    :param page: Number of the page
+    :param base_url: Base URL used to resolve relative links
+    :return: The page's albums and pagination
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    links = soup.select('div.a-i a[href]')
+    if not links:
+        links = [
+            a for a in soup.find_all('a', href=_ALBUM_PATH)
+            if not a.find_parent(['header', 'nav', 'aside', 'footer'])
+        ]
+    albums = []
+    for link in links:
+        url = urljoin(base_url + '/', link['href'])
+        if _ALBUM_PATH.match(link['href']) and url not in albums:
+            albums.append(url)
+
+    numbers = [int(_PAGE_NUMBER.search(a['href']).group(1)) for a in soup.find_all('a', href=_PAGE_NUMBER)]
+    last_page = max(numbers, default=None)
+    next_link = soup.find('a', rel='next', href=_PAGE_NUMBER)
+    if next_link is not None:
+        next_page = int(_PAGE_NUMBER.search(next_link['href']).group(1))
+    elif last_page is not None and last_page > page:
+        next_page = page + 1
+    else:
+        next_page = None
+    if next_page is not None and next_page <= page:
+        next_page = None
+    return IndexPage(page, albums, next_page, last_page)
+
+def parse_index(html: str, base_url: str = SongDownloadScraper.BASE_URL) -> List[str]:
+    """
+    Parse album page URLs out of an index page
+    
+    :param html: Index page HTML
+    :param base_url: Base URL prepended to album links
+    :return: List of album URLs
+    """
+    return parse_index_page(html, 1, base_url).albums
+
 def extract_movie_info(url: str) -> Dict[str, str]:
     """
     Extract movie information from a given URL
@@ -90,94 +299,117 @@ def extract_movie_info(url: str) -> Dict[str, str]:
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract poster caption
-        poster_caption = soup.find('figcaption', class_='cen')
-        poster_caption_text = poster_caption.text.strip() if poster_caption else "N/A"
-        
-        # Extract movie details from fieldset
-        fieldset = soup.find('fieldset', id='movie-handle')
-        if not fieldset:
-            logger.warning(f"No movie details found for URL: {url}")
-            return {}
-
-        # Helper function to safely extract text
-        def safe_extract(finder, default="N/A"):
-            try:
-                return finder().text.strip()
-            except (AttributeError, TypeError):
-                return default
-
-        movie_info = {
-            "Movie": poster_caption_text.replace(" Poster",""),
-            "Starring": safe_extract(lambda: fieldset.find('a', href=lambda x: x and '/artist/' in x)),
-            "Music": safe_extract(lambda: fieldset.find('a', href=lambda x: x and '/music/' in x)),
-            "Director": safe_extract(lambda: fieldset.find('b', string="Director:").next_sibling),
-            "Lyricists": safe_extract(lambda: fieldset.find('b', string="Lyricists:").next_sibling),
-            "Year": safe_extract(lambda: fieldset.find('a', href=lambda x: x and '/browse-by-year/' in x)),
-            "Language": safe_extract(lambda: fieldset.find('a', href=lambda x: x and '/tamil-songs' in x)),
-            "First Released": safe_extract(lambda: fieldset.find('b', string="Fist Released on MassTamilan:").next_sibling),
-            "Last Updated": safe_extract(lambda: fieldset.find('b', string="Last Updated on MassTamilan:").next_sibling)
-        }
-
-        logger.info(f"Successfully extracted movie info for URL: {url}")
-        return movie_info
+        return parse_movie_info(response.text, url)
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Request error for URL {url}: {e}")
         return {}
 
-def scrape_index(page: int) -> List[str]:
+def fetch_index(page: int) -> IndexPage:
+    """
+    Fetch one index page
+    
+    :param page: Page number
+    :return: The page's albums and pagination
+    :raises requests.exceptions.RequestException: If the page cannot be fetched
+    """
+    url = f"{SongDownloadScraper.BASE_URL}/tamil-songs?page={page}"
+    response = requests.get(url, headers=SongDownloadScraper().headers, timeout=10)
+    try:
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        SCRAPE_ERRORS.inc(kind="index")
+        raise
+    return parse_index_page(response.text, page, SongDownloadScraper.BASE_URL)
+
+def scrape_album(music_url: str) -> Dict:
+    """
+    Fetch and parse one album page
+    
+    :param music_url: Album page URL
+    :return: Album record with url, songs, movie_info, fetched_at and page_sha256
+    :raises requests.exceptions.RequestException: If the page cannot be fetched
+    """
+    response = requests.get(music_url, headers=SongDownloadScraper().headers, timeout=10)
+    try:
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        SCRAPE_ERRORS.inc(kind="album")
+        raise
+    return stamp_album(parse_album(response.text, music_url), response.text)
+
+def scrape_index(page: int) -> List[Dict]:
     """
     Scrape the index page for music links
     
     :param page: Page number to scrape
-    :return: List of music URLs
+    :return: List of album records
     """
     logger = logging.getLogger('scrape_index')
-    try:
-        url = f"https://masstamilan.dev/tamil-songs?page={page}"
-        scraper = SongDownloadScraper()
-        
-        response = requests.get(url, headers=scraper.headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links = soup.find_all('a')
-        
-        # Extract music page URLs, skipping the first 6 links
-        index_links = ["https://masstamilan.dev" + link.get('href') for link in links if link.get('href')][6:16]
-        
-        results = []
-        for music_url in index_links:
-            try:
-                # Fetch song links and movie info
-                song_links = scraper.fetch_links(music_url)
-                movie_info = extract_movie_info(music_url)
-                
-                results.append({
-                    'url': music_url,
-                    'songs': song_links,
-                    'movie_info': movie_info
-                })
-                
-                # Add a small delay to be respectful to the server
-                time.sleep(1)
-            
-            except Exception as e:
-                logger.error(f"Error processing {music_url}: {e}")
-        
-        logger.info(f"Scraped {len(results)} links from page {page}")
-        return results
+    with INDEX_SECONDS.time():
+        return _scrape_index(page, logger)
 
+def _scrape_index(page: int, logger: logging.Logger) -> List[Dict]:
+    try:
+        index_links = fetch_index(page).albums
     except requests.exceptions.RequestException as e:
         logger.error(f"Error scraping index page {page}: {e}")
         return []
 
-def fetch_main(page):
+    results = []
+    for music_url in index_links:
+        try:
+            # Fetch the album page once for song links and movie info
+            results.append(scrape_album(music_url))
+            
+            # Add a small delay to be respectful to the server
+            time.sleep(1)
+        
+        except Exception as e:
+            logger.error(f"Error processing {music_url}: {e}")
+    
+    logger.info(f"Scraped {len(results)} links from page {page}")
+    return results
+
+def stamp_album(album: Dict, html: str) -> Dict:
+    """
+    Record when and from which page content an album was scraped
+    
+    :param album: Album record from ``parse_album``
+    :param html: The album page it was parsed from
+    :return: The same record with ``fetched_at`` and ``page_sha256`` set
+    """
+    album['fetched_at'] = datetime.now(timezone.utc)
+    album['page_sha256'] = hashlib.sha256(html.encode('utf-8')).hexdigest()
+    return album
+
+def track_delta(stored: Dict, fresh: Dict) -> Dict:
+    """
+    Reduce a rescraped album to the download links the stored record lacks
+    
+    :param stored: Album record as stored when the album was posted
+    :param fresh: The album scraped again
+    :return: ``fresh`` with only new or changed download links in its songs;
+        songs without any are left out
+    """
+    known = {
+        link.get('url')
+        for song in stored.get('songs', [])
+        for link in song.get('download_links', [])
+    }
+    songs = []
+    for song in fresh.get('songs', []):
+        links = [link for link in song.get('download_links', []) if link.get('url') not in known]
+        if links:
+            songs.append(dict(song, download_links=links))
+    return dict(fresh, songs=songs)
+
+def fetch_main(page, journal: Optional[ScrapeJournal] = None):
     """
     Main function to run the scraper
+    
+    :param page: Page number to scrape
+    :param journal: Journal every scraped album is appended to
     """
     logger = logging.getLogger('main')
     all_results = []
@@ -187,13 +419,295 @@ def fetch_main(page):
             page_results = scrape_index(page)
             all_results.extend(page_results)
         
-        with open('data.json', 'w') as f:
-            json.dump(all_results, f)
+        if journal is not None:
+            for album in all_results:
+                journal.append(album)
         logger.info(f"Total results collected: {len(all_results)}")
         return all_results
     
     except Exception as e:
         logger.error(f"Unexpected error in main function: {e}")
 
+class AsyncScraper:
+    """
+    Asynchronous scraper sharing one pooled, keep-alive HTTP session
+    
+    Album pages are fetched concurrently up to ``concurrency`` and every
+    request waits on a per-host token bucket instead of a fixed sleep.
+    Within that cap, the host's adaptive limit and circuit breaker decide
+    how many requests are actually in flight.
+    Use as an async context manager so the session is opened and closed
+    inside the running event loop.
+    """
+    BASE_URL = SongDownloadScraper.BASE_URL
+
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 concurrency: int = 10,
+                 rate: float = 5.0,
+                 burst: float = 20.0,
+                 timeout: float = 10.0,
+                 user_agent: Optional[str] = None,
+                 journal: Optional[ScrapeJournal] = None,
+                 cache: Optional[HttpCache] = None,
+                 hosts: Optional[HostMonitor] = None):
+        """
+        :param base_url: Site root (defaults to ``BASE_URL``)
+        :param concurrency: Maximum requests in flight
+        :param rate: Sustained requests per second per host
+        :param burst: Requests a host may receive back to back
+        :param timeout: Total timeout per request in seconds
+        :param user_agent: Optional custom user agent string
+        :param journal: Journal every scraped album is appended to
+        :param cache: On-disk cache album pages are stored in and revalidated against
+        :param hosts: Adaptive per-host concurrency and circuit breakers, shared
+            with the downloader (a private one by default)
+        """
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.headers = SongDownloadScraper(user_agent).headers
+        self.limiter = HostRateLimiter(rate, burst)
+        self.journal = journal
+        self.cache = cache
+        self.hosts = hosts or HostMonitor()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def start(self) -> None:
+        """
+        Open the pooled HTTP session
+        """
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self) -> None:
+        """
+        Close the HTTP session and its pooled connections
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> "AsyncScraper":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def fetch(self, url: str, kind: str = "album") -> str:
+        """
+        Fetch a page body, honouring the concurrency and rate limits
+        
+        :param url: URL to fetch
+        :param kind: Page type the latency and errors are recorded under
+        :return: Response text
+        """
+        _, text, _ = await self._get(url, kind)
+        return text
+
+    async def _get(self, url: str, kind: str, headers: Optional[Dict[str, str]] = None):
+        await self.start()
+        async with self._semaphore:
+            await self.limiter.acquire(url)
+            # The host slot and the timer start after the rate limiter, so our
+            # own throttling is never taken for a slow site
+            async with self.hosts.slot(url) as slot:
+                with PAGE_SECONDS.time(kind=kind):
+                    try:
+                        async with self.session.get(url, headers=headers) as response:
+                            slot.record(response.status)
+                            if response.status == 304:
+                                NOT_MODIFIED.inc(kind=kind)
+                                return 304, None, response.headers
+                            response.raise_for_status()
+                            body = await response.read()
+                            SCRAPE_BYTES.inc(len(body), kind=kind)
+                            return response.status, body.decode(response.get_encoding()), response.headers
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        SCRAPE_ERRORS.inc(kind=kind)
+                        raise
+
+    async def fetch_cached(self, url: str, kind: str = "album") -> Tuple[str, bool]:
+        """
+        Fetch a page through the HTTP cache with a conditional GET
+        
+        :param url: URL to fetch
+        :param kind: Page type the latency and errors are recorded under
+        :return: Response text and whether it differs from the cached copy
+        """
+        if self.cache is None:
+            return await self.fetch(url, kind), True
+        entry = await asyncio.to_thread(self.cache.get, url)
+        status, text, headers = await self._get(url, kind, entry.headers if entry else None)
+        if status == 304 and entry is not None:
+            return entry.body, False
+        if status == 304:
+            # Validators we did not send; ask again for the full page
+            status, text, headers = await self._get(url, kind)
+        await asyncio.to_thread(self.cache.store, url, text, headers)
+        return text, True
+
+    async def fetch_links(self, url: str) -> List[Dict]:
+        """
+        Fetch song download links from an album page
+        
+        :param url: Album page URL
+        :return: List of song details with download links
+        """
+        try:
+            songs = parse_links(await self.fetch(url), self.base_url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Error fetching URL {url}: {e}")
+            return []
+        for song_details in songs:
+            self.logger.info(f"Processed song: {song_details['name']}")
+        return songs
+
+    async def extract_movie_info(self, url: str) -> Dict[str, str]:
+        """
+        Fetch movie information from an album page
+        
+        :param url: Album page URL
+        :return: Dictionary of movie details
+        """
+        try:
+            return parse_movie_info(await self.fetch(url), url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Request error for URL {url}: {e}")
+            return {}
+
+    async def index_page(self, page: int) -> IndexPage:
+        """
+        Fetch an index page with its albums and pagination
+        
+        :param page: Page number to scrape
+        :return: The page's albums and pagination
+        """
+        url = f"{self.base_url}/tamil-songs?page={page}"
+        html = await self.fetch(url, kind="index")
+        return await asyncio.to_thread(parse_index_page, html, page, self.base_url)
+
+    async def index_links(self, page: int) -> List[str]:
+        """
+        Fetch the album URLs listed on an index page
+        
+        :param page: Page number to scrape
+        :return: List of album URLs
+        """
+        return (await self.index_page(page)).albums
+
+    async def page_count(self) -> int:
+        """
+        Fetch the first index page and read the number of pages from its pagination
+        
+        :return: Number of index pages
+        """
+        return (await self.index_page(1)).last_page or 1
+
+    async def scrape_album(self, music_url: str) -> Dict:
+        """
+        Scrape songs and movie info for one album from a single fetch
+        
+        :param music_url: Album page URL
+        :return: Album record with url, songs, movie_info, fetched_at and page_sha256
+        """
+        html, _ = await self.fetch_cached(music_url)
+        return await self._album(music_url, html)
+
+    async def rescrape_album(self, music_url: str, page_sha256: Optional[str] = None) -> Optional[Dict]:
+        """
+        Scrape an album again only if its page changed
+        
+        The page is revalidated against the HTTP cache, so an unchanged page
+        usually costs a 304 response. It is parsed only if its content
+        differs from ``page_sha256``; comparing against the stored record
+        rather than trusting the 304 alone means a change that was fetched
+        but never stored is picked up again.
+        
+        :param music_url: Album page URL
+        :param page_sha256: ``page_sha256`` of the stored album record
+        :return: Album record as from ``scrape_album``, or None if the page is unchanged
+        """
+        html, _ = await self.fetch_cached(music_url)
+        if page_sha256 is not None and hashlib.sha256(html.encode('utf-8')).hexdigest() == page_sha256:
+            return None
+        return await self._album(music_url, html)
+
+    async def _album(self, music_url: str, html: str) -> Dict:
+        # Parsing is CPU-bound; keep it off the event loop
+        album = stamp_album(
+            await asyncio.to_thread(parse_album, html, music_url, self.base_url), html
+        )
+        if self.journal is not None:
+            await asyncio.to_thread(self.journal.append, album)
+        for song_details in album['songs']:
+            self.logger.info(f"Processed song: {song_details['name']}")
+        return album
+
+    async def scrape_albums(self, urls: List[str]) -> List[Dict]:
+        """
+        Scrape several albums concurrently, dropping any that fail
+        
+        :param urls: Album page URLs
+        :return: Album records in the order of ``urls``
+        """
+        albums = await asyncio.gather(
+            *(self.scrape_album(url) for url in urls),
+            return_exceptions=True
+        )
+        results = []
+        for url, album in zip(urls, albums):
+            if isinstance(album, Exception):
+                self.logger.error(f"Error processing {url}: {album}")
+            else:
+                results.append(album)
+        return results
+
+    async def scrape_index(self, page: int) -> List[Dict]:
+        """
+        Scrape an index page and all albums listed on it
+        
+        :param page: Page number to scrape
+        :return: List of album records
+        """
+        with INDEX_SECONDS.time():
+            return await self._scrape_index(page)
+
+    async def _scrape_index(self, page: int) -> List[Dict]:
+        try:
+            index_links = await self.index_links(page)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Error scraping index page {page}: {e}")
+            return []
+        results = await self.scrape_albums(index_links)
+        self.logger.info(f"Scraped {len(results)} links from page {page}")
+        return results
+
+    async def fetch_main(self, page: int) -> List[Dict]:
+        """
+        Async counterpart of ``fetch_main``
+        
+        :param page: Page number to scrape
+        :return: List of album records
+        """
+        all_results = await self.scrape_index(page)
+        self.logger.info(f"Total results collected: {len(all_results)}")
+        return all_results
+
 if __name__ == "__main__":
+    from logsetup import setup_logging
+    setup_logging()
     fetch_main()
@@ -0,0 +1,166 @@
+import io
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+
+class SpoolBudget:
+    """
+    Cap on the bytes all spools together may keep in memory
+
+    Spools reserve memory as they grow and release it when they spill to
+    disk or are closed, so the number of concurrent downloads cannot turn
+    into unbounded memory use.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Args:
+            limit (int): Maximum bytes held in memory across all spools
+        """
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        """
+        Args:
+            size (int): Bytes about to be buffered
+
+        Returns:
+            bool: True if the bytes fit and were reserved
+        """
+        with self._lock:
+            if self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+
+    def release(self, size: int) -> None:
+        """
+        Args:
+            size (int): Bytes no longer held in memory
+        """
+        with self._lock:
+            self.used = max(0, self.used - size)
+
+
+class Spool(io.BufferedIOBase):
+    """
+    Seekable binary buffer that stays in memory up to a size threshold
+
+    Above ``max_memory`` bytes, or when the shared ``budget`` is exhausted,
+    the contents move to an anonymous temporary file. That file has no
+    directory entry, so the operating system reclaims it on ``close`` or when
+    the process dies; nothing can be left behind in ``/tmp``.
+
+    ``name`` is the display file name only (Pyrogram uses it as the document
+    name when uploading a file object); it does not point to a file.
+    """
+
+    def __init__(self, name: str, max_memory: int = 32 * 1024 * 1024,
+                 budget: Optional[SpoolBudget] = None,
+                 directory: Optional[str] = None):
+        """
+        Args:
+            name (str): File name shown for the upload
+            max_memory (int): Size above which the spool moves to disk
+            budget (Optional[SpoolBudget]): Shared memory cap across spools
+            directory (Optional[str]): Where to spill (the system temp directory by default)
+        """
+        super().__init__()
+        self.name = name
+        self.max_memory = max_memory
+        self.budget = budget
+        self.directory = directory
+        self._file = io.BytesIO()
+        self._reserved = 0
+        self.spilled = False
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def size(self) -> int:
+        """
+        Total bytes written
+        """
+        position = self._file.tell()
+        size = self._file.seek(0, io.SEEK_END)
+        self._file.seek(position)
+        return size
+
+    def _spill(self) -> None:
+        disk = tempfile.TemporaryFile(dir=self.directory)
+        position = self._file.tell()
+        disk.write(self._file.getbuffer())
+        disk.seek(position)
+        self._file = disk
+        self.spilled = True
+        self._release()
+        self.logger.debug(f"Spooled {self.name} to disk")
+
+    def _release(self) -> None:
+        if self.budget is not None and self._reserved:
+            self.budget.release(self._reserved)
+        self._reserved = 0
+
+    def write(self, data) -> int:
+        if not self.spilled:
+            growth = max(0, self._file.tell() + len(data) - self.size)
+            if self.size + growth > self.max_memory or (
+                self.budget is not None and growth and not self.budget.reserve(growth)
+            ):
+                self._spill()
+            else:
+                self._reserved += growth
+        return self._file.write(data)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        return self._file.read(-1 if size is None else size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        size = self._file.truncate(size)
+        if not self.spilled and self.budget is not None and self._reserved > size:
+            self.budget.release(self._reserved - size)
+            self._reserved = size
+        return size
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def getvalue(self) -> bytes:
+        """
+        Returns:
+            bytes: The whole contents, independent of the current position
+        """
+        if not self.spilled:
+            return self._file.getvalue()
+        position = self._file.tell()
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(position)
+        return data
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+            self._release()
+        super().close()
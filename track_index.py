@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from pymongo import errors
+
+from database import AsyncDatabase
+
+
+class TrackIndex:
+    """
+    Content hashes of every track already posted, stored in MongoDB
+
+    Tracks are identified by the SHA-256 of their bytes, so the same file
+    re-posted under another album or URL is recognised. A fingerprint index
+    (size plus hash of the first and last bytes) lets a download be skipped
+    before it starts.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection_name: str = "tracks"):
+        """
+        Args:
+            database (AsyncDatabase): Database wrapper
+            collection_name (str): Collection holding track hashes
+        """
+        self.database = database
+        self.collection = database[collection_name]
+        self.skipped_before_download = 0
+        self.skipped_after_download = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def ensure_indexes(self) -> None:
+        """
+        Create the unique hash index and the fingerprint lookup index
+        """
+        try:
+            await self.database.run(
+                "tracks.create_index", self.collection.create_index,
+                "sha256", unique=True, name="sha256_unique"
+            )
+            await self.database.run(
+                "tracks.create_index", self.collection.create_index,
+                "fingerprint", name="fingerprint_lookup"
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not create track indexes: {e}")
+
+    async def _find(self, query: Dict) -> Optional[Dict]:
+        try:
+            return await self.database.run(
+                "tracks.find", self.collection.find_one, query, {"_id": 0, "sha256": 1, "url": 1, "album_url": 1}
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not query tracks: {e}")
+            return None
+
+    async def find_fingerprint(self, fingerprint: str) -> Optional[Dict]:
+        """
+        Args:
+            fingerprint (str): Fingerprint from ``hashing.fingerprint``
+
+        Returns:
+            Optional[Dict]: A known track with this fingerprint, or None
+        """
+        return await self._find({"fingerprint": fingerprint})
+
+    async def find_sha256(self, sha256: str) -> Optional[Dict]:
+        """
+        Args:
+            sha256 (str): Hex SHA-256 of the file
+
+        Returns:
+            Optional[Dict]: The known track with this hash, or None
+        """
+        return await self._find({"sha256": sha256})
+
+    async def record(self, sha256: str, fingerprint: Optional[str], size: int,
+                     url: str, album_url: str, name: str, quality: str) -> None:
+        """
+        Store a posted track
+
+        Args:
+            sha256 (str): Hex SHA-256 of the file
+            fingerprint (Optional[str]): Fingerprint of the file
+            size (int): File size in bytes
+            url (str): Download URL
+            album_url (str): URL of the album page the track came from
+            name (str): Song name
+            quality (str): Quality label
+        """
+        try:
+            await self.database.run(
+                "tracks.record", self.collection.update_one,
+                {"sha256": sha256},
+                {"$setOnInsert": {
+                    "sha256": sha256,
+                    "fingerprint": fingerprint,
+                    "size": size,
+                    "url": url,
+                    "album_url": album_url,
+                    "name": name,
+                    "quality": quality,
+                    "created_at": datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+        except errors.DuplicateKeyError:
+            pass  # Recorded concurrently by another track with the same bytes
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not record track: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Duplicates skipped before and after downloading
+        """
+        return {
+            "skipped_before_download": self.skipped_before_download,
+            "skipped_after_download": self.skipped_after_download
+        }
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pyrogram.errors import FloodWait
+
+import metrics
+from ratelimit import TokenBucket
+
+UploadCall = Callable[[Any], Awaitable[Any]]
+
+UPLOAD_WAIT_SECONDS = metrics.histogram(
+    "massify_upload_wait_seconds", "Time an API call waited for rate limits and FloodWaits"
+)
+UPLOAD_SECONDS = metrics.histogram(
+    "massify_upload_seconds", "Duration of Telegram API calls, by bot"
+)
+FLOOD_WAITS = metrics.counter(
+    "massify_flood_waits_total", "FloodWait errors, by bot"
+)
+UPLOAD_ERRORS = metrics.counter(
+    "massify_upload_errors_total", "Telegram API calls that failed, by bot"
+)
+
+
+class BotShard:
+    """
+    One Telegram client with its own rate limits and FloodWait state
+
+    Telegram applies limits per bot, so every shard has a global bucket and
+    one bucket per chat.
+    """
+
+    def __init__(self, client: Any, name: str, global_rate: float, global_burst: float,
+                 chat_rate: float, chat_burst: float):
+        """
+        Args:
+            client (Any): Pyrogram ``Client`` (or anything with the same send methods)
+            name (str): Stable identifier, used to scope cached file_ids
+            global_rate (float): Messages per second across all chats
+            global_burst (float): Messages that may be sent back to back
+            chat_rate (float): Messages per second to one chat
+            chat_burst (float): Messages that may be sent back to back to one chat
+        """
+        self.client = client
+        self.name = name
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_buckets: Dict[Any, TokenBucket] = {}
+        self.flood_until = 0.0
+        self.in_flight = 0
+        self.sent = 0
+        self.flood_waits = 0
+
+    def ready_at(self) -> float:
+        """
+        Returns:
+            float: Monotonic time at which the shard's FloodWait ends
+        """
+        return self.flood_until
+
+    async def acquire(self, chat_id: Any) -> None:
+        """
+        Wait out any FloodWait, then take a global and a per-chat token
+
+        Args:
+            chat_id (Any): Target chat
+        """
+        delay = self.flood_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        await self.chat_buckets[chat_id].acquire()
+        await self.global_bucket.acquire()
+
+
+class UploadScheduler:
+    """
+    Rate-limited, FloodWait-aware dispatcher of Telegram API calls over a
+    pool of clients
+
+    Each submitted call goes to the shard that becomes available first
+    (least loaded on ties) and waits for that shard's global and per-chat
+    tokens. On FloodWait the shard is paused for the server-given delay and
+    the call is requeued, on another shard if one is free, so adding bots
+    adds throughput.
+    """
+
+    def __init__(self, clients: List[Any],
+                 names: Optional[List[str]] = None,
+                 global_rate: float = 25.0,
+                 global_burst: float = 25.0,
+                 chat_rate: float = 20 / 60,
+                 chat_burst: float = 20.0,
+                 max_flood_retries: int = 5,
+                 manage_clients: bool = True):
+        """
+        Args:
+            clients (List[Any]): Pyrogram clients, one per bot token or session
+            names (Optional[List[str]]): Identifier of each client (defaults to ``client.name``)
+            global_rate (float): Messages per second per client across all chats
+            global_burst (float): Back-to-back messages per client
+            chat_rate (float): Messages per second per client to one chat
+            chat_burst (float): Back-to-back messages per client to one chat
+            max_flood_retries (int): FloodWaits tolerated for one call before giving up
+            manage_clients (bool): Start and stop the clients with the scheduler
+        """
+        if not clients:
+            raise ValueError("At least one client is required")
+        names = names or [getattr(client, "name", str(i)) for i, client in enumerate(clients)]
+        self.shards = [
+            BotShard(client, name, global_rate, global_burst, chat_rate, chat_burst)
+            for client, name in zip(clients, names)
+        ]
+        self.max_flood_retries = max_flood_retries
+        self.manage_clients = manage_clients
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def start(self) -> None:
+        """
+        Start every client
+        """
+        if self.manage_clients:
+            await asyncio.gather(*(shard.client.start() for shard in self.shards))
+
+    async def close(self) -> None:
+        """
+        Stop every client
+        """
+        if self.manage_clients:
+            await asyncio.gather(
+                *(shard.client.stop() for shard in self.shards),
+                return_exceptions=True
+            )
+
+    async def __aenter__(self) -> "UploadScheduler":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _pick(self) -> BotShard:
+        now = time.monotonic()
+        return min(self.shards, key=lambda shard: (max(shard.ready_at(), now), shard.in_flight))
+
+    async def submit(self, chat_id: Any, call: UploadCall) -> Any:
+        """
+        Run one API call against ``chat_id`` on the best available shard
+
+        Args:
+            chat_id (Any): Target chat, used for per-chat rate limiting
+            call (UploadCall): Coroutine function called with a ``BotShard``
+
+        Returns:
+            Any: Whatever ``call`` returns
+        """
+        for attempt in range(self.max_flood_retries + 1):
+            shard = self._pick()
+            shard.in_flight += 1
+            try:
+                with UPLOAD_WAIT_SECONDS.time():
+                    await shard.acquire(chat_id)
+                start = time.perf_counter()
+                try:
+                    result = await call(shard)
+                finally:
+                    UPLOAD_SECONDS.observe(time.perf_counter() - start, bot=shard.name)
+            except FloodWait as e:
+                FLOOD_WAITS.inc(bot=shard.name)
+                shard.flood_waits += 1
+                shard.flood_until = max(shard.flood_until, time.monotonic() + e.value)
+                self.logger.warning(
+                    f"FloodWait of {e.value}s on {shard.name}, requeueing "
+                    f"(attempt {attempt + 1}/{self.max_flood_retries + 1})"
+                )
+                if attempt == self.max_flood_retries:
+                    UPLOAD_ERRORS.inc(bot=shard.name)
+                    raise
+            except Exception:
+                UPLOAD_ERRORS.inc(bot=shard.name)
+                raise
+            else:
+                shard.sent += 1
+                return result
+            finally:
+                shard.in_flight -= 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns:
+            Dict[str, Dict[str, float]]: Per-shard sent count, FloodWaits, calls in flight and remaining wait
+        """
+        now = time.monotonic()
+        return {
+            shard.name: {
+                "sent": shard.sent,
+                "flood_waits": shard.flood_waits,
+                "in_flight": shard.in_flight,
+                "flood_wait_remaining": max(0.0, shard.flood_until - now)
+            }
+            for shard in self.shards
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from typing import Optional
+
+from dedupe import SeenUrls
+
+
+class WarmState:
+    """
+    State a short-lived run restores at boot instead of rebuilding it
+
+    - The Pyrogram session files: the directory is the clients' workdir,
+      so a restored session skips the bot sign-in.
+    - A snapshot of the album URLs known to be stored, so the duplicate
+      checks of a run with nothing new never reach the database and no run
+      waits for the full scan that warms the seen-URL set.
+    - The crawl cursor of ``main.py``: the index page an interrupted run
+      was about to fetch.
+
+    The snapshot keeps the time its URLs were loaded from the database,
+    and re-saving it does not change that time. So after
+    ``seen_max_age`` a run reloads the set from the database, which drops
+    albums that were deleted there.
+
+    The directory is meant to be kept between runs, e.g. with actions/cache.
+    Everything in it is a hint: a missing, unreadable or outdated file means
+    a cold start, never an error. The snapshot can only lag behind the
+    database, and a URL missing from it is still looked up there, so a
+    stale snapshot costs queries but never reposts or skips an album.
+    Files are replaced atomically.
+    """
+
+    SEEN_FILE = "seen.bin"
+    CURSOR_FILE = "cursor.json"
+    # Snapshot header: format tag, then when the URLs were loaded from the database
+    SEEN_HEADER = struct.Struct(">8sd")
+    SEEN_FORMAT = b"MSEEN\x00\x00\x01"
+
+    def __init__(self, directory: str, seen_max_age: float = 7 * 24 * 3600):
+        """
+        Args:
+            directory (str): Directory holding the state
+            seen_max_age (float): Seconds a seen-URL snapshot is trusted
+        """
+        self.directory = directory
+        self.seen_max_age = seen_max_age
+        # When the seen-URL set now in use was loaded from the database; a
+        # snapshot carries it along, so saving it again does not make it newer
+        self.seen_loaded_at: Optional[float] = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def workdir(self) -> str:
+        """
+        Returns:
+            str: The directory, created if needed, for Pyrogram's session files
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        return self.directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, name: str, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp, self._path(name))
+        except BaseException:
+            os.remove(temp)
+            raise
+
+    def load_seen(self) -> Optional[SeenUrls]:
+        """
+        Returns:
+            Optional[SeenUrls]: The snapshot, or None if there is no usable one
+        """
+        try:
+            with open(self._path(self.SEEN_FILE), "rb") as f:
+                data = f.read()
+            tag, loaded_at = self.SEEN_HEADER.unpack_from(data)
+            if tag != self.SEEN_FORMAT:
+                raise ValueError("unknown snapshot format")
+            age = time.time() - loaded_at
+            if age > self.seen_max_age:
+                self.logger.info(f"Seen-URL snapshot was loaded {age / 3600:.0f}h ago, reloading")
+                return None
+            seen = SeenUrls.from_bytes(data[self.SEEN_HEADER.size:])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            self.logger.warning(f"Ignoring unreadable seen-URL snapshot: {e}")
+            return None
+        self.seen_loaded_at = loaded_at
+        self.logger.info(f"Restored {len(seen)} known URLs from the snapshot")
+        return seen
+
+    def save_seen(self, seen: SeenUrls) -> None:
+        """
+        Args:
+            seen (SeenUrls): Known album URLs to start the next run with
+        """
+        loaded_at = self.seen_loaded_at if self.seen_loaded_at is not None else time.time()
+        self._write(self.SEEN_FILE, self.SEEN_HEADER.pack(self.SEEN_FORMAT, loaded_at) + seen.to_bytes())
+
+    async def restore_seen(self, albums) -> int:
+        """
+        Warm an album store's seen-URL set from the snapshot, or from the
+        database when there is none
+
+        Args:
+            albums (AlbumStore): The store to warm
+
+        Returns:
+            int: Number of known URLs
+        """
+        seen = await asyncio.to_thread(self.load_seen)
+        if seen is None:
+            self.seen_loaded_at = time.time()
+            return await albums.load_seen()
+        albums.seen = seen
+        return len(seen)
+
+    def load_cursor(self) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: Index page to resume at, None to start a fresh pass
+        """
+        try:
+            with open(self._path(self.CURSOR_FILE), encoding="utf-8") as f:
+                return int(json.load(f)["page"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable crawl cursor: {e}")
+            return None
+
+    def save_cursor(self, page: int) -> None:
+        """
+        Args:
+            page (int): Next index page of the pass in progress
+        """
+        self._write(self.CURSOR_FILE, json.dumps({"page": page, "saved_at": time.time()}).encode("utf-8"))
+
+    def clear_cursor(self) -> None:
+        """
+        Forget the cursor once a pass is complete
+        """
+        try:
+            os.remove(self._path(self.CURSOR_FILE))
+        except FileNotFoundError:
+            pass
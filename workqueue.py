@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from pymongo import ReturnDocument, UpdateOne, errors
+
+from database import AsyncDatabase
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Claim order: higher first, so new releases overtake back-catalog work
+PRIORITY_FRESH = 100
+PRIORITY_BACKFILL = 0
+
+
+def default_worker_id() -> str:
+    """
+    Returns:
+        str: ``host:pid``, unique per running worker process
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Album work queue shared by any number of worker processes through MongoDB
+
+    Each album URL is one document. A worker claims the highest-priority
+    queued album with an atomic ``find_one_and_update`` that turns it into a
+    lease owned by the worker and expiring after ``lease_seconds``. Leases
+    of albums still being processed are renewed every
+    ``heartbeat_interval`` seconds; when a worker dies its leases expire and
+    the albums are claimed again by another worker.
+    """
+
+    def __init__(self, database: AsyncDatabase, collection_name: str = "album_queue",
+                 worker_id: Optional[str] = None,
+                 lease_seconds: float = 300,
+                 heartbeat_interval: float = 60,
+                 max_attempts: int = 5,
+                 retry_delay: float = 60):
+        """
+        Args:
+            database (AsyncDatabase): Database wrapper
+            collection_name (str): Collection holding queued albums
+            worker_id (Optional[str]): Owner written into leases (defaults to ``host:pid``)
+            lease_seconds (float): Lifetime of a lease without heartbeat
+            heartbeat_interval (float): Seconds between lease renewals
+            max_attempts (int): Claims of one album before it is marked failed
+            retry_delay (float): Wait before a failed album is claimable again,
+                doubled with every further attempt
+        """
+        self.database = database
+        self.collection = database[collection_name]
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._held: Set[str] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.claimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.leases_lost = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def ensure_indexes(self) -> None:
+        """
+        Index the claim order and lease expiry
+        """
+        try:
+            await self.database.run(
+                "queue.create_index", self.collection.create_index,
+                [("status", 1), ("priority", -1), ("created_at", 1)], name="claim_order"
+            )
+            await self.database.run(
+                "queue.create_index", self.collection.create_index,
+                "lease_expires", name="lease_expiry"
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not create queue indexes: {e}")
+
+    async def start(self) -> None:
+        """
+        Start renewing leases in the background
+        """
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.ensure_future(self._renew_periodically())
+
+    async def close(self) -> None:
+        """
+        Stop the heartbeat and hand unfinished albums back to the queue
+        """
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        for url in list(self._held):
+            await self.release(url)
+
+    async def __aenter__(self) -> "WorkQueue":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+    async def enqueue(self, urls: Iterable[str], page: Optional[int] = None,
+                      priority: int = PRIORITY_FRESH) -> int:
+        """
+        Add albums to the queue; albums already queued, leased or finished are left alone
+
+        Args:
+            urls (Iterable[str]): Album page URLs
+            page (Optional[int]): Index page the albums were listed on
+            priority (int): Claim priority, higher first
+
+        Returns:
+            int: Number of albums that were not in the queue before
+        """
+        now = datetime.now(timezone.utc)
+        requests = [
+            UpdateOne({"_id": url}, {"$setOnInsert": {
+                "status": QUEUED,
+                "priority": priority,
+                "page": page,
+                "attempts": 0,
+                "available_at": now,
+                "created_at": now
+            }}, upsert=True)
+            for url in urls
+        ]
+        if not requests:
+            return 0
+        try:
+            result = await self.database.run(
+                "queue.enqueue", self.collection.bulk_write, requests, ordered=False
+            )
+        except errors.BulkWriteError as e:
+            # Concurrent enqueues of the same URL by another worker
+            return e.details.get("nUpserted", 0)
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not enqueue albums: {e}")
+            return 0
+        return result.upserted_count
+
+    async def claim(self) -> Optional[Dict]:
+        """
+        Lease the next album: the highest-priority queued one that is not
+        waiting out a retry backoff, or one whose previous lease expired
+
+        Returns:
+            Optional[Dict]: The queue document (``_id`` is the album URL), or None if there is no work
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            document = await self.database.run(
+                "queue.claim", self.collection.find_one_and_update,
+                {"$or": [
+                    {"status": QUEUED, "available_at": {"$lte": now}},
+                    {"status": LEASED, "lease_expires": {"$lt": now}}
+                ]},
+                {
+                    "$set": {
+                        "status": LEASED,
+                        "owner": self.worker_id,
+                        "lease_expires": self._lease_expiry(),
+                        "updated_at": now
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("priority", -1), ("created_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not claim album: {e}")
+            return None
+        if document is not None:
+            self._held.add(document["_id"])
+            self.claimed += 1
+        return document
+
+    async def _finish(self, url: str, update: Dict) -> None:
+        self._held.discard(url)
+        update.setdefault("$set", {})["updated_at"] = datetime.now(timezone.utc)
+        try:
+            # Only the lease owner may finish an album; a stale worker whose
+            # lease was taken over must not overwrite the new owner's state
+            await self.database.run(
+                "queue.finish", self.collection.update_one,
+                {"_id": url, "owner": self.worker_id, "status": LEASED},
+                update
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not update queued album {url}: {e}")
+
+    async def complete(self, url: str) -> None:
+        """
+        Mark a leased album as done
+
+        Args:
+            url (str): Album URL
+        """
+        self.completed += 1
+        await self._finish(url, {
+            "$set": {"status": DONE},
+            "$unset": {"owner": "", "lease_expires": "", "error": ""}
+        })
+
+    async def fail(self, url: str, error: str, attempts: int) -> None:
+        """
+        Return a leased album to the queue after a backoff, or mark it
+        failed after ``max_attempts``
+
+        Args:
+            url (str): Album URL
+            error (str): Description of the failure
+            attempts (int): Claims of the album so far, from the claimed document
+        """
+        self.failed += 1
+        status = FAILED if attempts >= self.max_attempts else QUEUED
+        delay = self.retry_delay * 2 ** max(attempts - 1, 0)
+        await self._finish(url, {
+            "$set": {
+                "status": status,
+                "error": error,
+                "available_at": datetime.now(timezone.utc) + timedelta(seconds=delay)
+            },
+            "$unset": {"owner": "", "lease_expires": ""}
+        })
+
+    async def release(self, url: str) -> None:
+        """
+        Give a leased album back without counting an attempt
+
+        Args:
+            url (str): Album URL
+        """
+        await self._finish(url, {
+            "$set": {"status": QUEUED},
+            "$unset": {"owner": "", "lease_expires": ""},
+            "$inc": {"attempts": -1}
+        })
+
+    async def renew(self) -> None:
+        """
+        Extend the leases of every album this worker still holds
+        """
+        if not self._held:
+            return
+        held = list(self._held)
+        try:
+            result = await self.database.run(
+                "queue.renew", self.collection.update_many,
+                {"_id": {"$in": held}, "owner": self.worker_id, "status": LEASED},
+                {"$set": {"lease_expires": self._lease_expiry()}}
+            )
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not renew leases: {e}")
+            return
+        if result.matched_count < len(held):
+            try:
+                owned = await self.database.run("queue.check_leases", lambda: {
+                    document["_id"] for document in self.collection.find(
+                        {"_id": {"$in": held}, "owner": self.worker_id, "status": LEASED},
+                        {"_id": 1}
+                    )
+                })
+            except errors.PyMongoError as e:
+                self.logger.error(f"Could not check leases: {e}")
+                return
+            lost = set(held) - owned
+            self._held -= lost
+            self.leases_lost += len(lost)
+            self.logger.warning(f"{len(lost)} album leases expired and were taken over by other workers")
+
+    async def _renew_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await self.renew()
+
+    async def counts(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Albums in the queue per status, across all workers
+        """
+        try:
+            groups = await self.database.run("queue.counts", lambda: list(self.collection.aggregate([
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ])))
+        except errors.PyMongoError as e:
+            self.logger.error(f"Could not count queued albums: {e}")
+            return {}
+        return {group["_id"]: group["count"] for group in groups}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: This worker's claims, outcomes, held leases and lost leases
+        """
+        return {
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "failed": self.failed,
+            "held": len(self._held),
+            "leases_lost": self.leases_lost
+        }